@@ -0,0 +1,148 @@
+"""
+Python 接口：边转换边产出文章，不写任何文件，下游直接存进自己的库。
+
+    sys.path.insert(0, "<项目根>/scripts/common")
+    from article_api import iter_pdf_articles, iter_epub_articles
+
+    for article in iter_pdf_articles("列宁全集 第1卷（1893年—1894年）.pdf", profile="lenin"):
+        store.put(article["book"], article["path"], article["markdown"], article["images"])
+
+每篇文章是一个 dict，字段与 JSONL 导出一致 (book, path, title, order, category, pages, markdown, footnotes)，另有：
+    front_matter  写进 index.md 的字段
+    images        [(文件名, 字节), ...]，正文里引用为 assets/文件名；可以原样传给 BundleWriter / CorpusStore 的 write_article
+    error         这一篇解析失败时的异常信息 (此时 markdown 为 None、images 为空)，不中断整本
+
+生成器是惰性的：取一篇才解析一篇，提前 break 不会解析后面的文章。
+切分规则 (SPLIT_LEVEL、黑名单、页边距...) 沿用 profile 对应转换器仪表盘里的配置。
+"""
+
+import importlib.util
+import sys
+from pathlib import Path
+
+import fitz
+
+from corpus_store import split_footnotes
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent.parent
+
+# PDF 转换配置 (profile)：名字 -> (转换器脚本, 解析器类名)
+PDF_PROFILES = {
+    "lenin": ("scripts/impl/lenin/pdf_converter_custom.py", "LeninParser"),
+    "stalin": ("scripts/impl/stalin/pdf_converter_custom.py", "StalinParser"),
+}
+EPUB_CONVERTER = "scripts/template/epub/epub_converter.py"
+
+_converters = {}
+
+
+def load_converter(script):
+    """
+    导入转换器脚本 (每个只导入一次)
+    各目录的转换器同名 (pdf_converter_custom)，按路径起不同的模块名，免得互相覆盖；
+    脚本所在目录加进 sys.path，转换器才能导入同目录的解析器
+    """
+    module = _converters.get(script)
+    if module is None:
+        path = PROJECT_ROOT / script
+        if str(path.parent) not in sys.path:
+            sys.path.insert(0, str(path.parent))
+        name = f"_article_api_{path.parent.name}_{path.stem}"
+        spec = importlib.util.spec_from_file_location(name, path)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        _converters[script] = module
+    return module
+
+
+def _article(rel_dir, front_matter, markdown, images, pages=None, error=None):
+    return {
+        "book": front_matter.get("book"),
+        "path": Path(rel_dir).as_posix(),
+        "title": front_matter.get("title"),
+        "order": front_matter.get("order"),
+        "category": front_matter.get("category"),
+        "pages": list(pages) if pages is not None else None,
+        "front_matter": front_matter,
+        "markdown": markdown,
+        "footnotes": split_footnotes(markdown) if markdown is not None else [],
+        "images": list(images),
+        "error": error,
+    }
+
+
+def iter_pdf_articles(path, profile="lenin"):
+    """
+    逐篇产出 PDF 里的文章 (按书签顺序)
+    :param path: PDF 路径，文件名 (不含后缀) 作为书名
+    :param profile: PDF_PROFILES 里的名字
+    """
+    if profile not in PDF_PROFILES:
+        raise ValueError(f"未知的 profile: {profile} (可选 {', '.join(PDF_PROFILES)})")
+    script, parser_class = PDF_PROFILES[profile]
+    converter = load_converter(script)
+    path = Path(path)
+
+    doc = fitz.open(path)
+    try:
+        toc = converter.extract_toc_structure(doc)
+        # 解析器不写文件 (图片在 state.article_images 里)，输出目录只是占位
+        parser = getattr(converter, parser_class)(path.parent)
+
+        path_stack = {0: Path()}
+        title_stack = {}
+        previous = None  # 上一篇的 ChapterState (边界页复用)
+        for item in toc:
+            lvl, title = item['level'], item['title']
+            title_stack[lvl] = title
+            for k in list(title_stack.keys()):
+                if k > lvl: del title_stack[k]
+
+            # 与转换器相同的判定：到达切分层级，或还没到但没有子节点 = 文章；还没到且有子节点 = 文件夹
+            if lvl < converter.SPLIT_LEVEL and item['has_children']:
+                path_stack[lvl] = path_stack.get(lvl - 1, Path()) / converter.clean_filename(title)
+                continue
+            if lvl > converter.SPLIT_LEVEL:
+                continue
+
+            start, end = item['start'], item['end']
+            rel_dir = path_stack.get(lvl - 1, Path()) / converter.clean_filename(title)
+            cats = [title_stack[k] for k in sorted(title_stack.keys()) if k < lvl]
+            front_matter = {
+                "title": title,
+                "order": start + 1,
+                "category": "/".join(cats),
+                "book": path.stem
+            }
+            # 能按书签位置切开共用页的转换器 (列宁) 带 start_y / end_y，并复用上一篇的边界页
+            clip = {}
+            if "start_y" in item:
+                clip = {"start_y": item['start_y'], "end_y": item['end_y'], "previous": previous}
+            try:
+                markdown, state = parser.parse_chapter(doc, list(range(start, end + 1)), **clip)
+                images, error, previous = state.article_images, None, state
+            except Exception as e:
+                markdown, images, error, previous = None, [], str(e), None
+            yield _article(rel_dir, front_matter, markdown, images, pages=(start + 1, end + 1), error=error)
+    finally:
+        doc.close()
+
+
+def iter_epub_articles(path):
+    """
+    逐篇产出 EPUB 里的文章 (按 spine 顺序)
+    :param path: EPUB 路径，书名取 EPUB 元数据里的标题
+    """
+    converter = load_converter(EPUB_CONVERTER)
+    book = converter.epub.read_epub(str(path))
+    book_stem = converter.clean_filename(converter._get_book_title(book))
+    get_item_fn = converter._build_get_item_fn(book)
+
+    for d in converter.collect_spine_docs(book):
+        try:
+            rel_dir, front_matter, markdown, images = converter.convert_spine_doc(d, book_stem, get_item_fn)
+            yield _article(rel_dir, front_matter, markdown, images)
+        except Exception as e:
+            front_matter = {"title": d["title"], "order": d["order"], "category": d["category"], "book": book_stem}
+            rel_dir = Path(*[p for p in d["category"].split("/") if p], converter.clean_filename(d["title"]))
+            yield _article(rel_dir, front_matter, None, [], error=str(e))
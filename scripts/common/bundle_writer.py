@@ -0,0 +1,270 @@
+"""
+Page Bundle 输出：每篇文章一个目录，index.md (YAML front matter + 正文) + assets/ 图片。
+转换器只负责产出文章内容，落盘方式由输出后端决定（Page Bundle 目录树 / SQLite 语料库）。
+
+落盘保证：每篇文章先完整写进同级的临时目录，再整体换名替换旧目录，
+中途被打断时，recover_bundles 会把每篇文章恢复成“完整的旧版”或“完整的新版”，不会留下半篇。
+
+临时目录名里带写入者的标识 (owner)，同一棵目录树上有多个写入者 (多进程 / 多机器共用输出目录) 时互不干扰。
+收拾残留是显式的：只有确定没有别的写入者在写这棵树时才能做 (单进程转换器传 recover=True；
+分布式转换由协调者在没有工作者运行时调用 recover_bundles)，否则会删掉别人正在写的临时目录。
+
+图片可以交给线程池写 (image_workers > 0)：正文先写进临时目录，图片在后台落盘，
+解析器接着处理下一篇；某篇的图片全部写完才换名上线，写失败的文章保持旧版，错误在 close() 时统一报告。
+"""
+
+import os
+import queue
+import re
+import shutil
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from front_matter import dump_front_matter
+
+TMP_SUFFIX = ".bundle-tmp"  # 正在写的新版本：.<文章目录名>.<owner>.bundle-tmp
+OLD_SUFFIX = ".bundle-old"  # 替换过程中暂存的旧版本：.<文章目录名>.<owner>.bundle-old
+OWNER_RE = re.compile(r'^\d+-[0-9a-f]{8}$')  # 写入者标识：进程号-随机串
+BUNDLE_ENTRIES = {"index.md", "assets"}
+
+
+def render_article(front_matter, markdown):
+    """拼出 index.md 全文：YAML front matter + Markdown 正文"""
+    return "---\n" + dump_front_matter(front_matter) + "---\n\n" + markdown
+
+
+def fsync_dir(path):
+    """把目录项 (换名结果) 刷到磁盘；Windows 不支持打开目录，跳过"""
+    if not hasattr(os, "O_DIRECTORY"):
+        return
+    fd = os.open(path, os.O_RDONLY | os.O_DIRECTORY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def new_owner():
+    """新的写入者标识"""
+    return f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+
+
+def split_staging_name(name, suffix):
+    """
+    临时目录名 -> (文章目录名, owner)
+    旧版本留下的不带 owner 的临时目录 (.<文章目录名>.bundle-tmp)，owner 为 None
+    """
+    stem = name[1:-len(suffix)]
+    article, _, owner = stem.rpartition(".")
+    if article and OWNER_RE.match(owner):
+        return article, owner
+    return stem, None
+
+
+def recover_bundles(output_dir, owner=None):
+    """
+    收拾中断留下的临时目录
+    - .xxx.<owner>.bundle-tmp：新版本没写完，直接删掉
+    - .xxx.<owner>.bundle-old：新版本已经就位就删掉旧版本，否则把旧版本换回去
+    :param owner: None = 收拾所有写入者留下的 (调用方保证这棵树上没有正在运行的写入者)；
+                  否则只收拾这个写入者的
+    """
+    output_dir = Path(output_dir)
+    if not output_dir.exists():
+        return
+    for dirpath, dirnames, _ in os.walk(output_dir):
+        for name in list(dirnames):
+            if not name.startswith("."):
+                continue
+            path = Path(dirpath) / name
+            if name.endswith(TMP_SUFFIX):
+                if owner is None or split_staging_name(name, TMP_SUFFIX)[1] == owner:
+                    shutil.rmtree(path)
+                dirnames.remove(name)
+            elif name.endswith(OLD_SUFFIX):
+                article, old_owner = split_staging_name(name, OLD_SUFFIX)
+                if owner is None or old_owner == owner:
+                    target = Path(dirpath) / article
+                    if target.exists():
+                        shutil.rmtree(path)
+                    else:
+                        os.replace(path, target)
+                dirnames.remove(name)
+
+
+class BundleWriter:
+    def __init__(self, output_dir, fsync=False, background=False, queue_size=32,
+                 image_workers=0, max_pending_images=64, recover=False):
+        """
+        :param output_dir: 本书的输出根目录 (pathlib.Path)
+        :param fsync: True = 每个文件和换名都 fsync，断电也不丢 (慢)
+        :param background: True = 由后台线程写盘，write_article 只把文章放进队列就返回
+        :param queue_size: 后台队列最多积压多少篇，满了 write_article 会等待 (防止内存堆积)
+        :param image_workers: 写图片的线程数，0 = 和正文一起顺序写
+        :param max_pending_images: 最多有多少张图片在排队等写，满了就等 (防止内存堆积)
+        :param recover: True = 先收拾这棵树上所有中断留下的临时目录；
+                        只有这一个写入者时才能用，多个写入者共用输出目录时由协调者单独调用 recover_bundles
+        """
+        self.output_dir = Path(output_dir)
+        self.fsync = fsync
+        self.owner = new_owner()  # 临时目录名里带上它，不会和别的写入者撞名
+        self.made_dirs = set()  # 已经建过的目录，不再重复 mkdir
+        self.errors = []        # 后台写入失败的 [(文章目录, 异常), ...]
+        self.pending = {}       # 图片还没写完的文章：文章目录 -> (rel_dir, 临时目录, [future, ...])
+        self.on_written = None  # 回调 on_written(rel_dir)：文章完整上线后调用 (断点续跑日志用)
+
+        if recover:
+            recover_bundles(self.output_dir)
+
+        self.queue = None
+        if background:
+            self.queue = queue.Queue(maxsize=queue_size)
+            self.thread = threading.Thread(target=self._drain, name="bundle-writer", daemon=True)
+            self.thread.start()
+
+        self.image_pool = None
+        if image_workers > 0:
+            self.image_pool = ThreadPoolExecutor(max_workers=image_workers, thread_name_prefix="bundle-image")
+            self.image_slots = threading.BoundedSemaphore(max_pending_images)
+
+    def _mkdir(self, path):
+        if path not in self.made_dirs:
+            path.mkdir(parents=True, exist_ok=True)
+            self.made_dirs.add(path)
+
+    def _write_file(self, path, content):
+        """写单个文件，str 按 UTF-8 文本写，bytes 原样写"""
+        if isinstance(content, str):
+            f = open(path, "w", encoding="utf-8")
+        else:
+            f = open(path, "wb")
+        with f:
+            f.write(content)
+            if self.fsync:
+                f.flush()
+                os.fsync(f.fileno())
+
+    def make_folder(self, rel_dir):
+        """创建分类文件夹"""
+        self._mkdir(self.output_dir / rel_dir)
+
+    def has_article(self, rel_dir):
+        """这篇文章是否已经在输出目录里 (断点续跑核对用)"""
+        return (self.output_dir / rel_dir / "index.md").is_file()
+
+    def write_article(self, rel_dir, front_matter, markdown, images=()):
+        """
+        写一篇文章包
+        :param rel_dir: 文章目录，相对于 output_dir
+        :param front_matter: dict，YAML 头
+        :param markdown: 正文（图片已写成 ![img](assets/xxx)）
+        :param images: [(文件名, 字节), ...]，写到 assets/ 下
+        """
+        if self.queue is not None:
+            # 复制一份图片列表：解析器接着处理下一篇时会换掉它
+            self.queue.put((rel_dir, front_matter, markdown, list(images)))
+        else:
+            self._write_article(rel_dir, front_matter, markdown, images)
+
+    def _write_article(self, rel_dir, front_matter, markdown, images):
+        article_dir = self.output_dir / rel_dir
+        parent = article_dir.parent
+        self._mkdir(parent)
+
+        # 同名文章 (重复书签) 还在写图片，先等它上线，再占用同一个临时目录
+        if article_dir in self.pending:
+            self._commit(article_dir)
+
+        # 完整写进临时目录
+        staging = parent / f".{article_dir.name}.{self.owner}{TMP_SUFFIX}"
+        if staging.exists():
+            shutil.rmtree(staging)
+        assets_dir = staging / "assets"
+        assets_dir.mkdir(parents=True)
+
+        if self.image_pool is None:
+            for filename, data in images:
+                self._write_file(assets_dir / filename, data)
+            self._write_file(staging / "index.md", render_article(front_matter, markdown))
+            self._swap(staging, article_dir)
+            self._written(rel_dir)
+            return
+
+        futures = []
+        for filename, data in images:
+            self.image_slots.acquire()  # 排队的图片太多就在这里等
+            future = self.image_pool.submit(self._write_file, assets_dir / filename, data)
+            future.add_done_callback(lambda _: self.image_slots.release())
+            futures.append(future)
+        self._write_file(staging / "index.md", render_article(front_matter, markdown))
+        self.pending[article_dir] = (rel_dir, staging, futures)
+
+        # 顺手让图片已经写完的文章上线
+        for done_dir in [d for d, (_, _, fs) in self.pending.items() if all(f.done() for f in fs)]:
+            self._commit(done_dir)
+
+    def _commit(self, article_dir):
+        """等这篇文章的图片写完再换名上线；有图片写失败就丢掉临时目录，保留旧版"""
+        rel_dir, staging, futures = self.pending.pop(article_dir)
+        failed = [f.exception() for f in futures if f.exception() is not None]
+        if failed:
+            shutil.rmtree(staging, ignore_errors=True)
+            self.errors.append((rel_dir, failed[0]))
+            return
+        self._swap(staging, article_dir)
+        self._written(rel_dir)
+
+    def _written(self, rel_dir):
+        if self.on_written is not None:
+            self.on_written(rel_dir)
+
+    def _swap(self, staging, article_dir):
+        """换名替换：旧目录先挪开，新目录就位后再删旧的"""
+        parent = article_dir.parent
+        if article_dir.exists() and any(e.name not in BUNDLE_ENTRIES for e in os.scandir(article_dir)):
+            # 目录里还有别的东西 (同名的分类文件夹)，不能整体替换，退回逐个文件换名
+            (article_dir / "assets").mkdir(exist_ok=True)
+            for entry in os.scandir(staging / "assets"):
+                os.replace(entry.path, article_dir / "assets" / entry.name)
+            os.replace(staging / "index.md", article_dir / "index.md")
+            shutil.rmtree(staging)
+        elif article_dir.exists():
+            old = parent / f".{article_dir.name}.{self.owner}{OLD_SUFFIX}"
+            if old.exists():
+                shutil.rmtree(old)
+            os.replace(article_dir, old)
+            os.replace(staging, article_dir)
+            shutil.rmtree(old)
+        else:
+            os.replace(staging, article_dir)
+
+        if self.fsync:
+            fsync_dir(parent)
+
+    def _drain(self):
+        """后台线程：逐篇落盘，出错记下来，结束时统一报告"""
+        while True:
+            item = self.queue.get()
+            if item is None:
+                break
+            try:
+                self._write_article(*item)
+            except Exception as e:
+                self.errors.append((item[0], e))
+
+    def close(self):
+        """等后台线程、图片线程池写完；有写入失败的文章就抛出"""
+        if self.queue is not None:
+            self.queue.put(None)
+            self.thread.join()
+            self.queue = None
+        if self.image_pool is not None:
+            for article_dir in list(self.pending):
+                self._commit(article_dir)
+            self.image_pool.shutdown()
+            self.image_pool = None
+        if self.errors:
+            lines = "\n".join(f"  {rel_dir}: {e}" for rel_dir, e in self.errors)
+            raise RuntimeError(f"{len(self.errors)} 篇文章写入失败:\n{lines}")
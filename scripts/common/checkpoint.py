@@ -0,0 +1,132 @@
+"""
+断点续跑日志：每篇文章真正落盘 (或提交进语料库) 之后追加一行记录，
+两千页的大部头转到一半崩了 / 按了 Ctrl-C，重跑时跳过日志里已完成的文章。
+
+日志是一个追加写的 JSONL 文件，多本书共用一个 (按 book 区分)，批量转换脚本据此跳过已经整本完成的卷：
+    {"book": ..., "run": ..., "path": "文章目录", "pages": [起始页, 结束页]}   一篇文章完成
+    {"book": ..., "run": ..., "complete": true}                              整本书完成
+    {"book": ..., "run": ..., "reset": true}                                 从头重来，之前的记录作废
+
+只有以下都对得上，才算“已完成”、跳过：
+- run (运行标识) 相同：输出后端、输出位置、解析器代码版本 (见 run_key)，换了输出目录 / 后端、改了解析器都会重新转换
+- 页码范围相同：书签改了导致页码范围变化的文章会重新转换
+- 文章还在输出里：输出目录被删掉 / 清空过，日志里的记录不算数
+"""
+
+import hashlib
+import inspect
+import json
+import threading
+from pathlib import Path
+
+
+def code_version(*objs):
+    """代码版本：这些类 / 函数所在源文件内容的哈希，改了代码就变"""
+    h = hashlib.sha1()
+    for obj in objs:
+        h.update(Path(inspect.getsourcefile(obj)).read_bytes())
+    return h.hexdigest()[:12]
+
+
+def run_key(backend, location, version):
+    """
+    运行标识：输出后端 + 输出位置 (目录或语料库文件) + 解析器版本
+    :param backend: 输出后端名 ("files" / "sqlite")
+    :param location: 输出目录，或语料库文件
+    :param version: 解析器版本 (code_version)
+    """
+    return f"{backend}:{Path(location).resolve().as_posix()}:{version}"
+
+
+def _replay(journal_path):
+    """读日志，返回 {(book, run): {"done": {path: pages}, "complete": bool}}；没有 run 的旧记录 run 为 None"""
+    books = {}
+    journal_path = Path(journal_path)
+    if not journal_path.exists():
+        return books
+    with open(journal_path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                continue  # 崩溃时写了一半的最后一行
+            state = books.setdefault((entry["book"], entry.get("run")), {"done": {}, "complete": False})
+            if entry.get("reset"):
+                state["done"].clear()
+                state["complete"] = False
+            elif entry.get("complete"):
+                state["complete"] = True
+            else:
+                state["done"][entry["path"]] = entry["pages"]
+    return books
+
+
+def completed_books(journal_path, run_for, exists_for):
+    """
+    日志里已经整本转换完成、文章也都还在输出里的书
+    :param run_for: 书名 -> 这本书本次的运行标识 (run_key)
+    :param exists_for: 书名 -> 检查函数 (文章目录 -> 是否还在输出里)
+    """
+    books = set()
+    for (book, run), state in _replay(journal_path).items():
+        if not state["complete"] or run != run_for(book):
+            continue
+        exists = exists_for(book)
+        if all(exists(path) for path in state["done"]):
+            books.add(book)
+    return books
+
+
+class CheckpointJournal:
+    def __init__(self, journal_path, book, run, exists, resume=True):
+        """
+        :param journal_path: 日志文件，不存在会自动创建
+        :param book: 书名 (与 front matter 的 book 一致)
+        :param run: 运行标识 (run_key)，只认同一标识下的记录
+        :param exists: 检查函数 (文章目录 -> 是否还在输出里)，通常是输出后端的 has_article
+        :param resume: True = 沿用日志里本书已完成的文章；False = 从头开始 (写一条 reset)
+        """
+        self.journal_path = Path(journal_path)
+        self.journal_path.parent.mkdir(parents=True, exist_ok=True)
+        self.book = book
+        self.run = run
+        self.lock = threading.Lock()  # 后台写盘线程也会调用 record
+        self.pending = {}             # 已交给输出后端、还没落盘的文章：path -> pages
+
+        self.done = {}
+        if resume:
+            # 输出里已经没有的文章 (输出目录被删 / 清空过) 不算完成
+            done = _replay(self.journal_path).get((book, run), {"done": {}})["done"]
+            self.done = {path: pages for path, pages in done.items() if exists(path)}
+        self.file = open(self.journal_path, "a", encoding="utf-8")
+        if not resume:
+            self._append({"book": book, "run": run, "reset": True})
+
+    def _append(self, entry):
+        with self.lock:
+            self.file.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            self.file.flush()
+
+    def is_done(self, rel_dir, pages):
+        """这篇文章 (同样的页码范围) 是否已经完成"""
+        return self.done.get(Path(rel_dir).as_posix()) == list(pages)
+
+    def begin(self, rel_dir, pages):
+        """文章交给输出后端之前登记页码，落盘回调 record 时再写进日志"""
+        with self.lock:
+            self.pending[Path(rel_dir).as_posix()] = list(pages)
+
+    def record(self, rel_dir):
+        """输出后端的落盘回调 (on_written)：文章已经完整写好"""
+        path = Path(rel_dir).as_posix()
+        with self.lock:
+            pages = self.pending.pop(path, None)
+        if pages is not None:
+            self._append({"book": self.book, "run": self.run, "path": path, "pages": pages})
+
+    def finish(self):
+        """整本书转换完成 (没有失败的文章) 时调用"""
+        self._append({"book": self.book, "run": self.run, "complete": True})
+
+    def close(self):
+        self.file.close()
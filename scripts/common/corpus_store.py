@@ -0,0 +1,191 @@
+"""
+SQLite 语料库：把文章（front matter 字段、Markdown 正文、注脚、图片）写进单个数据库文件，
+代替成千上万个 index.md + assets/ 小文件；需要时再用 export_bundles 还原出 Page Bundle 目录树。
+
+用法：
+- 转换器里 OUTPUT_BACKEND = "sqlite" 时写入
+- 直接运行本文件 = 导出：把 CORPUS_DB 中的文章还原到 EXPORT_DIR/<书名>/...
+"""
+
+import hashlib
+import json
+import re
+import sqlite3
+from pathlib import Path
+
+from bundle_writer import BundleWriter
+
+# ================= 导出配置 =================
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent.parent
+CORPUS_DB = PROJECT_ROOT / "data/processed/corpus.sqlite"
+EXPORT_DIR = PROJECT_ROOT / "data/processed/export"
+EXPORT_BOOK = None  # None = 导出全部书；或填书名 (front matter 里的 book)
+
+# ================= 存储逻辑 =================
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS articles (
+    id           INTEGER PRIMARY KEY,
+    book         TEXT NOT NULL,
+    path         TEXT NOT NULL,      -- 文章目录，相对于书的输出目录 (用 / 分隔)
+    title        TEXT,
+    order_no     INTEGER,
+    category     TEXT,
+    front_matter TEXT NOT NULL,      -- JSON，保留字段顺序，导出时原样还原
+    markdown     TEXT NOT NULL,      -- 完整正文 (含文末注脚)
+    footnotes    TEXT NOT NULL,      -- JSON 列表，文末注脚单独一份，方便检索
+    UNIQUE (book, path)
+);
+CREATE TABLE IF NOT EXISTS blobs (
+    sha1 TEXT PRIMARY KEY,
+    data BLOB NOT NULL
+);
+CREATE TABLE IF NOT EXISTS images (
+    article_id INTEGER NOT NULL,
+    filename   TEXT NOT NULL,
+    sha1       TEXT NOT NULL,        -- 指向 blobs，相同图片只存一份
+    PRIMARY KEY (article_id, filename)
+);
+"""
+
+FOOTNOTE_RE = re.compile(r'^\[\^(\d+|x)\]: ')
+
+
+def split_footnotes(markdown):
+    """取出正文末尾连续的注脚段落 ([^1]: ...)"""
+    paras = markdown.split("\n\n")
+    footnotes = []
+    while paras and FOOTNOTE_RE.match(paras[-1]):
+        footnotes.append(paras.pop())
+    footnotes.reverse()
+    return footnotes
+
+
+class CorpusStore:
+    def __init__(self, db_path, book, batch_size=200):
+        """
+        :param db_path: SQLite 文件路径，不存在会自动创建
+        :param book: 书名 (与 front matter 的 book 一致)
+        :param batch_size: 每多少篇文章提交一次事务
+        """
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.book = book
+        self.batch_size = batch_size
+        self.uncommitted = []   # 还在当前事务里的文章 path
+        self.on_written = None  # 回调 on_written(path)：文章所在事务提交后调用 (断点续跑日志用)
+
+        self.conn = sqlite3.connect(self.db_path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+
+    def make_folder(self, rel_dir):
+        """目录结构体现在文章 path 里，不需要单独建文件夹"""
+        pass
+
+    def has_article(self, rel_dir):
+        """这篇文章是否已经在库里 (断点续跑核对用)"""
+        row = self.conn.execute("SELECT 1 FROM articles WHERE book = ? AND path = ?",
+                                (self.book, Path(rel_dir).as_posix())).fetchone()
+        return row is not None
+
+    def write_article(self, rel_dir, front_matter, markdown, images=()):
+        """写入（或覆盖）一篇文章，参数同 BundleWriter.write_article"""
+        path = Path(rel_dir).as_posix()
+        cur = self.conn.cursor()
+
+        # 重跑时覆盖旧记录
+        row = cur.execute("SELECT id FROM articles WHERE book = ? AND path = ?", (self.book, path)).fetchone()
+        if row:
+            cur.execute("DELETE FROM images WHERE article_id = ?", (row[0],))
+            cur.execute("DELETE FROM articles WHERE id = ?", (row[0],))
+
+        cur.execute(
+            "INSERT INTO articles (book, path, title, order_no, category, front_matter, markdown, footnotes)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                self.book, path,
+                front_matter.get("title"), front_matter.get("order"), front_matter.get("category"),
+                json.dumps(front_matter, ensure_ascii=False),
+                markdown,
+                json.dumps(split_footnotes(markdown), ensure_ascii=False),
+            ),
+        )
+        article_id = cur.lastrowid
+
+        for filename, data in images:
+            sha1 = hashlib.sha1(data).hexdigest()
+            cur.execute("INSERT OR IGNORE INTO blobs (sha1, data) VALUES (?, ?)", (sha1, data))
+            cur.execute("INSERT INTO images (article_id, filename, sha1) VALUES (?, ?, ?)", (article_id, filename, sha1))
+
+        # 批量提交
+        self.uncommitted.append(path)
+        if len(self.uncommitted) >= self.batch_size:
+            self._commit()
+
+    def _commit(self):
+        self.conn.commit()
+        if self.on_written is not None:
+            for path in self.uncommitted:
+                self.on_written(path)
+        self.uncommitted = []
+
+    def close(self):
+        self._commit()
+        self.conn.close()
+
+
+def stored_paths(db_path, book):
+    """库里这本书已有的文章 path 集合 (库不存在时为空，不会新建)"""
+    if not Path(db_path).exists():
+        return set()
+    conn = sqlite3.connect(db_path)
+    try:
+        return {path for (path,) in conn.execute("SELECT path FROM articles WHERE book = ?", (book,))}
+    except sqlite3.OperationalError:  # 库里还没有 articles 表
+        return set()
+    finally:
+        conn.close()
+
+
+def export_bundles(db_path, output_dir, book=None):
+    """
+    从语料库还原 Page Bundle 目录树：output_dir/<书名>/<文章目录>/index.md + assets/
+    :param book: 只导出这本书，None 为全部
+    :return: 导出的文章数
+    """
+    conn = sqlite3.connect(db_path)
+    sql = "SELECT id, book, path, front_matter, markdown FROM articles"
+    params = ()
+    if book is not None:
+        sql += " WHERE book = ?"
+        params = (book,)
+
+    writers = {}
+    count = 0
+    for article_id, art_book, path, fm_json, markdown in conn.execute(sql + " ORDER BY id", params):
+        writer = writers.get(art_book)
+        if writer is None:
+            writer = writers[art_book] = BundleWriter(Path(output_dir) / art_book, recover=True)
+        images = conn.execute(
+            "SELECT i.filename, b.data FROM images i JOIN blobs b ON b.sha1 = i.sha1 WHERE i.article_id = ?",
+            (article_id,),
+        ).fetchall()
+        writer.write_article(path, json.loads(fm_json), markdown, images)
+        count += 1
+
+    conn.close()
+    for writer in writers.values():
+        writer.close()
+    return count
+
+
+if __name__ == "__main__":
+    if not CORPUS_DB.exists():
+        print(f"❌ 找不到语料库: {CORPUS_DB}")
+    else:
+        print(f"📖 读取语料库: {CORPUS_DB.name}")
+        n = export_bundles(CORPUS_DB, EXPORT_DIR, EXPORT_BOOK)
+        print(f"✅ 已导出 {n} 篇文章到 {EXPORT_DIR}")
@@ -0,0 +1,195 @@
+"""
+跨版本重复 / 近似重复文章检测：同一篇著作在 Z-library PDF、中马库 PDF、EPUB、全集 / 选集里各有一份，
+给每篇文章算 MinHash 指纹，用 LSH 分桶只比较可能相似的文章 (不做两两比对)，报告跨书的近似重复组，
+方便每篇著作挑一个最好的版本。
+
+指纹：去掉标点空白后的正文，取 SHINGLE 字的滑动窗口，单次哈希 + 分桶 (one permutation hashing) 得到 NUM_PERM 维签名，
+每篇文章只哈希一遍，纯 Python 也能跑几万篇。两篇文章签名相同维度的比例 ≈ Jaccard 相似度。
+
+用法：python dedup_articles.py [来源 ...]
+      来源同 search_index.py：Page Bundle 输出目录，或转换器导出的 .jsonl / .jsonl.gz / .jsonl.zst；不给时用 DEDUP_SOURCES
+"""
+
+import json
+import sys
+import time
+import zlib
+from pathlib import Path
+
+from jsonl_export import iter_jsonl
+from search_index import RUN_RE, iter_bundle_dir, normalize, split_paragraphs
+
+# ================= 🎛️ 配置 =================
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent.parent
+DEDUP_SOURCES = [PROJECT_ROOT / "data/processed"]
+REPORT_PATH = PROJECT_ROOT / "data/processed/duplicates.json"
+
+SHINGLE = 4          # 几个字一组
+NUM_PERM = 128       # 签名维数
+BANDS = 32           # LSH 分段数 (每段 NUM_PERM // BANDS 维)，段越多越容易成为候选
+THRESHOLD = 0.8      # 估计相似度 >= 这个值才算近似重复
+MIN_CHARS = 30       # 正文太短 (题词、图片说明) 不参与
+CROSS_BOOK_ONLY = True  # True = 只报告不同书之间的重复
+MAX_BUCKET = 500     # 同一个桶里文章太多 (通常是套话模板) 就跳过，避免退化成两两比较
+
+# ================= 指纹 =================
+
+EMPTY = 1 << 32
+ROTATION = 1 << 25   # 空桶借用右侧桶的值时，按距离加上偏移，避免和真实值相撞
+
+
+def article_text(markdown):
+    """参与比较的正文：与检索索引相同的段落清洗，再去掉所有非字母数字字符"""
+    return "".join(RUN_RE.findall(normalize("\n".join(split_paragraphs(markdown)))))
+
+
+def minhash(text, num_perm=NUM_PERM, shingle=SHINGLE):
+    """
+    单次哈希的 MinHash：每个 shingle 的 crc32 决定落到哪个桶 (低位) 以及桶内的值 (高位)，每个桶取最小值
+    :return: 长度 num_perm 的签名 (tuple)，正文不足一个 shingle 时为 None
+    """
+    n = len(text) - shingle + 1
+    if n <= 0:
+        return None
+
+    data = text.encode("utf-32-le")  # 每字固定 4 字节，按下标直接切片
+    width = shingle * 4
+    bins = [EMPTY] * num_perm
+    for i in range(0, n * 4, 4):
+        h = zlib.crc32(data[i:i + width])
+        j = h % num_perm
+        v = h // num_perm
+        if v < bins[j]:
+            bins[j] = v
+
+    # 短文章会有空桶：借用右边最近的非空桶 (rotation densification)
+    if EMPTY in bins:
+        filled = list(bins)
+        for j in range(num_perm):
+            if bins[j] != EMPTY:
+                continue
+            t = 1
+            while bins[(j + t) % num_perm] == EMPTY:
+                t += 1
+            filled[j] = bins[(j + t) % num_perm] + t * ROTATION
+        bins = filled
+    return tuple(bins)
+
+
+def similarity(sig_a, sig_b):
+    """签名相同维度的比例，即 Jaccard 相似度的估计"""
+    return sum(a == b for a, b in zip(sig_a, sig_b)) / len(sig_a)
+
+
+# ================= 检测 =================
+
+def iter_records(source):
+    source = Path(source)
+    return iter_bundle_dir(source) if source.is_dir() else iter_jsonl(source)
+
+
+def find_duplicates(records, threshold=THRESHOLD, bands=BANDS, cross_book_only=CROSS_BOOK_ONLY):
+    """
+    :param records: 可迭代的文章记录 (book, path, title, markdown ...)
+    :return: (文章列表, [(i, j, 相似度), ...])，i / j 是文章列表的下标
+    """
+    rows = NUM_PERM // bands
+    articles = []
+    signatures = []
+    buckets = {}
+
+    for record in records:
+        text = article_text(record["markdown"])
+        if len(text) < MIN_CHARS:
+            continue
+        sig = minhash(text)
+        idx = len(articles)
+        articles.append({
+            "book": record["book"], "path": record["path"],
+            "title": record.get("title"), "chars": len(text),
+        })
+        signatures.append(sig)
+        for b in range(bands):
+            buckets.setdefault((b, sig[b * rows:(b + 1) * rows]), []).append(idx)
+
+    candidates = set()
+    skipped = 0
+    for members in buckets.values():
+        if len(members) < 2:
+            continue
+        if len(members) > MAX_BUCKET:
+            skipped += 1
+            continue
+        for x in range(len(members)):
+            for y in range(x + 1, len(members)):
+                candidates.add((members[x], members[y]))
+    if skipped:
+        print(f"⚠️ 跳过 {skipped} 个过大的桶 (> {MAX_BUCKET} 篇)")
+
+    pairs = []
+    for i, j in candidates:
+        if cross_book_only and articles[i]["book"] == articles[j]["book"]:
+            continue
+        score = similarity(signatures[i], signatures[j])
+        if score >= threshold:
+            pairs.append((i, j, score))
+    pairs.sort(key=lambda p: (-p[2], p[0], p[1]))
+    return articles, pairs
+
+
+def group_pairs(pairs):
+    """并查集：把两两重复连成组"""
+    parent = {}
+
+    def find(x):
+        parent.setdefault(x, x)
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    for i, j, _ in pairs:
+        parent[find(i)] = find(j)
+
+    groups = {}
+    for x in parent:
+        groups.setdefault(find(x), []).append(x)
+    return sorted((sorted(g) for g in groups.values()), key=lambda g: (-len(g), g[0]))
+
+
+if __name__ == "__main__":
+    sources = [Path(s) for s in sys.argv[1:]] or DEDUP_SOURCES
+
+    def all_records():
+        for source in sources:
+            if not source.exists():
+                print(f"❌ 找不到来源: {source}")
+                continue
+            print(f"📖 读取: {source}")
+            yield from iter_records(source)
+
+    t = time.perf_counter()
+    articles, pairs = find_duplicates(all_records())
+    groups = group_pairs(pairs)
+    print(f"🔍 {len(articles)} 篇文章，{len(pairs)} 对近似重复，{len(groups)} 组 ({time.perf_counter() - t:.1f}s)\n")
+
+    for group in groups[:50]:
+        # 正文最长的排在前面，通常是最完整的版本
+        for rank, idx in enumerate(sorted(group, key=lambda k: -articles[k]["chars"])):
+            a = articles[idx]
+            mark = "⭐" if rank == 0 else "  "
+            print(f"{mark} {a['book']} / {a['title']} ({a['chars']} 字)")
+        print()
+
+    report = {
+        "threshold": THRESHOLD,
+        "groups": [[articles[idx] for idx in group] for group in groups],
+        "pairs": [
+            {"a": articles[i], "b": articles[j], "similarity": round(score, 3)}
+            for i, j, score in pairs
+        ],
+    }
+    REPORT_PATH.parent.mkdir(parents=True, exist_ok=True)
+    REPORT_PATH.write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+    print(f"🧾 报告: {REPORT_PATH}")
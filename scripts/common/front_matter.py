@@ -0,0 +1,145 @@
+"""
+Front matter 序列化：与 yaml.dump(front_matter, allow_unicode=True) 逐字节相同，但快得多。
+
+转换几千封短信、电报时，PyYAML 纯 Python 的 emitter 在 profile 里很显眼。
+我们的 front matter 只有 title / order / category / book 这几个 字符串或整数 字段，
+绝大多数值都能写成 plain 标量，这里直接按固定格式拼接；
+遇到需要加引号、会折行、或字段类型不认识的情况，退回 yaml.dump，保证输出不变。
+
+直接运行本文件 = 自检：各种 front matter 形状 (以及 data/processed 下已有的 index.md) 与 yaml.dump 的输出逐一对比。
+"""
+
+from functools import lru_cache
+
+import yaml
+from yaml.nodes import ScalarNode
+
+_resolver = yaml.resolver.Resolver()
+
+BEST_WIDTH = 80  # yaml.dump 默认行宽，超过后遇到空格会折行
+FIRST_CHAR_INDICATORS = set("#,[]{}&*!|>'\"%@`")
+WHITESPACE_AFTER = set("\0 \t\r\n\x85\u2028\u2029")
+
+
+def _printable(ch):
+    """PyYAML (allow_unicode=True) 认为可以原样输出的字符；制表符、换行等不算"""
+    return (
+        " " <= ch <= "~"
+        or ("\xa0" <= ch <= "\ud7ff" and ch not in "\u2028\u2029")  # 这两个是换行符
+        or ("\ue000" <= ch <= "\ufffd" and ch != "\ufeff")
+        or "\U00010000" <= ch < "\U0010ffff"
+    )
+
+
+@lru_cache(maxsize=4096)  # book / category 在同一本书里反复出现
+def is_plain(key, value):
+    """
+    这个字符串在 yaml.dump 里会不会原样写成一行、不加引号
+    规则照搬 PyYAML Emitter.analyze_scalar 的块上下文部分，拿不准的一律返回 False 交给 yaml.dump
+    """
+    if not value or value[0] == " " or value[-1] == " ":
+        return False
+    if value.startswith("---") or value.startswith("..."):
+        return False
+    if value[0] in FIRST_CHAR_INDICATORS:
+        return False
+    if value[0] in "?:-" and (len(value) == 1 or value[1] in WHITESPACE_AFTER):
+        return False
+
+    for i, ch in enumerate(value):
+        if not _printable(ch):
+            return False
+        if ch == ":" and (i + 1 == len(value) or value[i + 1] == " "):
+            return False
+        if ch == "#" and value[i - 1] == " ":
+            return False
+
+    # 靠近行宽的位置有空格就可能被折行
+    if " " in value[max(0, BEST_WIDTH - len(key) - 4):]:
+        return False
+
+    # 看起来像数字、布尔、日期、null 的字符串会被加引号
+    return _resolver.resolve(ScalarNode, value, (True, False)) == "tag:yaml.org,2002:str"
+
+
+def dump_front_matter(front_matter):
+    """等价于 yaml.dump(front_matter, allow_unicode=True)"""
+    lines = []
+    try:
+        items = sorted(front_matter.items())  # yaml.dump 默认按键排序
+    except TypeError:
+        return yaml.dump(front_matter, allow_unicode=True)
+
+    for key, value in items:
+        if type(key) is not str or not is_plain("", key) or len(key) > 64:
+            return yaml.dump(front_matter, allow_unicode=True)
+        if type(value) is int:
+            lines.append(f"{key}: {value}\n")
+        elif value == "":
+            lines.append(f"{key}: ''\n")  # 顶层文章的 category 为空串
+        elif type(value) is str and is_plain(key, value):
+            lines.append(f"{key}: {value}\n")
+        else:
+            return yaml.dump(front_matter, allow_unicode=True)
+
+    if not lines:
+        return yaml.dump(front_matter, allow_unicode=True)
+    return "".join(lines)
+
+
+if __name__ == "__main__":
+    # 自检：与 yaml.dump 逐字节对比，有不一致时退出码为 1 (见 README 的「自检」)
+    import sys
+    import timeit
+    from pathlib import Path
+
+    PROJECT_ROOT = Path(__file__).resolve().parent.parent.parent
+
+    samples = [
+        # PDF 转换器
+        {"title": "论所谓市场问题", "order": 73, "category": "", "book": "列宁全集 第1卷（1893年—1894年）"},
+        {"title": "致亚·米·高尔基", "order": 1024, "category": "正文/书信", "book": "斯大林选集_1-4卷_诸夏怀斯社"},
+        # EPUB 转换器
+        {"title": "第一章", "order": 2, "category": "卷一", "book": "测试书"},
+        # 需要加引号、折行、或其他类型的
+        {"title": "1893", "order": 1, "category": "", "book": "x"},
+        {"title": "true", "order": 1, "category": "null", "book": "~"},
+        {"title": "什么是“人民之友”以及 他们如何攻击社会民主党人？", "order": 30, "category": "", "book": "b"},
+        {"title": "答复: 关于问题", "order": 1, "category": "a/b", "book": "b"},
+        {"title": "注释 #1", "order": 1, "category": "a#b", "book": "b"},
+        {"title": "- 列表", "order": -3, "category": "-x", "book": "b"},
+        {"title": "[附录]", "order": 0, "category": "{x}", "book": "'引号'"},
+        {"title": " 前后空格 ", "order": 1, "category": "a\tb", "book": "a\nb"},
+        {"title": "…省略", "order": 1, "category": "2024-01-01", "book": "1.5"},
+        {"title": "长标题 " + "很长" * 50, "order": 1, "category": "a " * 60, "book": "x" * 200},
+        {"title": "a:b", "order": 1, "category": "?x", "book": ":x"},
+        {"title": "结尾冒号:", "order": True, "category": None, "book": 1.5},
+        {"title": "---分隔", "order": 1, "category": "...", "book": "\ufeffbom"},
+        {"title": "行\u2028分隔", "order": 1, "category": "\x85", "book": "\U0001F600"},
+        {},
+    ]
+
+    # 已有的转换结果也拿来对比
+    for index_md in (PROJECT_ROOT / "data/processed").rglob("index.md"):
+        text = index_md.read_text(encoding="utf-8")
+        end = text.find("\n---\n", 4)
+        if text.startswith("---\n") and end != -1:
+            samples.append(yaml.safe_load(text[4:end]) or {})
+
+    bad = 0
+    fast = 0
+    for fm in samples:
+        expected = yaml.dump(fm, allow_unicode=True)
+        if dump_front_matter(fm) != expected:
+            bad += 1
+            print(f"❌ 不一致: {fm!r}")
+        if fm and all(type(v) is int or v == "" or (type(v) is str and is_plain(k, v)) for k, v in fm.items()):
+            fast += 1
+
+    print(f"{'✅' if bad == 0 else '❌'} {len(samples)} 个样本，{bad} 个不一致，{fast} 个走快速路径")
+
+    fm = samples[0]
+    t_yaml = timeit.timeit(lambda: yaml.dump(fm, allow_unicode=True), number=2000)
+    t_fast = timeit.timeit(lambda: dump_front_matter(fm), number=2000)
+    print(f"⏱️ yaml.dump {t_yaml / 2 * 1000:.1f} µs/篇，dump_front_matter {t_fast / 2 * 1000:.1f} µs/篇")
+    sys.exit(1 if bad else 0)
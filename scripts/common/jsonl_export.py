@@ -0,0 +1,115 @@
+"""
+JSONL 流式导出：转换时每写完一篇文章就追加一行 JSON，
+下游 (iskra-data 建索引等) 顺序读一遍即可拿到整个语料，不用遍历目录、不用解析 YAML。
+
+每行字段：book, path, title, order, category, pages ([起始页, 结束页]，1-based，EPUB 为 null),
+markdown, footnotes (文末注脚列表), images (assets/ 下的文件名)
+
+按文件后缀自动压缩：.jsonl = 不压缩，.jsonl.gz = gzip，.jsonl.zst = zstd
+(zstd 需要 Python 3.14 的 compression.zstd，或 pip install zstandard)
+"""
+
+import gzip
+import io
+import json
+from pathlib import Path
+
+from corpus_store import split_footnotes
+
+
+def open_text_stream(path, append=False):
+    """按后缀打开一个写文本的流；append = 接在已有内容后面 (压缩格式追加一个新的压缩帧)"""
+    path = Path(path)
+    mode = "a" if append else "w"
+    if path.suffix == ".gz":
+        return gzip.open(path, mode + "t", encoding="utf-8")
+    if path.suffix == ".zst":
+        try:
+            from compression import zstd  # Python 3.14+
+            return zstd.open(path, mode + "t", encoding="utf-8")
+        except ImportError:
+            pass
+        try:
+            import zstandard
+        except ImportError:
+            raise RuntimeError("写 .zst 需要 Python 3.14+ 或 pip install zstandard")
+        raw = zstandard.ZstdCompressor().stream_writer(open(path, mode + "b"), closefd=True)
+        return io.TextIOWrapper(raw, encoding="utf-8")
+    if append:
+        _drop_torn_line(path)
+    return open(path, mode, encoding="utf-8")
+
+
+def _drop_torn_line(path):
+    """上次中断时最后一行可能只写了一半，追加前截掉"""
+    if not path.exists():
+        return
+    with open(path, "rb+") as f:
+        data = f.read()
+        if data and not data.endswith(b"\n"):
+            f.truncate(data.rfind(b"\n") + 1)
+
+
+def open_text_reader(path):
+    """按后缀打开一个读文本的流 (下游读 JSONL 用)"""
+    path = Path(path)
+    if path.suffix == ".gz":
+        return gzip.open(path, "rt", encoding="utf-8")
+    if path.suffix == ".zst":
+        try:
+            from compression import zstd
+            return zstd.open(path, "rt", encoding="utf-8")
+        except ImportError:
+            pass
+        import zstandard
+        raw = zstandard.ZstdDecompressor().stream_reader(open(path, "rb"), closefd=True)
+        return io.TextIOWrapper(raw, encoding="utf-8")
+    return open(path, "r", encoding="utf-8")
+
+
+def iter_jsonl(path):
+    """逐行读出文章记录"""
+    with open_text_reader(path) as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+class JsonlExporter:
+    def __init__(self, path, flush_every=50, append=False):
+        """
+        :param path: 输出文件，后缀决定压缩方式；已存在会被覆盖
+        :param flush_every: 每多少篇文章刷一次缓冲，下游可以边转边读
+        :param append: True = 接着已有文件写 (断点续跑)，不覆盖
+        """
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.flush_every = flush_every
+        self.count = 0
+        self.stream = open_text_stream(self.path, append=append)
+
+    def write_article(self, rel_dir, front_matter, markdown, images=(), pages=None):
+        """
+        追加一篇文章，参数同 BundleWriter.write_article
+        :param pages: (起始页, 结束页)，1-based，来源没有页码时为 None
+        """
+        record = {
+            "book": front_matter.get("book"),
+            "path": Path(rel_dir).as_posix(),
+            "title": front_matter.get("title"),
+            "order": front_matter.get("order"),
+            "category": front_matter.get("category"),
+            "pages": list(pages) if pages is not None else None,
+            "markdown": markdown,
+            "footnotes": split_footnotes(markdown),
+            "images": [filename for filename, _ in images],
+        }
+        self.stream.write(json.dumps(record, ensure_ascii=False))
+        self.stream.write("\n")
+
+        self.count += 1
+        if self.count % self.flush_every == 0:
+            self.stream.flush()
+
+    def close(self):
+        self.stream.close()
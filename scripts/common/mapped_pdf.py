@@ -0,0 +1,29 @@
+"""
+用内存映射 (mmap) 打开 PDF：多个工作进程 / 线程转换同一卷时，fitz.open(路径) 各自按块读文件、各自缓冲；
+改成把文件只读映射进内存，再从映射的缓冲区打开 (fitz.open(stream=...)，MuPDF 直接读这块内存，不复制)，
+所有工作者读到的都是操作系统页缓存里的同一份物理页，打开时也不用先读一遍文件。
+
+注意：映射的页算在每个进程的 RSS 里 (共享页重复计数)，看整体内存要看 PSS (按共享进程数均摊)。
+"""
+
+import mmap
+import os
+
+import fitz
+
+
+def open_pdf(path, mapped=True):
+    """
+    打开 PDF
+    :param path: PDF 路径
+    :param mapped: True = 只读映射后从内存打开；False = 普通的 fitz.open(路径)
+    :return: fitz.Document；映射随 Document 对象一起释放
+    """
+    if not mapped:
+        return fitz.open(path)
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return fitz.open(path)  # 空文件不能映射，交给 fitz 报错
+        buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    # 同时传路径：doc.name 保持为文件路径 (解析器的分隔线、页面缓存按它区分不同的卷)，文件类型也按扩展名判断
+    return fitz.open(str(path), stream=memoryview(buffer))
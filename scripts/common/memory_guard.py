@@ -0,0 +1,77 @@
+"""
+内存上限模式：处理两千多页的大部头时，MuPDF 会在同一个 Document 里积攒页面对象、字体和解码缓存，
+进程内存随循环一路上涨。MemoryGuard 在每篇文章后收缩 MuPDF 缓存，每隔若干篇重新打开文档，
+并记录峰值内存 (RSS)，方便在小内存机器上并行跑整套全集。
+"""
+
+import gc
+import sys
+
+import fitz
+
+from mapped_pdf import open_pdf
+
+try:
+    import resource  # 仅 Unix
+except ImportError:
+    resource = None
+
+
+def current_rss_mb():
+    """当前进程常驻内存 (MB)，取不到返回 None（仅 Linux 读 /proc）"""
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+    except (OSError, ValueError, IndexError):
+        return None
+    return pages * resource.getpagesize() / 1024 / 1024 if resource else None
+
+
+def peak_rss_mb():
+    """进程峰值常驻内存 (MB)，取不到返回 None"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux 单位是 KB，macOS 是字节
+    if sys.platform == "darwin":
+        return peak / 1024 / 1024
+    return peak / 1024
+
+
+class MemoryGuard:
+    def __init__(self, pdf_path, reopen_every=200, mapped=False):
+        """
+        :param pdf_path: PDF 路径，重新打开文档时使用
+        :param reopen_every: 每处理多少篇文章重新打开一次文档 (0 = 只收缩缓存，不重开)
+        :param mapped: 重新打开时是否用内存映射 (见 mapped_pdf.py)
+        """
+        self.pdf_path = pdf_path
+        self.reopen_every = reopen_every
+        self.mapped = mapped
+        self.articles_done = 0
+        self.reopen_count = 0
+
+    def after_article(self, doc):
+        """
+        每篇文章处理完后调用：释放页面资源、收缩 MuPDF 缓存，到点了重新打开文档
+        :return: 之后要继续使用的 Document（可能是新打开的）
+        """
+        self.articles_done += 1
+        gc.collect()  # 回收已不再引用的 Page 对象
+        fitz.TOOLS.store_shrink(100)  # 清空 MuPDF 全局缓存 (字体、图片、解码后的对象)
+
+        if self.reopen_every and self.articles_done % self.reopen_every == 0:
+            doc.close()
+            doc = open_pdf(self.pdf_path, self.mapped)
+            self.reopen_count += 1
+        return doc
+
+    def report(self):
+        """结束时的内存报告"""
+        peak, current = peak_rss_mb(), current_rss_mb()
+        if peak is not None and current is not None:
+            peak = max(peak, current)  # ru_maxrss 更新有延迟
+        peak_text = f"{peak:.0f} MB" if peak is not None else "未知"
+        current_text = f"{current:.0f} MB" if current is not None else "未知"
+        return (f"内存: 峰值 RSS {peak_text}，当前 {current_text}，"
+                f"共 {self.articles_done} 篇，重新打开文档 {self.reopen_count} 次")
@@ -0,0 +1,190 @@
+"""
+页面级结果缓存：把单页的中间结果（分类后的正文行、注脚行、图片、split_y）存到磁盘。
+键 = 解析器配置哈希 + 页面输入哈希，改了书签范围、修好书签重新存盘后重跑，内容没变的页直接命中。
+按总大小淘汰（最久未用的先删）。
+
+页面输入哈希只看解析真正读到的东西，与文件里的对象编号无关 (修书签重新存盘可能会重排编号)：
+- 页面尺寸、旋转、内容流
+- 页面资源 (字体、图片、表单 XObject……)：引用的对象递归换成它的内容哈希，流对象连同解码后的字节一起算
+  (/Length 和压缩方式不算：重新存盘时可能从间接对象变成直接数字、换一种压缩)
+  各卷里有内容流完全相同、图片却不同的页，只看内容流会串卷
+- 调用方给的额外输入 (如邻页的页面哈希：矢量图很多的页要参考邻页的分割线)
+"""
+
+import hashlib
+import os
+import pickle
+import re
+import threading
+import uuid
+from pathlib import Path
+
+REF_RE = re.compile(r"\b(\d+) (\d+) R\b")          # PDF 间接引用 "12 0 R"
+LENGTH_RE = re.compile(r"/Length(?: \d+ \d+ R| \d+)")  # 流长度，随存盘方式变化，不算进哈希
+
+
+def hash_config(*parts) -> str:
+    """解析器配置哈希：把配置项的 repr 拼起来取 sha1（FONT_MAP、各种阈值、版本号等）"""
+    h = hashlib.sha1()
+    for part in parts:
+        h.update(repr(part).encode("utf-8"))
+        h.update(b"\x1f")
+    return h.hexdigest()
+
+
+def hash_object(doc, xref, memo, active=frozenset()):
+    """
+    PDF 对象的内容哈希：对象源码 (去掉 /Length) 里的引用递归换成被引用对象的哈希，流对象再加上解码后的字节
+    :param memo: xref -> 哈希，同一文档里每个对象只算一次
+    :param active: 正在计算的 xref (引用成环时不再往下走)
+    """
+    if xref in memo:
+        return memo[xref]
+    if xref in active:
+        return "cycle"
+    active = active | {xref}
+    h = hashlib.sha1()
+    source = LENGTH_RE.sub("", doc.xref_object(xref, compressed=True))
+    h.update(REF_RE.sub(lambda m: hash_object(doc, int(m.group(1)), memo, active), source).encode("utf-8"))
+    if doc.xref_is_stream(xref):
+        h.update(doc.xref_stream(xref) or b"")
+    memo[xref] = h.hexdigest()
+    return memo[xref]
+
+
+def hash_page(page, memo) -> str:
+    """页面输入哈希：尺寸 + 旋转 + 内容流 + 资源 (引用展开成内容哈希；资源继承自上级页面树节点时往上找)"""
+    doc = page.parent
+    h = hashlib.sha1()
+    h.update(repr((tuple(page.mediabox), tuple(page.rect), page.rotation)).encode("ascii"))
+    h.update(page.read_contents())
+
+    xref = page.xref
+    kind, value = doc.xref_get_key(xref, "Resources")
+    while kind == "null":
+        kind, parent = doc.xref_get_key(xref, "Parent")
+        if kind != "xref":
+            break
+        xref = int(parent.split()[0])
+        kind, value = doc.xref_get_key(xref, "Resources")
+    if kind == "xref":
+        h.update(hash_object(doc, int(value.split()[0]), memo).encode("ascii"))
+    elif kind != "null":
+        h.update(REF_RE.sub(lambda m: hash_object(doc, int(m.group(1)), memo), value).encode("utf-8"))
+    return h.hexdigest()
+
+
+class PageCache:
+    def __init__(self, cache_dir, max_bytes=512 * 1024 * 1024):
+        """
+        :param cache_dir: 缓存目录 (pathlib.Path)，不存在会自动创建
+        :param max_bytes: 缓存总大小上限，超过后按最近使用时间淘汰
+        """
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.total_bytes = sum(p.stat().st_size for p in self.cache_dir.rglob("*.pkl"))
+        self.lock = threading.Lock()  # 流水线的读页段会有多个线程同时用缓存
+
+    def _path(self, key):
+        return self.cache_dir / key[:2] / f"{key}.pkl"
+
+    def page_hash(self, page):
+        """页面输入哈希，每个文档里每页只算一次 (备忘录挂在文档对象上，随文档一起释放)"""
+        doc = page.parent
+        with self.lock:
+            memo = getattr(doc, "_page_cache_memo", None)
+            if memo is None:
+                memo = doc._page_cache_memo = {"pages": {}, "objects": {}}
+            value = memo["pages"].get(page.number)
+        if value is None:
+            # 多个线程可能同时算同一页，结果相同，谁写进备忘录都一样
+            value = hash_page(page, memo["objects"])
+            with self.lock:
+                memo["pages"][page.number] = value
+        return value
+
+    def key_for(self, page, config_hash, *extra):
+        """
+        缓存键：配置哈希 + 页面输入哈希 + 额外输入
+        :param extra: 页面本身以外、影响结果的输入 (repr 进键里)
+        """
+        h = hashlib.sha1(f"{config_hash}:{self.page_hash(page)}".encode("ascii"))
+        for part in extra:
+            h.update(b"\x1f" + repr(part).encode("utf-8"))
+        return h.hexdigest()
+
+    def get(self, key):
+        """命中返回缓存对象，否则返回 None"""
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                value = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError):
+            with self.lock:
+                self.misses += 1
+            return None
+        try:
+            os.utime(path)  # 刷新使用时间，淘汰时靠后
+        except OSError:
+            pass
+        with self.lock:
+            self.hits += 1
+        return value
+
+    def put(self, key, value):
+        """
+        写入缓存（先写临时文件再改名，中断不会留下半截文件）
+        多个进程 / 线程共用缓存目录时可能同时写同一个键：临时文件名带进程号 + 随机串，各写各的，谁最后改名谁生效
+        """
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        data = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        tmp_path = path.with_name(f"{path.name}.{os.getpid()}-{uuid.uuid4().hex}.tmp")
+        try:
+            old_size = path.stat().st_size if path.exists() else 0
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"⚠️ 页面缓存写入失败: {e}")
+            try:
+                tmp_path.unlink()
+            except OSError:
+                pass
+            return
+        with self.lock:
+            self.total_bytes += len(data) - old_size
+            over = self.total_bytes > self.max_bytes
+        if over:
+            self.evict()
+
+    def evict(self):
+        """按最近使用时间从旧到新删除，直到总大小降到上限的 90%"""
+        entries = []
+        for p in self.cache_dir.rglob("*.pkl"):
+            try:
+                st = p.stat()
+            except OSError:
+                continue
+            entries.append((st.st_mtime, st.st_size, p))
+        entries.sort()
+
+        total = sum(size for _, size, _ in entries)
+        target = self.max_bytes * 0.9
+        for _, size, p in entries:
+            if total <= target:
+                break
+            try:
+                p.unlink()
+                total -= size
+            except OSError:
+                pass
+        with self.lock:
+            self.total_bytes = total
+
+    def stats(self):
+        """命中统计，供转换结束时打印"""
+        return f"页面缓存: 命中 {self.hits} / 未命中 {self.misses}，占用 {self.total_bytes / 1024 / 1024:.1f} MB"
@@ -0,0 +1,198 @@
+"""
+多段流水线：每一段是一组线程，段与段之间用有界队列连接，上游产出的同时下游已经在处理，
+最慢的一段决定总耗时，其他段和它重叠执行。
+
+每段的处理函数 fn(item) 返回一个可迭代对象 (0 个、1 个或多个产出)，
+所以同一个接口既能做一对一的转换，也能做“攒够一篇文章再产出”的组装。
+运行时记录每段的忙碌时间、等上游 (饿) / 等下游 (堵) 的时间，并定时采样各队列的深度，
+结束后 report() 指出瓶颈段。
+
+用法：
+    pipeline = Pipeline([Stage("read", read_fn, workers=2), Stage("format", format_fn)])
+    for out in pipeline.run(items):
+        ...  # 主线程消费最后一段的产出 (本身也计入报告)
+    print(pipeline.report())
+"""
+
+import queue
+import threading
+import time
+
+_DONE = object()  # 队列结束标记
+
+
+class Stage:
+    def __init__(self, name, fn, workers=1, queue_size=16):
+        """
+        :param name: 段名 (报告里用)
+        :param fn: 处理函数 fn(item) -> 可迭代的产出；多线程调用时需自己保证线程安全
+        :param workers: 线程数
+        :param queue_size: 本段输入队列的容量 (满了上游就要等)
+        """
+        self.name = name
+        self.fn = fn
+        self.workers = workers
+        self.queue_size = queue_size
+
+        self.items_in = 0
+        self.items_out = 0
+        self.busy = 0.0     # fn 执行时间合计
+        self.starved = 0.0  # 等上游的时间合计
+        self.blocked = 0.0  # 等下游队列腾位置的时间合计
+        self.depth_sum = 0
+        self.depth_max = 0
+        self.samples = 0
+        self.lock = threading.Lock()
+
+
+class Pipeline:
+    def __init__(self, stages, sample_interval=0.05):
+        self.stages = stages
+        self.sample_interval = sample_interval
+        self.queues = [queue.Queue(maxsize=s.queue_size) for s in stages]
+        self.consumer = Stage("consume", None, queue_size=stages[-1].queue_size)  # 主线程的消费循环
+        self.output = queue.Queue(maxsize=self.consumer.queue_size)
+        self.stop = threading.Event()
+        self.errors = []
+        self.wall = 0.0
+
+    def _put(self, q, item):
+        """放进队列；出错停止时放弃，避免卡死在满队列上"""
+        while not self.stop.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _worker(self, index, remaining):
+        stage = self.stages[index]
+        in_q = self.queues[index]
+        out_q = self.queues[index + 1] if index + 1 < len(self.stages) else self.output
+        try:
+            while not self.stop.is_set():
+                t = time.perf_counter()
+                try:
+                    item = in_q.get(timeout=0.1)
+                except queue.Empty:
+                    with stage.lock:
+                        stage.starved += time.perf_counter() - t
+                    continue
+                waited = time.perf_counter() - t
+                if item is _DONE:
+                    break
+
+                t = time.perf_counter()
+                blocked = 0.0
+                produced = 0
+                for out in stage.fn(item):
+                    t_put = time.perf_counter()
+                    if not self._put(out_q, out):
+                        return
+                    blocked += time.perf_counter() - t_put
+                    produced += 1
+                busy = time.perf_counter() - t - blocked
+
+                with stage.lock:
+                    stage.items_in += 1
+                    stage.items_out += produced
+                    stage.starved += waited
+                    stage.busy += busy
+                    stage.blocked += blocked
+        except BaseException as e:
+            self.errors.append((stage.name, e))
+            self.stop.set()
+        finally:
+            # 本段最后一个退出的线程通知下游：上游已经结束
+            with stage.lock:
+                remaining[index] -= 1
+                last = remaining[index] == 0
+            if last:
+                n = self.stages[index + 1].workers if index + 1 < len(self.stages) else 1
+                for _ in range(n):
+                    self._put(out_q, _DONE)
+
+    def _feed(self, items):
+        try:
+            for item in items:
+                if not self._put(self.queues[0], item):
+                    return
+        except BaseException as e:
+            self.errors.append(("source", e))
+            self.stop.set()
+        finally:
+            for _ in range(self.stages[0].workers):
+                self._put(self.queues[0], _DONE)
+
+    def _sample(self):
+        targets = list(zip(self.stages, self.queues)) + [(self.consumer, self.output)]
+        while not self.stop.wait(self.sample_interval):
+            for stage, q in targets:
+                depth = q.qsize()
+                stage.depth_sum += depth
+                stage.depth_max = max(stage.depth_max, depth)
+                stage.samples += 1
+
+    def run(self, items):
+        """
+        启动流水线，按完成顺序逐个产出最后一段的结果；任何一段出错都会停下并在这里抛出
+        """
+        t0 = time.perf_counter()
+        remaining = [s.workers for s in self.stages]
+        threads = [threading.Thread(target=self._feed, args=(items,), name="pipeline-source", daemon=True)]
+        for i, stage in enumerate(self.stages):
+            for w in range(stage.workers):
+                threads.append(threading.Thread(target=self._worker, args=(i, remaining),
+                                                name=f"pipeline-{stage.name}-{w}", daemon=True))
+        sampler = threading.Thread(target=self._sample, name="pipeline-sampler", daemon=True)
+        for t in threads:
+            t.start()
+        sampler.start()
+
+        try:
+            while True:
+                t = time.perf_counter()
+                try:
+                    item = self.output.get(timeout=0.1)
+                except queue.Empty:
+                    self.consumer.starved += time.perf_counter() - t
+                    if self.stop.is_set():
+                        break
+                    continue
+                self.consumer.starved += time.perf_counter() - t
+                if item is _DONE:
+                    break
+                t = time.perf_counter()
+                yield item
+                self.consumer.busy += time.perf_counter() - t
+                self.consumer.items_in += 1
+        finally:
+            self.stop.set()
+            for t in threads:
+                t.join()
+            sampler.join()
+            self.wall = time.perf_counter() - t0
+
+        if self.errors:
+            name, error = self.errors[0]
+            raise RuntimeError(f"流水线 {name} 段出错: {error!r}") from error
+
+    def report(self):
+        """各段的忙碌率、队列深度，以及瓶颈段"""
+        wall = self.wall or 1e-9
+        lines = [f"🏭 流水线 {wall:.1f}s："]
+        load = {}
+        for stage in self.stages + [self.consumer]:
+            workers = stage.workers
+            util = stage.busy / (wall * workers)
+            load[stage.name] = util
+            avg_depth = stage.depth_sum / stage.samples if stage.samples else 0.0
+            lines.append(
+                f"   {stage.name:<10} ×{workers}  处理 {stage.items_in:>5} 件  忙碌 {stage.busy:6.1f}s ({util:4.0%})"
+                f"  等上游 {stage.starved:6.1f}s  等下游 {stage.blocked:6.1f}s"
+                f"  输入队列 平均 {avg_depth:4.1f} / 最大 {stage.depth_max} (容量 {stage.queue_size})"
+            )
+        bottleneck = max(load, key=load.get)
+        lines.append(f"   🐢 瓶颈: {bottleneck} (忙碌率最高；它前面的队列常满、后面的段常在等上游)")
+        return "\n".join(lines)
@@ -0,0 +1,303 @@
+"""
+全文检索：对转换产物建 CJK 字符 n-gram 倒排索引 (SQLite FTS5)，按 书 / 分类 / 标题 / 段落 定位，
+几十卷里找一个词组不用再 grep 几万个文件。
+
+索引方式：段落文本按连续的字母数字片段切成重叠的二元组 ("革命党" -> "革命 命党 党")，
+查询时把关键词同样切开，做短语匹配，等价于子串查找；单字查询走前缀索引。
+
+用法：
+- python search_index.py update [来源 ...]   增量更新索引 (只增改，不删除)
+      来源可以是 Page Bundle 输出目录 (扫描 index.md)，也可以是转换器导出的 .jsonl / .jsonl.gz / .jsonl.zst
+      正文没变的文章直接跳过；不给来源时用 INDEX_SOURCES
+- python search_index.py sync [来源 ...]     同上，另外把来源里某本书已经没有的文章从索引删除
+      只在来源是这些书的完整产物时用：单卷重跑、断点续跑的 JSONL 只含部分文章，sync 会删掉其余文章的索引
+- python search_index.py 关键词 [关键词 ...]     查询，多个关键词需同时出现在同一段
+"""
+
+import hashlib
+import re
+import sqlite3
+import sys
+import time
+import unicodedata
+from pathlib import Path
+
+import yaml
+
+from jsonl_export import iter_jsonl
+
+# ================= 🎛️ 配置 =================
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent.parent
+SEARCH_DB = PROJECT_ROOT / "data/processed/search.sqlite"
+INDEX_SOURCES = [PROJECT_ROOT / "data/processed"]  # update 不给来源时扫描这些
+SEARCH_BOOK = None    # None = 查全部书；或填书名只查这一本
+MAX_HITS = 20         # 最多显示多少条
+CONTEXT_CHARS = 30    # 命中前后各显示多少字
+
+# ================= 索引逻辑 =================
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS articles (
+    id        INTEGER PRIMARY KEY,
+    book      TEXT NOT NULL,
+    path      TEXT NOT NULL,
+    title     TEXT,
+    category  TEXT,
+    order_no  INTEGER,
+    digest    TEXT NOT NULL,       -- 正文摘要，没变就跳过
+    UNIQUE (book, path)
+);
+CREATE TABLE IF NOT EXISTS paragraphs (
+    id         INTEGER PRIMARY KEY,  -- 即 FTS 的 rowid
+    article_id INTEGER NOT NULL,
+    para_no    INTEGER NOT NULL,
+    text       TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS paragraphs_article ON paragraphs (article_id);
+CREATE VIRTUAL TABLE IF NOT EXISTS para_fts USING fts5 (grams, content='', prefix='1', tokenize='unicode61');
+"""
+
+RUN_RE = re.compile(r'[^\W_]+')                      # 连续的字母数字片段
+NOTE_REF_RE = re.compile(r'\[\^(\d+|x)\]:?\s?')     # 注脚引用 / 注脚定义开头
+HEADING_RE = re.compile(r'^#+\s+')
+QUOTE_RE = re.compile(r'^(>\s?)+', re.M)           # 引用块每行开头的 >
+SOFT_BREAK_RE = re.compile(r'(?<=[^\x00-\x7f])\n(?=[^\x00-\x7f])')  # 中文行内换行直接拼接
+
+
+def normalize(text):
+    """全角转半角、统一大小写，索引和查询用同一套规则"""
+    return unicodedata.normalize("NFKC", text).casefold()
+
+
+def to_grams(text):
+    """切成二元组，每个片段末尾补一个单字，保证任意单字都能被前缀查到"""
+    tokens = []
+    for run in RUN_RE.findall(normalize(text)):
+        tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+        tokens.append(run[-1])
+    return " ".join(tokens)
+
+
+def to_match_query(query):
+    """关键词 -> FTS5 查询：每个片段一个短语，片段之间 AND"""
+    parts = []
+    for run in RUN_RE.findall(normalize(query)):
+        if len(run) == 1:
+            parts.append(f'"{run}"*')
+        else:
+            parts.append('"' + " ".join(run[i:i + 2] for i in range(len(run) - 1)) + '"')
+    return " AND ".join(parts)
+
+
+def split_paragraphs(markdown):
+    """把 Markdown 拆成可检索的段落 (去掉图片、标题井号、引用符号、注脚引用)"""
+    paragraphs = []
+    for para in markdown.split("\n\n"):
+        para = para.strip()
+        if not para or para.startswith("!["):
+            continue
+        para = HEADING_RE.sub("", para)
+        para = QUOTE_RE.sub("", para)
+        para = NOTE_REF_RE.sub("", para)
+        para = SOFT_BREAK_RE.sub("", para).replace("\n", " ")
+        if RUN_RE.search(para):
+            paragraphs.append(para)
+    return paragraphs
+
+
+def read_bundle(index_md):
+    """读一个 index.md，拆出 front matter 和正文"""
+    text = index_md.read_text(encoding="utf-8")
+    if not text.startswith("---\n"):
+        return {}, text
+    end = text.find("\n---\n", 4)
+    if end == -1:
+        return {}, text
+    return yaml.safe_load(text[4:end]) or {}, text[end + 5:].lstrip("\n")
+
+
+def iter_bundle_dir(root):
+    """遍历 Page Bundle 目录树，产出与 JSONL 相同字段的记录"""
+    root = Path(root)
+    for index_md in sorted(root.rglob("index.md")):
+        front_matter, markdown = read_bundle(index_md)
+        article_dir = index_md.parent
+        book = front_matter.get("book") or root.name
+        # path 相对于书的输出目录 (目录名与书名一致)，与语料库 / JSONL 的 path 对齐
+        book_root = next((p for p in article_dir.parents if p.name == book), root)
+        yield {
+            "book": book,
+            "path": article_dir.relative_to(book_root).as_posix(),
+            "title": front_matter.get("title"),
+            "order": front_matter.get("order"),
+            "category": front_matter.get("category"),
+            "markdown": markdown,
+        }
+
+
+class SearchIndex:
+    def __init__(self, db_path):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(self.db_path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+
+    def _delete_article(self, article_id):
+        cur = self.conn.cursor()
+        rows = cur.execute("SELECT id, text FROM paragraphs WHERE article_id = ?", (article_id,)).fetchall()
+        # contentless FTS 删除时要给出原来的内容
+        cur.executemany(
+            "INSERT INTO para_fts (para_fts, rowid, grams) VALUES ('delete', ?, ?)",
+            [(pid, to_grams(text)) for pid, text in rows],
+        )
+        cur.execute("DELETE FROM paragraphs WHERE article_id = ?", (article_id,))
+        cur.execute("DELETE FROM articles WHERE id = ?", (article_id,))
+
+    def index_article(self, record):
+        """
+        索引 (或重建) 一篇文章
+        :param record: dict，字段同 JSONL 导出 (book, path, title, order, category, markdown)
+        :return: True = 有更新，False = 内容没变跳过
+        """
+        book, path = record["book"], record["path"]
+        digest = hashlib.sha1(
+            "\x00".join(str(record.get(k) or "") for k in ("title", "order", "category", "markdown")).encode("utf-8")
+        ).hexdigest()
+
+        cur = self.conn.cursor()
+        row = cur.execute("SELECT id, digest FROM articles WHERE book = ? AND path = ?", (book, path)).fetchone()
+        if row:
+            if row[1] == digest:
+                return False
+            self._delete_article(row[0])
+
+        cur.execute(
+            "INSERT INTO articles (book, path, title, category, order_no, digest) VALUES (?, ?, ?, ?, ?, ?)",
+            (book, path, record.get("title"), record.get("category"), record.get("order"), digest),
+        )
+        article_id = cur.lastrowid
+        for para_no, text in enumerate(split_paragraphs(record["markdown"]), start=1):
+            cur.execute("INSERT INTO paragraphs (article_id, para_no, text) VALUES (?, ?, ?)", (article_id, para_no, text))
+            cur.execute("INSERT INTO para_fts (rowid, grams) VALUES (?, ?)", (cur.lastrowid, to_grams(text)))
+        return True
+
+    def update(self, source, full_sync=False):
+        """
+        从一个来源增量更新
+        :param source: Page Bundle 目录，或 .jsonl / .jsonl.gz / .jsonl.zst
+        :param full_sync: True = 来源是其中每本书的完整产物，索引里这本书在来源中没有的文章删掉；
+                          False (默认) = 只增改，来源可以只含部分文章
+        :return: (更新篇数, 跳过篇数, 删除篇数)
+        """
+        source = Path(source)
+        records = iter_bundle_dir(source) if source.is_dir() else iter_jsonl(source)
+
+        updated = skipped = 0
+        seen = {}  # book -> 本次见到的 path
+        with self.conn:
+            for record in records:
+                seen.setdefault(record["book"], set()).add(record["path"])
+                if self.index_article(record):
+                    updated += 1
+                else:
+                    skipped += 1
+
+            # 来源里这本书已经没有的文章 (改了标题、删了书签) 从索引删掉
+            removed = 0
+            for book, paths in (seen.items() if full_sync else ()):
+                for article_id, path in self.conn.execute("SELECT id, path FROM articles WHERE book = ?", (book,)).fetchall():
+                    if path not in paths:
+                        self._delete_article(article_id)
+                        removed += 1
+        return updated, skipped, removed
+
+    def search(self, query, book=None, limit=MAX_HITS, context=CONTEXT_CHARS):
+        """
+        :return: (总命中段落数, [{book, category, title, path, para_no, snippet}, ...])，按书、页序、段落排列
+        """
+        match = to_match_query(query)
+        if not match:
+            return 0, []
+
+        where = "para_fts MATCH ?"
+        params = [match]
+        if book is not None:
+            where += " AND a.book = ?"
+            params.append(book)
+        base = (
+            " FROM para_fts JOIN paragraphs p ON p.id = para_fts.rowid JOIN articles a ON a.id = p.article_id"
+            f" WHERE {where}"
+        )
+
+        total = self.conn.execute("SELECT count(*)" + base, params).fetchone()[0]
+        rows = self.conn.execute(
+            "SELECT a.book, a.category, a.title, a.path, p.para_no, p.text" + base
+            + " ORDER BY a.book, a.order_no, a.path, p.para_no LIMIT ?",
+            params + [limit],
+        ).fetchall()
+
+        first_run = RUN_RE.findall(normalize(query))[0]
+        hits = []
+        for art_book, category, title, path, para_no, text in rows:
+            hits.append({
+                "book": art_book, "category": category, "title": title, "path": path,
+                "para_no": para_no, "snippet": make_snippet(text, first_run, context),
+            })
+        return total, hits
+
+    def close(self):
+        self.conn.close()
+
+
+def make_snippet(text, run, context):
+    """
+    截取命中位置前后的上下文，命中部分用【】标出
+    在规范化后的文本里找，再把位置换回原文：规范化会改变长度 (如 "…" -> "...")，不能拿它的下标直接切原文
+    """
+    normalized, origin = [], []  # origin[i] = 规范化文本第 i 个字符来自原文的第几个字符
+    for i, ch in enumerate(text):
+        n = normalize(ch)
+        normalized.append(n)
+        origin.extend([i] * len(n))
+    pos = "".join(normalized).find(run)
+    if pos == -1:
+        return text[:context * 2]
+    hit_start, hit_end = origin[pos], origin[pos + len(run) - 1] + 1
+    start = max(0, hit_start - context)
+    end = min(len(text), hit_end + context)
+    return (
+        ("…" if start > 0 else "") + text[start:hit_start]
+        + "【" + text[hit_start:hit_end] + "】"
+        + text[hit_end:end] + ("…" if end < len(text) else "")
+    )
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    if not args:
+        print(__doc__)
+        sys.exit(0)
+
+    index = SearchIndex(SEARCH_DB)
+    if args[0] in ("update", "sync"):
+        for source in [Path(s) for s in args[1:]] or INDEX_SOURCES:
+            if not source.exists():
+                print(f"❌ 找不到来源: {source}")
+                continue
+            t = time.perf_counter()
+            updated, skipped, removed = index.update(source, full_sync=args[0] == "sync")
+            print(f"✅ {source.name}: 更新 {updated} 篇，未变 {skipped} 篇，删除 {removed} 篇 ({time.perf_counter() - t:.1f}s)")
+    else:
+        query = " ".join(args)
+        t = time.perf_counter()
+        total, hits = index.search(query, book=SEARCH_BOOK)
+        elapsed_ms = (time.perf_counter() - t) * 1000
+        for hit in hits:
+            where = " / ".join(x for x in (hit["book"], hit["category"], hit["title"]) if x)
+            print(f"📄 {where} ¶{hit['para_no']}")
+            print(f"   {hit['snippet']}")
+        print(f"\n🔍 “{query}”: 共 {total} 段命中，显示 {len(hits)} 条 ({elapsed_ms:.1f} ms)")
+    index.close()
@@ -0,0 +1,201 @@
+"""
+SQLite 任务队列：协调者把任务写进一个 SQLite 文件，任意多个工作进程 / 机器从中领取、定时心跳、完成，
+不需要任何服务，队列文件放在各机器都能访问的共享存储上就行。
+
+- 领取 (claim)：在一个写事务里取优先级最高的待办任务，记下工作者和租约到期时间
+- 心跳 (heartbeat)：处理期间定时续租；工作者崩溃 / 断网后租约过期，任务在下一次有人领取时回到待办，
+  attempts 达到 max_attempts 的不再重试，标记为失败
+- 完成 / 失败 (complete / fail)：只有仍持有租约的工作者能提交，租约被别人接手后迟到的结果会被忽略
+
+注意：
+- 租约按各机器的系统时间 (time.time()) 判断，机器之间要对时 (NTP)，租约时长要远大于时钟误差
+- 不用 WAL：WAL 依赖共享内存，网络文件系统 (NFS / SMB) 上不可用；用默认的回滚日志，靠文件锁互斥
+"""
+
+import contextlib
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id          INTEGER PRIMARY KEY,
+    key         TEXT NOT NULL UNIQUE,             -- 协调者给的任务名，重复入队时忽略
+    payload     TEXT NOT NULL,                    -- JSON
+    priority    REAL NOT NULL DEFAULT 0,          -- 大的先领
+    status      TEXT NOT NULL DEFAULT 'pending',  -- pending / running / done / failed
+    attempts    INTEGER NOT NULL DEFAULT 0,       -- 已领取次数
+    worker      TEXT,                             -- 当前 (或最后一个) 处理它的工作者
+    lease_until REAL,                             -- 租约到期时间 (time.time())，过期视为工作者已崩溃
+    error       TEXT,                             -- 最近一次失败原因
+    result      TEXT,                             -- 完成时工作者留下的 JSON
+    updated     REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_claim ON jobs (status, priority DESC, id);
+"""
+
+
+class WorkQueue:
+    def __init__(self, db_path, lease_seconds=120, max_attempts=3):
+        """
+        :param db_path: 队列文件，不存在会自动创建
+        :param lease_seconds: 租约时长，超过这么久没有心跳的任务会被收回
+        :param max_attempts: 每个任务最多领取几次 (含崩溃后的重试)
+        """
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.lock = threading.Lock()  # 心跳线程和工作线程共用一个连接
+
+        # isolation_level=None：事务自己用 BEGIN IMMEDIATE 开，领取时一开始就拿写锁，两个工作者不会领到同一个任务
+        self.conn = sqlite3.connect(self.db_path, timeout=60, isolation_level=None, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=DELETE")
+        self.conn.executescript(SCHEMA)
+
+    def _write(self, sql_list):
+        """在一个写事务里依次执行 [(sql, 参数), ...]，返回最后一条的 rowcount"""
+        with self.lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                rowcount = 0
+                for sql, params in sql_list:
+                    rowcount = self.conn.execute(sql, params).rowcount
+                self.conn.execute("COMMIT")
+            except BaseException:
+                self.conn.execute("ROLLBACK")
+                raise
+        return rowcount
+
+    # ---------- 协调者 ----------
+
+    def enqueue(self, jobs):
+        """
+        入队：jobs 为 [(key, payload, priority), ...]，payload 可 JSON 序列化
+        已经存在的 key 保持原状 (协调者重跑不会重复入队，也不会把已完成的任务重置)
+        :return: 新入队的任务数
+        """
+        now = time.time()
+        with self.lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                before = self.conn.total_changes
+                self.conn.executemany(
+                    "INSERT OR IGNORE INTO jobs (key, payload, priority, updated) VALUES (?, ?, ?, ?)",
+                    [(key, json.dumps(payload, ensure_ascii=False), priority, now) for key, payload, priority in jobs],
+                )
+                added = self.conn.total_changes - before
+                self.conn.execute("COMMIT")
+            except BaseException:
+                self.conn.execute("ROLLBACK")
+                raise
+        return added
+
+    def retry_failed(self):
+        """把失败的任务放回待办 (重新计算领取次数)，返回放回的个数"""
+        return self._write([(
+            "UPDATE jobs SET status = 'pending', attempts = 0, worker = NULL, lease_until = NULL, updated = ?"
+            " WHERE status = 'failed'", (time.time(),)
+        )])
+
+    @contextlib.contextmanager
+    def paused(self):
+        """
+        暂停派发：with 块在一个写事务里执行，期间工作者领不到任务 (claim 等写锁，最多等 60 秒)
+        用于协调者收拾共享输出目录：先确认没有进行中的任务，收拾完之前也不会有人开工
+        :return: (as) 进入时进行中的任务数 (已先收回租约过期的)
+        """
+        with self.lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._expire(time.time())
+                running = self.conn.execute("SELECT COUNT(*) FROM jobs WHERE status = 'running'").fetchone()[0]
+                yield running
+                self.conn.execute("COMMIT")
+            except BaseException:
+                self.conn.execute("ROLLBACK")
+                raise
+
+    def counts(self):
+        """{状态: 任务数}"""
+        with self.lock:
+            rows = self.conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        counts = {"pending": 0, "running": 0, "done": 0, "failed": 0}
+        counts.update(dict(rows))
+        return counts
+
+    def jobs(self, status):
+        """某状态的任务明细：[{"key", "worker", "attempts", "lease_until", "error"}, ...]"""
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT key, worker, attempts, lease_until, error FROM jobs WHERE status = ? ORDER BY id", (status,)
+            ).fetchall()
+        return [dict(zip(("key", "worker", "attempts", "lease_until", "error"), row)) for row in rows]
+
+    # ---------- 工作者 ----------
+
+    def claim(self, worker):
+        """
+        领取一个任务；先收回租约过期的任务
+        :return: {"id", "key", "payload", "attempt"}；没有待办任务返回 None
+        """
+        now = time.time()
+        with self.lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._expire(now)
+                row = self.conn.execute(
+                    "SELECT id, key, payload, attempts FROM jobs WHERE status = 'pending'"
+                    " ORDER BY priority DESC, id LIMIT 1"
+                ).fetchone()
+                if row is not None:
+                    self.conn.execute(
+                        "UPDATE jobs SET status = 'running', worker = ?, lease_until = ?, attempts = attempts + 1,"
+                        " updated = ? WHERE id = ?",
+                        (worker, now + self.lease_seconds, now, row[0]),
+                    )
+                self.conn.execute("COMMIT")
+            except BaseException:
+                self.conn.execute("ROLLBACK")
+                raise
+        if row is None:
+            return None
+        return {"id": row[0], "key": row[1], "payload": json.loads(row[2]), "attempt": row[3] + 1}
+
+    def _expire(self, now):
+        """租约过期的任务：还能重试的回到待办，否则标记失败 (调用方已开启写事务)"""
+        self.conn.execute(
+            "UPDATE jobs SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END,"
+            " error = '租约过期 (工作者 ' || COALESCE(worker, '?') || ' 崩溃或失联)', lease_until = NULL, updated = ?"
+            " WHERE status = 'running' AND lease_until < ?",
+            (self.max_attempts, now, now),
+        )
+
+    def heartbeat(self, job_id, worker):
+        """续租；返回 False 表示租约已被收回 (别的工作者可能已经接手)"""
+        now = time.time()
+        return self._write([(
+            "UPDATE jobs SET lease_until = ?, updated = ? WHERE id = ? AND worker = ? AND status = 'running'",
+            (now + self.lease_seconds, now, job_id, worker),
+        )]) == 1
+
+    def complete(self, job_id, worker, result=None):
+        """标记完成；返回 False 表示租约已失效，结果没有记入"""
+        return self._write([(
+            "UPDATE jobs SET status = 'done', lease_until = NULL, error = NULL, result = ?, updated = ?"
+            " WHERE id = ? AND worker = ? AND status = 'running'",
+            (json.dumps(result, ensure_ascii=False) if result is not None else None, time.time(), job_id, worker),
+        )]) == 1
+
+    def fail(self, job_id, worker, error):
+        """标记本次失败：还能重试的回到待办，否则标记失败"""
+        return self._write([(
+            "UPDATE jobs SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END,"
+            " lease_until = NULL, error = ?, updated = ? WHERE id = ? AND worker = ? AND status = 'running'",
+            (self.max_attempts, str(error), time.time(), job_id, worker),
+        )]) == 1
+
+    def close(self):
+        self.conn.close()
@@ -0,0 +1,448 @@
+import concurrent.futures
+import json
+import os
+import re
+import sys
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from pathlib import Path
+
+import fitz
+
+# 逐卷调用单卷转换器：沿用 pdf_converter_custom.py 仪表盘里的全部配置，只替换输入输出路径
+import pdf_converter_custom as converter
+# pdf_converter_custom 已把 scripts/common 加进 sys.path
+from bundle_writer import BundleWriter
+from checkpoint import CheckpointJournal, completed_books
+from corpus_store import CorpusStore, stored_paths
+from jsonl_export import JsonlExporter
+from lenin_parser import LeninParser
+from mapped_pdf import open_pdf
+from page_cache import PageCache
+
+# ==================== 🎛️ 仪表盘配置 ====================
+
+# 1. 路径配置
+PROJECT_ROOT = Path(__file__).resolve().parent.parent.parent.parent
+INPUT_DIR = PROJECT_ROOT / "data/raw/lenin/列宁全集（版本II-文字版）（完整书签版）"
+OUTPUT_ROOT = PROJECT_ROOT / "data/processed/lenin/列宁全集（版本II-文字版）（完整书签版）"
+
+# 2. 只转换这些卷 (None = 全部)，例如 [1, 2, 3]
+VOLUMES = None
+
+# 3. 并行工作者数 (进程 / 线程 / 子解释器，见第 5 项)
+# 1 = 逐卷顺序转换 (直接调用 converter.main())
+# >1 = 所有卷的文章放进同一个任务池，按预估耗时从大到小排 (LPT)，哪个工作者空了就去取下一篇；
+#      几百页的长文最先开工，一页的电报留到最后填空，不会出现其他进程都闲着、只等一篇长文的情况
+WORKERS = 1
+
+# 4. 耗时模型 (None = 只按页数估计)
+# 并行跑完记下每篇文章的实际解析耗时，下次按它排序；没记录的文章按本卷 (或全部) 平均每页耗时 × 页数估计
+COST_MODEL = PROJECT_ROOT / "data/cache/article_costs.json"
+
+# 5. 并行后端 (WORKERS > 1 时生效)；也可以在命令行指定：python batch_convert.py thread 8
+# "process"     = 进程池，任何 Python 构建都能用，每个进程一份内存
+# "thread"      = 线程池，自由线程构建 (python3.14t，无 GIL) 下真正并行，内存最省；每个线程各开一份 fitz.Document
+#                 普通构建有 GIL，线程不会更快
+# "interpreter" = 子解释器池 (concurrent.interpreters，Python 3.14+)，每个解释器有自己的 GIL；
+#                 要求 PyMuPDF 支持在子解释器里导入
+# 各后端在本机的速度、内存对比：scripts/utils/bench_executors.py
+EXECUTOR = "process"
+
+
+# ==================== ⚙️ 批量转换 ====================
+
+def volume_no(pdf_path):
+    """从文件名取卷号，用于排序 (第2卷 排在 第10卷 前面)"""
+    m = re.search(r'第(\d+)卷', pdf_path.stem)
+    return int(m.group(1)) if m else 0
+
+
+def list_volumes():
+    pdfs = sorted(INPUT_DIR.glob("*.pdf"), key=lambda p: (volume_no(p), p.name))
+    if VOLUMES is not None:
+        pdfs = [p for p in pdfs if volume_no(p) in VOLUMES]
+    return pdfs
+
+
+def convert_sequential(pdfs, done):
+    for i, pdf in enumerate(pdfs, start=1):
+        if pdf.stem in done:
+            print(f"⏩ [{i}/{len(pdfs)}] 已完成，跳过: {pdf.stem}")
+            continue
+        print(f"\n📦 [{i}/{len(pdfs)}] {pdf.stem}")
+        converter.INPUT_PDF = pdf
+        converter.OUTPUT_DIR = OUTPUT_ROOT / pdf.stem
+        converter.main()
+
+
+def output_exists(book):
+    """检查函数：文章目录 -> 是否还在这一卷的输出里 (核对断点日志用，输出被删过的文章要重新转换)"""
+    if converter.OUTPUT_BACKEND == "sqlite":
+        paths = stored_paths(converter.CORPUS_DB, book)
+        return lambda rel_dir: Path(rel_dir).as_posix() in paths
+    output_dir = OUTPUT_ROOT / book
+    return lambda rel_dir: (output_dir / rel_dir / "index.md").is_file()
+
+
+# ---------- 并行模式：规划 ----------
+
+def plan_volume(pdf):
+    """
+    按转换器的规则 (SPLIT_LEVEL、黑名单、书签页码) 列出一卷的文件夹和文章，不解析页面
+    :return: (文件夹相对路径列表, 文章任务列表)
+    """
+    doc = fitz.open(pdf)
+    try:
+        toc = converter.extract_toc_structure(doc)
+    finally:
+        doc.close()
+
+    folders, articles = [], []
+    path_stack = {0: Path()}
+    title_stack = {}
+    for item in toc:
+        lvl, title = item['level'], item['title']
+        title_stack[lvl] = title
+        for k in list(title_stack.keys()):
+            if k > lvl: del title_stack[k]
+
+        is_file = (lvl == converter.SPLIT_LEVEL) or (lvl < converter.SPLIT_LEVEL and not item['has_children'])
+        is_folder = (lvl < converter.SPLIT_LEVEL and item['has_children'])
+
+        if is_folder:
+            path_stack[lvl] = path_stack.get(lvl - 1, Path()) / converter.clean_filename(title)
+            folders.append(path_stack[lvl])
+        elif is_file:
+            cats = [title_stack[k] for k in sorted(title_stack.keys()) if k < lvl]
+            articles.append({
+                "pdf": str(pdf),
+                "book": pdf.stem,
+                "rel_dir": path_stack.get(lvl - 1, Path()) / converter.clean_filename(title),
+                "front_matter": {
+                    "title": title,
+                    "order": item['start'] + 1,
+                    "category": "/".join(cats),
+                    "book": pdf.stem
+                },
+                "pages": list(range(item['start'], item['end'] + 1)),
+                "start_y": item['start_y'],
+                "end_y": item['end_y'],
+            })
+    return folders, articles
+
+
+def load_cost_model():
+    """{书名: {文章路径: [页数, 秒]}}，没有记录返回空字典"""
+    if COST_MODEL is None or not COST_MODEL.exists():
+        return {}
+    try:
+        return json.loads(COST_MODEL.read_text(encoding="utf-8"))
+    except (OSError, json.JSONDecodeError):
+        return {}
+
+
+def save_cost_model(model):
+    COST_MODEL.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = COST_MODEL.with_suffix(".tmp")
+    tmp_path.write_text(json.dumps(model, ensure_ascii=False), encoding="utf-8")
+    os.replace(tmp_path, COST_MODEL)
+
+
+def estimate_costs(articles, model):
+    """
+    预估每篇文章的解析耗时 (秒，只用来排序)：
+    1. 上次跑过、页数没变 -> 上次的实测耗时
+    2. 否则 -> 页数 × 本卷平均每页耗时 (本卷没记录就用全部记录的平均值，完全没有记录就只看页数)
+    """
+    def per_page(records):
+        pages = sum(p for p, _ in records)
+        return sum(s for _, s in records) / pages if pages else None
+
+    overall = per_page([r for book in model.values() for r in book.values()]) or 1.0
+    book_rate = {book: per_page(list(records.values())) or overall for book, records in model.items()}
+
+    for art in articles:
+        pages = len(art["pages"])
+        record = model.get(art["book"], {}).get(art["rel_dir"].as_posix())
+        if record is not None and record[0] == pages:
+            art["cost"] = record[1]
+        else:
+            art["cost"] = pages * book_rate.get(art["book"], overall)
+
+
+# ---------- 并行模式：工作者 (进程 / 线程 / 子解释器) ----------
+
+# 解析器和打开的文档每个工作者各一份：进程、子解释器里只有一个工作线程，线程池里每个线程一份
+# (MuPDF 的 Document 不能跨线程共用)
+_local = threading.local()
+MAX_OPEN_DOCS = 4  # 任务按耗时排序后会在各卷之间跳，每个工作者只留最近用过的几卷
+
+
+def _worker_doc(pdf, mapped):
+    docs = _local.docs
+    doc = docs.pop(pdf, None)
+    if doc is None:
+        doc = open_pdf(pdf, mapped)
+        if len(docs) >= MAX_OPEN_DOCS:
+            oldest = next(iter(docs))
+            docs.pop(oldest).close()
+    docs[pdf] = doc  # 重新插入 = 标记为最近使用
+    return doc
+
+
+def parse_article(task):
+    """
+    在工作者里解析一篇文章
+    页面缓存、内存映射配置随任务传入：进程池默认 forkserver/spawn 启动、子解释器从头导入，都拿不到主进程运行时改过的配置
+    :return: 结果 dict：markdown、images、本篇耗时；失败时 error 为异常信息
+    """
+    if getattr(_local, "parser", None) is None:
+        page_cache = None
+        cache_dir, cache_mb = task["page_cache"]
+        if cache_dir is not None:
+            page_cache = PageCache(cache_dir, max_bytes=cache_mb * 1024 * 1024)
+        _local.parser = LeninParser(OUTPUT_ROOT, page_cache=page_cache)
+        _local.docs = {}
+    parser = _local.parser
+
+    t0, c0 = time.perf_counter(), time.thread_time()
+    worker = f"{os.getpid()}/{threading.get_native_id()}"
+    result = {"id": task["id"], "worker": worker, "error": None, "markdown": None, "images": []}
+    try:
+        doc = _worker_doc(task["pdf"], task["mmap"])
+        result["markdown"], state = parser.parse_chapter(doc, task["pages"],
+                                                         start_y=task["start_y"], end_y=task["end_y"])
+        result["images"] = state.article_images
+    except Exception as e:
+        result["error"] = str(e)
+    result["seconds"] = time.perf_counter() - t0
+    result["cpu"] = time.thread_time() - c0
+    return result
+
+
+def make_executor(kind, workers):
+    """按名字创建并行后端"""
+    if kind == "process":
+        return ProcessPoolExecutor(max_workers=workers)
+
+    if kind == "thread":
+        gil_check = getattr(sys, "_is_gil_enabled", None)
+        if gil_check is None or gil_check():
+            print("⚠️ 当前解释器有 GIL，线程后端不会比单线程快 (需要自由线程构建 python3.14t)")
+        return ThreadPoolExecutor(max_workers=workers, thread_name_prefix="parse")
+
+    if kind == "interpreter":
+        pool_class = getattr(concurrent.futures, "InterpreterPoolExecutor", None)
+        if pool_class is None:
+            raise RuntimeError("子解释器后端需要 Python 3.14+ (concurrent.futures.InterpreterPoolExecutor)")
+        # 子解释器的 sys.path 不含脚本目录，先照抄主解释器的，才能按引用导入 parse_article
+        pool = pool_class(max_workers=workers, initializer=exec,
+                          initargs=(f"import sys; sys.path[:] = {sys.path!r}", {}))
+        try:
+            pool.submit(exec, "import fitz", {}).result()
+        except Exception as e:
+            pool.shutdown()
+            raise RuntimeError(f"子解释器里无法导入 PyMuPDF: {e}")
+        return pool
+
+    raise ValueError(f"未知的并行后端: {kind} (可选 process / thread / interpreter)")
+
+
+# ---------- 并行模式：主进程写盘 ----------
+
+class VolumeOutput:
+    """一卷的输出后端 + 断点续跑日志；第一篇结果到达时打开，最后一篇写完时关闭"""
+
+    def __init__(self, book, folders, remaining, checkpoint, recover=True):
+        """
+        :param recover: 打开时收拾这一卷上次中断留下的临时目录；这一卷还有别的写入者在写时 (分布式转换) 传 False
+        """
+        output_dir = OUTPUT_ROOT / book
+        if converter.OUTPUT_BACKEND == "sqlite":
+            # 多卷同时写同一个库：每篇立即提交，避免两个连接的事务互相锁住
+            self.writer = CorpusStore(converter.CORPUS_DB, book=book, batch_size=1)
+        else:
+            self.writer = BundleWriter(output_dir, fsync=converter.FSYNC, background=converter.ASYNC_WRITE,
+                                       image_workers=converter.IMAGE_WORKERS, recover=recover)
+        for folder in folders:
+            self.writer.make_folder(folder)
+
+        self.checkpoint = checkpoint
+        if checkpoint is not None:
+            self.writer.on_written = checkpoint.record
+        self.remaining = remaining
+        self.failed = 0
+
+    def close(self):
+        self.writer.close()
+        if self.checkpoint is not None:
+            # 有失败的文章就不标记整本完成，下次续跑只重做失败的
+            if self.failed == 0:
+                self.checkpoint.finish()
+            self.checkpoint.close()
+
+
+def utilization_report(results, wall, workers):
+    """各工作进程的忙碌时间、利用率，以及理想情况下的墙钟下限"""
+    busy = defaultdict(float)
+    cpu = defaultdict(float)
+    count = defaultdict(int)
+    for r in results:
+        busy[r["worker"]] += r["seconds"]
+        cpu[r["worker"]] += r["cpu"]
+        count[r["worker"]] += 1
+
+    total_busy = sum(busy.values())
+    longest = max((r["seconds"] for r in results), default=0.0)
+    # 完美调度也快不过：总工作量平均分给每个进程，或最长的那一篇
+    bound = max(total_busy / workers, longest)
+    print(f"\n⏱️ 墙钟 {wall:.1f}s，解析合计 {total_busy:.1f}s (CPU {sum(cpu.values()):.1f}s)，"
+          f"{workers} 个工作者利用率 {total_busy / (wall * workers):.0%}")
+    print(f"   理想下限 {bound:.1f}s (总量/工作者数 {total_busy / workers:.1f}s，最长一篇 {longest:.1f}s)，"
+          f"实际是下限的 {wall / bound if bound else 0:.2f} 倍")
+    for worker in sorted(busy, key=busy.get, reverse=True):
+        print(f"   🧵 {worker}: {count[worker]} 篇，忙碌 {busy[worker]:.1f}s ({busy[worker] / wall:.0%})")
+
+
+def convert_parallel(pdfs, done, pool, executor, workers):
+    # 1. 规划：所有卷的文章 (只读书签)
+    volumes = {}
+    tasks = []
+    for pdf in pdfs:
+        if pdf.stem in done:
+            print(f"⏩ 已完成，跳过: {pdf.stem}")
+            continue
+        folders, articles = plan_volume(pdf)
+
+        checkpoint = None
+        if converter.CHECKPOINT_JOURNAL is not None:
+            checkpoint = CheckpointJournal(converter.CHECKPOINT_JOURNAL, book=pdf.stem,
+                                           run=converter.checkpoint_run(OUTPUT_ROOT / pdf.stem),
+                                           exists=output_exists(pdf.stem), resume=converter.RESUME)
+            articles = [a for a in articles
+                        if not checkpoint.is_done(a["rel_dir"], (a["pages"][0] + 1, a["pages"][-1] + 1))]
+        volumes[pdf.stem] = {"folders": folders, "remaining": len(articles), "checkpoint": checkpoint}
+        tasks.extend(articles)
+
+    for i, task in enumerate(tasks):
+        task["id"] = i
+
+    # 2. 排序：预估耗时从大到小 (LPT)；进程池按提交顺序派发，空闲的进程自己取下一篇
+    model = load_cost_model()
+    estimate_costs(tasks, model)
+    tasks.sort(key=lambda t: t["cost"], reverse=True)
+    total_pages = sum(len(t["pages"]) for t in tasks)
+    print(f"📋 {len(volumes)} 卷、{len(tasks)} 篇文章、{total_pages} 页，"
+          f"{workers} 个工作者 ({executor}) 按预估耗时从大到小调度\n")
+
+    jsonl = None
+    if converter.JSONL_EXPORT is not None:
+        resume = any(v["checkpoint"] is not None and v["checkpoint"].done for v in volumes.values())
+        jsonl = JsonlExporter(converter.JSONL_EXPORT, append=resume)
+        print(f"🧾 同时导出 JSONL: {converter.JSONL_EXPORT}")
+
+    # 没有待转文章的卷 (全部续跑跳过) 直接收尾
+    outputs = {}
+    for book, vol in volumes.items():
+        if vol["remaining"] == 0:
+            VolumeOutput(book, vol["folders"], 0, vol["checkpoint"]).close()
+
+    # 3. 执行：结果按完成顺序回到主进程，由主进程写盘 (输出后端、JSONL、断点日志都只有一个写入者)
+    by_id = {t["id"]: t for t in tasks}
+    page_cache = (str(converter.PAGE_CACHE_DIR) if converter.PAGE_CACHE_DIR is not None else None,
+                  converter.PAGE_CACHE_MAX_MB)
+    results = []
+    t0 = time.perf_counter()
+    with pool:
+        futures = {pool.submit(parse_article, {**{k: t[k] for k in ("id", "pdf", "pages", "start_y", "end_y")},
+                                               "page_cache": page_cache, "mmap": converter.MMAP_INPUT}): t
+                   for t in tasks}
+        for n, future in enumerate(as_completed(futures), start=1):
+            task = futures[future]
+            try:
+                r = future.result()
+            except Exception as e:
+                # 工作者没能交回结果 (进程崩溃 BrokenProcessPool、结果无法序列化等)：记这篇失败，接着收其余文章
+                # 进程池坏了之后剩下的文章都会走到这里，各卷照常收尾，没失败的文章照常记进断点日志
+                r = {"id": task["id"], "error": f"{type(e).__name__}: {e}"}
+            else:
+                results.append(r)
+            book = task["book"]
+            pages = (task["pages"][0] + 1, task["pages"][-1] + 1)
+
+            out = outputs.get(book)
+            if out is None:
+                vol = volumes[book]
+                out = outputs[book] = VolumeOutput(book, vol["folders"], vol["remaining"], vol["checkpoint"])
+
+            if r["error"] is not None:
+                print(f"❌ [{n}/{len(tasks)}] {book} / {task['front_matter']['title']}: {r['error']}")
+                out.failed += 1
+            else:
+                print(f"✅ [{n}/{len(tasks)}] {task['front_matter']['title']} ({pages[0]}-{pages[1]}, {r['seconds']:.1f}s)")
+                if out.checkpoint is not None:
+                    out.checkpoint.begin(task["rel_dir"], pages)
+                out.writer.write_article(task["rel_dir"], task["front_matter"], r["markdown"], r["images"])
+                if jsonl is not None:
+                    jsonl.write_article(task["rel_dir"], task["front_matter"], r["markdown"], r["images"], pages=pages)
+
+            out.remaining -= 1
+            if out.remaining == 0:
+                out.close()
+                print(f"📦 整卷完成: {book}")
+    wall = time.perf_counter() - t0
+
+    if jsonl is not None:
+        jsonl.close()
+    failed = sum(out.failed for out in outputs.values())
+    if failed:
+        print(f"\n⚠️ {failed} 篇文章转换失败 (见上面的 ❌)，重跑时开启断点续跑可以只重做失败的")
+
+    # 4. 报告利用率，更新耗时模型
+    if results:
+        utilization_report(results, wall, workers)
+    if COST_MODEL is not None:
+        for r in results:
+            if r["error"] is None:
+                task = by_id[r["id"]]
+                model.setdefault(task["book"], {})[task["rel_dir"].as_posix()] = [len(task["pages"]), round(r["seconds"], 4)]
+        save_cost_model(model)
+
+
+def main():
+    # 命令行：python batch_convert.py [process|thread|interpreter] [工作者数 (默认 CPU 核数)]
+    # 命令行指定了后端就走并行模式 (哪怕只有 1 个工作者，方便比较各后端的开销)
+    executor = sys.argv[1] if len(sys.argv) > 1 else EXECUTOR
+    workers = WORKERS
+    if len(sys.argv) > 1:
+        workers = int(sys.argv[2]) if len(sys.argv) > 2 else (os.cpu_count() or 1)
+
+    pdfs = list_volumes()
+    print(f"📚 共 {len(pdfs)} 卷: {INPUT_DIR.name}\n")
+
+    # 断点续跑日志里整本已完成的卷直接跳过；没完成的卷由转换器自己跳过已完成的文章
+    done = set()
+    if converter.CHECKPOINT_JOURNAL is not None and converter.RESUME:
+        done = completed_books(converter.CHECKPOINT_JOURNAL,
+                               run_for=lambda book: converter.checkpoint_run(OUTPUT_ROOT / book),
+                               exists_for=output_exists)
+
+    if workers > 1 or len(sys.argv) > 1:
+        # 先建好并行后端：当前构建不支持时在动任何文件之前报错
+        try:
+            pool = make_executor(executor, workers)
+        except (RuntimeError, ValueError) as e:
+            print(f"❌ {e}")
+            return
+        convert_parallel(pdfs, done, pool, executor, workers)
+    else:
+        convert_sequential(pdfs, done)
+
+    print("\n🎉 批量转换完成！")
+
+
+if __name__ == "__main__":
+    main()
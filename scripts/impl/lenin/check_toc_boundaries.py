@@ -0,0 +1,89 @@
+"""
+自检：书签切分共用页时不丢、不重复正文
+
+用合成的两页 PDF 跑 extract_toc_structure + parse_chapter，检查每段正文恰好出现在一篇文章里：
+1. 文件夹书签在页首，第一篇子文章的书签在页中 (上方是文件夹标题、写作时间)，上一篇在前一页就结束了
+   -> 书签上方的文字归这篇子文章
+2. 上一篇结束在这一页的中间，后面紧跟文件夹书签和它的第一篇子文章
+   -> 上半页归上一篇，文件夹标题和子文章归子文章
+
+运行：python scripts/impl/lenin/check_toc_boundaries.py，全部通过退出码为 0，否则为 1
+"""
+
+import sys
+import tempfile
+from pathlib import Path
+
+import fitz
+
+import pdf_converter_custom as converter
+
+
+def goto(page, y):
+    return {"kind": fitz.LINK_GOTO, "page": page, "to": fitz.Point(0, y)}
+
+
+def make_pdf(path, pages, toc):
+    """pages: 每页的正文行 (从 y=150 起每行间隔 40)；toc: [[层级, 标题, 页码, 目标 y], ...]"""
+    doc = fitz.open()
+    for lines in pages:
+        page = doc.new_page(width=420, height=600)
+        for i, text in enumerate(lines):
+            page.insert_text((110, 150 + 40 * i), text, fontname="china-s", fontsize=11)
+    doc.set_toc([[lvl, title, page, goto(page - 1, y)] for lvl, title, page, y in toc])
+    doc.save(path)
+    doc.close()
+
+
+def convert(path):
+    """{文章标题: 去掉空白和 Markdown 标记的正文}"""
+    doc = fitz.open(path)
+    parser = converter.LeninParser(Path(path).parent)
+    articles = {}
+    for item in converter.extract_toc_structure(doc):
+        if not converter.is_file_item(item):
+            continue
+        markdown, _ = parser.parse_chapter(doc, list(range(item['start'], item['end'] + 1)),
+                                           start_y=item['start_y'], end_y=item['end_y'])
+        articles[item['title']] = "".join(markdown.replace("#", "").split())
+    doc.close()
+    return articles
+
+
+CASES = [
+    ("文件夹在页首，子文章上方有引言",
+     [["第一篇正文"], ["论所谓市场问题", "（１８９３年秋）", "第二篇正文"]],
+     [[1, "文集", 1, 130], [2, "第一篇", 1, 130], [1, "论所谓市场问题", 2, 130], [2, "第二篇", 2, 215]],
+     {"第一篇": ["第一篇正文"], "第二篇": ["论所谓市场问题", "（１８９３年秋）", "第二篇正文"]}),
+    ("上一篇结束在页中，后接文件夹和子文章",
+     [["第一篇正文"], ["第一篇结尾", "新工厂法", "（１８９７年夏）", "第二篇正文"]],
+     [[1, "文集", 1, 130], [2, "第一篇", 1, 130], [1, "新工厂法", 2, 175], [2, "第二篇", 2, 255]],
+     {"第一篇": ["第一篇正文", "第一篇结尾"], "第二篇": ["新工厂法", "（１８９７年夏）", "第二篇正文"]}),
+]
+
+
+if __name__ == "__main__":
+    converter.SPLIT_LEVEL = 2
+    bad = 0
+    with tempfile.TemporaryDirectory() as tmp:
+        for i, (name, pages, toc, expected) in enumerate(CASES):
+            path = Path(tmp) / f"case{i}.pdf"
+            make_pdf(path, pages, toc)
+            articles = convert(path)
+            everything = [line for lines in pages for line in lines]
+            problems = []
+            for title, lines in expected.items():
+                missing = [line for line in lines if line not in articles.get(title, "")]
+                if missing:
+                    problems.append(f"{title} 缺少 {missing}")
+            for line in everything:
+                owners = [title for title, text in articles.items() if line in text]
+                if len(owners) != 1:
+                    problems.append(f"「{line}」出现在 {owners or '没有文章'} 里")
+            if problems:
+                bad += 1
+                print(f"❌ {name}: " + "；".join(problems))
+            else:
+                print(f"✅ {name}")
+    print(f"\n{'❌' if bad else '✅'} {len(CASES) - bad}/{len(CASES)} 通过")
+    sys.exit(1 if bad else 0)
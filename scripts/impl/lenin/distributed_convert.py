@@ -0,0 +1,257 @@
+import multiprocessing
+import os
+import socket
+import sys
+import threading
+import time
+from pathlib import Path
+
+# 规划、解析、写盘沿用 batch_convert.py (及其背后 pdf_converter_custom.py 仪表盘) 的全部配置
+import batch_convert as batch
+import pdf_converter_custom as converter
+# pdf_converter_custom 已把 scripts/common 加进 sys.path
+from bundle_writer import recover_bundles
+from work_queue import WorkQueue
+
+# ==================== 🎛️ 仪表盘配置 ====================
+
+# 1. 路径配置
+# 输入 / 输出目录见 batch_convert.py；多台机器时各自改成本机挂载共享存储的路径 (任务里只记卷的文件名)
+PROJECT_ROOT = Path(__file__).resolve().parent.parent.parent.parent
+
+# 2. 任务队列 (放在所有机器都能访问的共享存储上)
+QUEUE_DB = PROJECT_ROOT / "data/cache/work_queue.sqlite"
+
+# 3. 任务粒度：同一卷里相邻的文章凑够这么多页算一个任务 (一篇超长的文章单独成为一个任务)
+# 太小 = 队列读写频繁；太大 = 崩溃后重做的多、最后几个任务拖尾
+JOB_PAGES = 200
+
+# 4. 租约 / 心跳 / 重试
+LEASE_SECONDS = 300     # 超过这么久没有心跳的任务视为工作者已崩溃，收回重派
+HEARTBEAT_SECONDS = 30  # 处理任务期间多久续租一次
+MAX_ATTEMPTS = 3        # 每个任务最多领取几次，之后标记失败 (status 查看，retry 放回)
+POLL_SECONDS = 10       # 队列暂时没有待办 (但还有别人在跑的任务) 时多久再看一次
+
+
+# ==================== ⚙️ 分布式转换 ====================
+
+# 命令行：
+#   python distributed_convert.py enqueue       协调者：规划 batch_convert.VOLUMES 里的卷，任务写进队列
+#   python distributed_convert.py work [进程数]  工作者：在任意台机器上运行，领取任务直到队列清空
+#   python distributed_convert.py status        查看进度、正在跑的任务、失败原因
+#   python distributed_convert.py retry         把失败的任务放回队列
+#
+# 每个工作者直接把文章写到输出目录 (共享存储)；断点续跑靠队列本身 (已完成的任务不会再派)，
+# 所以不写断点日志和 JSONL (这两个是单写入者的追加文件)。重复入队会被忽略，重派的任务整包重写，结果相同。
+# 同一卷会有多个工作者同时写，工作者不收拾临时目录 (会删掉别人正在写的)；崩溃留下的残留由 enqueue / retry
+# 在队列里没有进行中的任务时统一收拾 (收拾期间暂停派发)。
+# 只支持 files 输出后端：sqlite 语料库用 WAL，放在共享存储上多台机器同时写不可靠 (见 work_queue.py)，
+# 需要语料库时在一台机器上用 batch_convert.py 转换 (多进程，结果由主进程一个连接写入)。
+
+
+def open_queue():
+    return WorkQueue(QUEUE_DB, lease_seconds=LEASE_SECONDS, max_attempts=MAX_ATTEMPTS)
+
+
+def pack_jobs(pdf):
+    """一卷拆成若干任务：相邻文章按 JOB_PAGES 打包；卷的文件夹由第一个任务负责创建"""
+    folders, articles = batch.plan_volume(pdf)
+    batch.estimate_costs(articles, batch.load_cost_model())
+
+    jobs, current = [], []
+    for art in articles:
+        if current and sum(len(a["pages"]) for a in current) + len(art["pages"]) > JOB_PAGES:
+            jobs.append(current)
+            current = []
+        current.append(art)
+    if current:
+        jobs.append(current)
+
+    packed = []
+    for i, group in enumerate(jobs):
+        first, last = group[0]["pages"][0] + 1, group[-1]["pages"][-1] + 1
+        payload = {
+            "pdf": pdf.name,
+            "book": pdf.stem,
+            "folders": [f.as_posix() for f in folders] if i == 0 else [],
+            "articles": [{
+                "rel_dir": a["rel_dir"].as_posix(),
+                "front_matter": a["front_matter"],
+                "pages": [a["pages"][0], a["pages"][-1]],
+                "start_y": a["start_y"],
+                "end_y": a["end_y"],
+            } for a in group],
+        }
+        # 预估耗时大的任务先派 (LPT)，整批的拖尾最短
+        packed.append((f"{pdf.stem}:{first}-{last}", payload, sum(a["cost"] for a in group)))
+    return packed
+
+
+def recover_outputs(queue, pdfs):
+    """收拾各卷输出目录里崩溃留下的临时目录；有进行中的任务 (工作者还在写) 时跳过，收拾期间暂停派发"""
+    with queue.paused() as running:
+        if running:
+            print(f"⚠️ 还有 {running} 个任务在进行中，先不收拾输出目录里的临时目录 (工作者都停下后再运行一次 enqueue / retry)")
+            return
+        for pdf in pdfs:
+            recover_bundles(batch.OUTPUT_ROOT / pdf.stem)
+
+
+def enqueue():
+    pdfs = batch.list_volumes()
+    print(f"📚 共 {len(pdfs)} 卷: {batch.INPUT_DIR.name}")
+    queue = open_queue()
+    recover_outputs(queue, pdfs)
+    total_added = total = 0
+    for pdf in pdfs:
+        jobs = pack_jobs(pdf)
+        added = queue.enqueue(jobs)
+        total += len(jobs)
+        total_added += added
+        print(f"📥 {pdf.stem}: {len(jobs)} 个任务 (新入队 {added})")
+    print(f"\n🧾 队列: {QUEUE_DB}\n🎉 共 {total} 个任务，新入队 {total_added}")
+    print_counts(queue)
+    queue.close()
+
+
+def run_job(job, page_cache):
+    """
+    转换一个任务里的全部文章，写到输出目录
+    :return: (成功篇数, 失败信息列表)
+    """
+    payload = job["payload"]
+    book = payload["book"]
+    pdf = batch.INPUT_DIR / payload["pdf"]
+    # 别的工作者可能正在写同一卷，不能收拾临时目录 (见 recover_outputs)
+    out = batch.VolumeOutput(book, [Path(f) for f in payload["folders"]], len(payload["articles"]), None,
+                             recover=False)
+    errors = []
+    try:
+        for art in payload["articles"]:
+            task = {
+                "id": 0, "pdf": str(pdf),
+                "pages": list(range(art["pages"][0], art["pages"][1] + 1)),
+                "start_y": art["start_y"], "end_y": art["end_y"],
+                "page_cache": page_cache, "mmap": converter.MMAP_INPUT,
+            }
+            r = batch.parse_article(task)
+            if r["error"] is not None:
+                errors.append(f"{art['front_matter']['title']}: {r['error']}")
+                continue
+            out.writer.write_article(Path(art["rel_dir"]), art["front_matter"], r["markdown"], r["images"])
+    finally:
+        out.close()  # 等后台写盘、图片线程落完盘，才算完成
+    return len(payload["articles"]) - len(errors), errors
+
+
+def work_loop(worker):
+    queue = open_queue()
+    page_cache = (str(converter.PAGE_CACHE_DIR) if converter.PAGE_CACHE_DIR is not None else None,
+                  converter.PAGE_CACHE_MAX_MB)
+    done = 0
+    while True:
+        job = queue.claim(worker)
+        if job is None:
+            counts = queue.counts()
+            if counts["running"] == 0:
+                break  # 没有待办、也没有别人在跑 (不会再有崩溃收回的任务)
+            time.sleep(POLL_SECONDS)
+            continue
+
+        print(f"🚀 [{worker}] {job['key']} (第 {job['attempt']} 次)")
+        # 处理期间后台续租
+        stop = threading.Event()
+        lost = threading.Event()
+
+        def beat():
+            while not stop.wait(HEARTBEAT_SECONDS):
+                if not queue.heartbeat(job["id"], worker):
+                    lost.set()
+                    return
+
+        beater = threading.Thread(target=beat, daemon=True)
+        beater.start()
+        t0 = time.perf_counter()
+        try:
+            ok, errors = run_job(job, page_cache)
+        except Exception as e:
+            ok, errors = 0, [f"{type(e).__name__}: {e}"]
+        finally:
+            stop.set()
+            beater.join()
+        seconds = time.perf_counter() - t0
+
+        if lost.is_set():
+            print(f"⚠️ [{worker}] {job['key']} 租约已被收回 (心跳太慢？)，结果以接手的工作者为准")
+        elif errors:
+            queue.fail(job["id"], worker, "; ".join(errors))
+            print(f"❌ [{worker}] {job['key']}: {len(errors)} 篇失败: {errors[0]}")
+        elif queue.complete(job["id"], worker, {"articles": ok, "seconds": round(seconds, 2)}):
+            done += 1
+            print(f"✅ [{worker}] {job['key']}: {ok} 篇，{seconds:.1f}s")
+        else:
+            print(f"⚠️ [{worker}] {job['key']} 完成时租约已失效，结果以接手的工作者为准")
+    queue.close()
+    print(f"🏁 [{worker}] 队列已清空，本工作者完成 {done} 个任务")
+
+
+def work(processes):
+    host = socket.gethostname()
+    if processes <= 1:
+        work_loop(f"{host}/{os.getpid()}")
+        return
+    # 每个进程是一个独立的工作者，各自领取任务
+    procs = [multiprocessing.Process(target=work_loop, args=(f"{host}/{os.getpid()}-{i}",)) for i in range(processes)]
+    for p in procs:
+        p.start()
+    for p in procs:
+        p.join()
+
+
+def print_counts(queue):
+    c = queue.counts()
+    print(f"📊 待办 {c['pending']}，进行中 {c['running']}，完成 {c['done']}，失败 {c['failed']}")
+
+
+def status():
+    if not QUEUE_DB.exists():
+        print(f"❌ 队列不存在: {QUEUE_DB} (先运行 enqueue)")
+        return
+    queue = open_queue()
+    print_counts(queue)
+    now = time.time()
+    for job in queue.jobs("running"):
+        print(f"   ⏳ {job['key']}: {job['worker']} (第 {job['attempts']} 次，租约还剩 {job['lease_until'] - now:.0f}s)")
+    for job in queue.jobs("failed"):
+        print(f"   ❌ {job['key']} (领取 {job['attempts']} 次): {job['error']}")
+    queue.close()
+
+
+def retry():
+    queue = open_queue()
+    recover_outputs(queue, batch.list_volumes())
+    print(f"🔁 放回队列: {queue.retry_failed()} 个失败任务")
+    print_counts(queue)
+    queue.close()
+
+
+def main():
+    command = sys.argv[1] if len(sys.argv) > 1 else "status"
+    if command in ("enqueue", "work", "retry") and converter.OUTPUT_BACKEND != "files":
+        print(f"❌ 分布式转换只支持 files 输出后端 (当前 {converter.OUTPUT_BACKEND})："
+              f"sqlite 语料库请在一台机器上用 batch_convert.py 转换")
+        return
+    if command == "enqueue":
+        enqueue()
+    elif command == "work":
+        work(int(sys.argv[2]) if len(sys.argv) > 2 else 1)
+    elif command == "status":
+        status()
+    elif command == "retry":
+        retry()
+    else:
+        print(f"❌ 未知命令: {command} (可选 enqueue / work [进程数] / status / retry)")
+
+
+if __name__ == "__main__":
+    main()
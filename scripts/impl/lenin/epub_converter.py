@@ -5,13 +5,18 @@ EPUB 转 Markdown：按 spine 顺序逐 HTML 转换，输出 Page Bundles（inde
 
 import sys
 import ebooklib
-import yaml
 from pathlib import Path
 
 from ebooklib import epub
 
 from epub_html_parser import clean_filename, parse_html_to_markdown
 
+# 公共模块目录 scripts/common
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / "common"))
+from bundle_writer import BundleWriter
+from corpus_store import CorpusStore
+from jsonl_export import JsonlExporter
+
 # ==================== 仪表盘配置 ====================
 
 PROJECT_ROOT = Path(__file__).resolve().parent.parent.parent.parent
@@ -22,6 +27,18 @@ OUTPUT_DIR = PROJECT_ROOT / "data/processed/lenin/列宁全集"
 # False = 执行模式（生成 Markdown）
 DRY_RUN = False
 
+# 输出后端
+# "files"  = Page Bundles 目录树 (文章目录/index.md + assets/)
+# "sqlite" = 写入单个 SQLite 语料库 CORPUS_DB，需要目录树时运行 scripts/common/corpus_store.py 导出
+OUTPUT_BACKEND = "files"
+CORPUS_DB = PROJECT_ROOT / "data/processed/corpus.sqlite"
+ASYNC_WRITE = False  # files 后端：True = 后台线程写盘，解析不用等磁盘
+FSYNC = False        # files 后端：True = 每篇文章落盘后 fsync，断电也不丢 (慢)
+IMAGE_WORKERS = 4    # files 后端：写图片的线程数，解析下一篇时图片在后台落盘 (0 = 顺序写)
+
+# JSONL 流式导出 (None = 不导出)，与输出后端同时写，后缀 .gz / .zst 自动压缩
+JSONL_EXPORT = None
+
 
 # ==================== 转换逻辑 ====================
 
@@ -105,21 +122,9 @@ def _extract_nav_hierarchy(book) -> dict:
     return href_map
 
 
-def main():
-    print(f"📖 读取: {INPUT_EPUB.name}")
-    if not INPUT_EPUB.exists():
-        print(f"❌ 文件不存在: {INPUT_EPUB}")
-        return
-
-    try:
-        book = epub.read_epub(str(INPUT_EPUB))
-    except Exception as e:
-        print(f"❌ 无法打开: {e}")
-        return
-
-    book_title = _get_book_title(book)
-    book_stem = clean_filename(book_title)
-    get_item_fn = _build_get_item_fn(book)
+def collect_spine_docs(book) -> list:
+    """按 spine 顺序列出要转换的 HTML 文档：[{"item", "href", "title", "category", "order"}, ...]"""
+    book_stem = clean_filename(_get_book_title(book))
     nav_map = _extract_nav_hierarchy(book)
 
     # 收集 spine 中的 HTML 文档
@@ -147,6 +152,52 @@ def main():
             "category": category,
             "order": i + 1,
         })
+    return spine_docs
+
+
+def convert_spine_doc(d, book_stem, get_item_fn):
+    """
+    转换一个 spine 文档
+    :return: (文章目录 (相对输出目录), front matter, Markdown, 图片 [(文件名, 字节), ...])
+    """
+    # 计算 Page Bundle 路径：category / safe_title (相对 output_base)
+    cat_parts = [p for p in d["category"].split("/") if p]
+    article_dir = Path(*cat_parts, clean_filename(d["title"]))
+
+    html_raw = d["item"].get_content()
+    if isinstance(html_raw, str):
+        html_raw = html_raw.encode("utf-8", errors="replace")
+
+    md_content, images = parse_html_to_markdown(
+        html_content=html_raw,
+        base_href=d["href"],
+        book_get_item=get_item_fn,
+    )
+
+    front_matter = {
+        "title": d["title"],
+        "order": d["order"],
+        "category": d["category"],
+        "book": book_stem,
+    }
+    return article_dir, front_matter, md_content, images
+
+
+def main():
+    print(f"📖 读取: {INPUT_EPUB.name}")
+    if not INPUT_EPUB.exists():
+        print(f"❌ 文件不存在: {INPUT_EPUB}")
+        return
+
+    try:
+        book = epub.read_epub(str(INPUT_EPUB))
+    except Exception as e:
+        print(f"❌ 无法打开: {e}")
+        return
+
+    book_stem = clean_filename(_get_book_title(book))
+    get_item_fn = _build_get_item_fn(book)
+    spine_docs = collect_spine_docs(book)
 
     print(f"🔍 有效章节: {len(spine_docs)} 个\n")
 
@@ -158,56 +209,34 @@ def main():
         return
 
     output_base = Path(OUTPUT_DIR)
-    output_base.mkdir(parents=True, exist_ok=True)
+    if OUTPUT_BACKEND == "sqlite":
+        writer = CorpusStore(CORPUS_DB, book=book_stem)
+        print(f"🗄️ 输出到语料库: {CORPUS_DB}")
+    else:
+        output_base.mkdir(parents=True, exist_ok=True)
+        writer = BundleWriter(output_base, fsync=FSYNC, background=ASYNC_WRITE,
+                              image_workers=IMAGE_WORKERS, recover=True)
+
+    jsonl = None
+    if JSONL_EXPORT is not None:
+        jsonl = JsonlExporter(JSONL_EXPORT)
+        print(f"🧾 同时导出 JSONL: {JSONL_EXPORT}")
 
     for d in spine_docs:
-        item = d["item"]
-        href = d["href"]
-        title = d["title"]
-        category = d["category"]
-        order = d["order"]
-
-        # 计算 Page Bundle 路径：output_base / category / safe_title
-        safe_title = clean_filename(title)
-        cat_parts = [p for p in category.split("/") if p]
-        if cat_parts:
-            parent = output_base
-            for part in cat_parts:
-                parent = parent / part
-            article_dir = parent / safe_title
-        else:
-            article_dir = output_base / safe_title
-
-        article_dir.mkdir(parents=True, exist_ok=True)
-        file_path = article_dir / "index.md"
-
-        print(f"🚀 转换: {title} (order={order})...")
+        print(f"🚀 转换: {d['title']} (order={d['order']})...")
 
         try:
-            html_raw = item.get_content()
-            if isinstance(html_raw, str):
-                html_raw = html_raw.encode("utf-8", errors="replace")
-
-            md_content = parse_html_to_markdown(
-                html_content=html_raw,
-                base_href=href,
-                book_get_item=get_item_fn,
-                article_dir=article_dir,
-            )
-
-            front_matter = {
-                "title": title,
-                "order": order,
-                "category": category,
-                "book": book_stem,
-            }
-            final = "---\n" + yaml.dump(front_matter, allow_unicode=True) + "---\n\n" + md_content
-
-            file_path.write_text(final, encoding="utf-8")
+            article_dir, front_matter, md_content, images = convert_spine_doc(d, book_stem, get_item_fn)
+            writer.write_article(article_dir, front_matter, md_content, images)
+            if jsonl is not None:
+                jsonl.write_article(article_dir, front_matter, md_content, images)
 
         except Exception as e:
             print(f"  ❌ 失败: {e}")
 
+    writer.close()
+    if jsonl is not None:
+        jsonl.close()
     print("\n✅ 全部转换完成！")
 
 
@@ -4,10 +4,6 @@ EPUB 单 HTML 解析器：清洗、图片提取、HTML→Markdown 转换、后
 """
 
 import re
-from pathlib import Path
-
-from bs4 import BeautifulSoup
-from markdownify import markdownify as md
 
 # ================= 配置 =================
 
@@ -101,24 +97,25 @@ def parse_html_to_markdown(
     html_content: bytes,
     base_href: str,
     book_get_item,
-    article_dir: Path,
-) -> str:
+) -> tuple[str, list]:
     """
-    将单 HTML 转为 Markdown，并提取图片到 article_dir/assets/。
+    将单 HTML 转为 Markdown，并提取图片（由输出后端写到 assets/）。
 
     :param html_content: 原始 HTML 字节
     :param base_href: 当前 HTML 在 EPUB 中的路径（如 OEBPS/ch1.xhtml），用于解析相对 img src
     :param book_get_item: 函数 href -> EpubItem，用于取图片二进制
-    :param article_dir: Page Bundle 目录，图片保存到 article_dir/assets/
-    :return: Markdown 正文（不含 front matter）
+    :return: (Markdown 正文（不含 front matter）, 图片列表 [(文件名, 字节), ...])
     """
+    # bs4 / markdownify 导入较慢，真正转换时才导入 (侦察模式只读 spine，用不到)
+    from bs4 import BeautifulSoup
+    from markdownify import markdownify as md
+
     soup = BeautifulSoup(html_content, "html.parser")
 
     _remove_scripts_styles(soup)
 
-    # 1. 收集图片，替换为占位符，保存到 assets
-    assets_dir = article_dir / "assets"
-    assets_dir.mkdir(parents=True, exist_ok=True)
+    # 1. 收集图片，替换为占位符
+    images = []
     img_counter = 0
     img_placeholders = {}  # placeholder_id -> (img_filename, original_src)
 
@@ -142,11 +139,7 @@ def parse_html_to_markdown(
         img_counter += 1
         ext = _get_image_ext(resolved, raw)
         filename = f"img_{img_counter}{ext}"
-        img_path = assets_dir / filename
-        try:
-            img_path.write_bytes(raw)
-        except Exception:
-            continue
+        images.append((filename, raw))
 
         placeholder = f"__IMG_PLACEHOLDER_{img_counter}__"
         img_placeholders[placeholder] = (filename, src)
@@ -168,7 +161,7 @@ def parse_html_to_markdown(
     # 4. 后处理：段落内多余换行
     md_text = _postprocess_paragraph_breaks(md_text)
 
-    return md_text.strip()
+    return md_text.strip(), images
 
 
 def _get_image_ext(href: str, raw: bytes) -> str:
@@ -1,5 +1,12 @@
 import fitz
+import hashlib
 import re
+import sys
+from pathlib import Path
+
+# 公共模块目录 scripts/common
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / "common"))
+from page_cache import hash_config
 
 # ================= 🎛️ 核心配置 =================
 
@@ -24,25 +31,64 @@ DETECT_THRESHOLD = 40   # 全页注脚检测阈值：从此高度才开始检测
 INDENT_THRESHOLD = 105  # 缩进阈值：X坐标大于此值视为新段落（列宁卷1: 左90 缩进110）
 CENTER_THRESHOLD = 120  # 居中阈值：X坐标大于此值且为黑体，视为三级标题 (###)
 
+# 正文中注脚符号 ①–⑩ 的占位符，编号在章节解析时再分配
+NOTE_PLACEHOLDER = "\x00"
+
+# 文字提取标志：dict 默认标志去掉图片 (图片走 xref 提取)
+TEXT_FLAGS = fitz.TEXTFLAGS_DICT & ~fitz.TEXT_PRESERVE_IMAGES
+
+# 页面缓存格式版本：extract_page 的返回结构变化时 +1，旧缓存自动失效
+PAGE_CACHE_VERSION = 6
+# 解析器源码哈希也进缓存键：改了解析代码 (不只是上面的常量)，旧的缓存同样失效
+PARSER_SOURCE_HASH = hashlib.sha1(Path(__file__).read_bytes()).hexdigest()
+
+# 注脚分割线参数（search_divider 测得：分割线宽约 67，页眉线宽 >200）
+SEPARATOR_MIN_WIDTH = 60    # 分割线最小宽度
+SEPARATOR_MAX_WIDTH = 75    # 分割线最大宽度
+HEAVY_DRAWINGS_LIMIT = 50   # 矢量图超过此数量的页面（插图、表格），参考邻页分割线位置过滤候选
+
 
 # ================= ⚙️ 解析引擎 =================
 # Page（页） -> Block（块） -> Line（行） -> Span（相同样式片段） -> Char（字符）
 
+class ChapterState:
+    """
+    一章的解析状态 (解析器不保存章节状态)
+    - 多个线程可以共用一个解析器同时解析不同的章，各带各的 ChapterState
+    - 两篇文章共用的边界页：上一篇的 last_page 交给下一篇的 parse_chapter (previous)，这一页只提取一次
+    - 只有普通的 Python 对象，可以 pickle 存盘，之后交回 parse_chapter 从 pages_done 页接着解析
+    """
+
+    def __init__(self):
+        self.global_note_id = 1    # 全局注脚计数器 [^1], [^2]...
+        self.all_footnotes = []    # 存储当页提取出的注脚内容
+        self.body_buffer = []      # 存储正文段落
+        self.current_para = ""     # 当前正在拼接的段落缓存
+        self.img_counter = 0
+        self.image_files = {}      # 图片内容摘要 -> 本篇文章中的图片文件名 (去重)
+        self.article_images = []   # 本篇文章的图片 [(文件名, 字节), ...]，由输出后端写入 assets/
+        self.pages_done = 0        # 已解析完的页数 (page_indices 里的前几页)
+        self.last_page = None      # ((文件名, 页码), 单页结果)：本章最后提取的页
+
+
 class LeninParser:
-    def __init__(self, output_base_dir):
+    def __init__(self, output_base_dir, page_cache=None):
         """
         初始化解析器
         :param output_base_dir: 基础目录 (pathlib.Path 对象)
+        :param page_cache: 可选的 PageCache，缓存单页提取结果，重跑时跳过内容未变的页
         """
         self.output_base_dir = output_base_dir
-        self.img_counter = 0
-        self.assets_dir = None  # 由 parse_chapter_pages 按文章设置
+        self.page_cache = page_cache
+        self.config_hash = hash_config(
+            type(self).__name__, PAGE_CACHE_VERSION, PARSER_SOURCE_HASH, FONT_MAP,
+            MARGIN_TOP_CUT, MARGIN_BOTTOM_CUT, DETECT_THRESHOLD, INDENT_THRESHOLD, CENTER_THRESHOLD,
+            SEPARATOR_MIN_WIDTH, SEPARATOR_MAX_WIDTH, HEAVY_DRAWINGS_LIMIT,
+        )
 
-        # === 状态变量 ===
-        self.global_note_id = 1    # 全局注脚计数器 [^1], [^2]...
-        self.all_footnotes = []    # 存储当页提取出的注脚内容
-        self.body_buffer = []      # 存储正文段落
-        self.current_para = ""     # 当前正在拼接的段落缓存
+        # === 分割线缓存 (跨文章保留) ===
+        # 值只由页面决定，哪个线程先算、谁写进去都一样
+        self.split_y_cache = {}    # (文件名, 页码) -> split_y
 
     def is_cjk(self, char):
         """检测字符是否为中日韩文字（用于判断是否需要加空格）"""
@@ -61,33 +107,83 @@ class LeninParser:
         text = re.sub(r'\[\s*转\s*下\s*页\s*\]', '', text)
         return text
 
+    def find_separator_y(self, page):
+        """
+        在页面下部查找正文/注脚分割横线，返回横线 Y 坐标，找不到返回 None
+        只看 get_cdrawings 的矩形（不构建 Path 字典），先按区域和高度过滤，再看宽度：
+        - 页眉区 (Y < MARGIN_TOP_CUT) 的页眉线直接跳过
+        - 高度 >= 5 的不是横线（表格框、装饰图）
+        - 矢量图很多的页面，如果邻页有分割线，只接受与邻页横线左端对齐的候选，避免表格横线混进来
+        """
+        drawings = page.get_cdrawings()
+        neighbor_x0 = None
+        if len(drawings) > HEAVY_DRAWINGS_LIMIT:
+            neighbor_x0 = self._neighbor_separator_x0(page)
+
+        best = None
+        for x0, y0 in self._separator_candidates(drawings):
+            if neighbor_x0 is not None and abs(x0 - neighbor_x0) > 2:
+                continue
+            if best is None or y0 > best[1]:
+                best = (x0, y0)
+        return None if best is None else best[1]
+
+    def _separator_candidates(self, drawings):
+        """按位置、高度、宽度过滤出的分割线候选 [(左端 X, Y), ...]"""
+        candidates = []
+        for d in drawings:
+            x0, y0, x1, y1 = d["rect"]
+            if y0 < MARGIN_TOP_CUT or y1 - y0 >= 5:
+                continue
+            if not (SEPARATOR_MIN_WIDTH <= x1 - x0 <= SEPARATOR_MAX_WIDTH):
+                continue
+            candidates.append((x0, y0))
+        return candidates
+
+    def _neighbor_separator_x0(self, page):
+        """
+        邻页（上一页/下一页）分割线左端 X 坐标，没有则返回 None
+        直接读邻页的矢量图，不依赖别的页有没有解析过：结果与解析顺序无关 (多线程、流水线乱序解析也一样)
+        邻页本身矢量图也很多时不作参考
+        """
+        doc = page.parent
+        for n in (page.number - 1, page.number + 1):
+            if not 0 <= n < doc.page_count:
+                continue
+            drawings = doc[n].get_cdrawings()
+            if len(drawings) > HEAVY_DRAWINGS_LIMIT:
+                continue
+            candidates = self._separator_candidates(drawings)
+            if candidates:
+                return max(candidates, key=lambda c: c[1])[0]
+        return None
+
     def get_split_y(self, page):
         """
         计算正文和注脚的分割线 (Split Line) Y坐标
         列宁全集：用矢量横线（从下往上第一条）
         逻辑：
-        1. 优先找 get_drawings 中的横线（宽 60–75），非连续破折号 block，取从下往上第一条
+        1. 优先找页面下部的矢量横线（宽 60–75），取从下往上第一条
         2. 其次找 '接上页' 这种全页注脚标记
+        结果按页缓存：相邻文章共用的边界页不会重复扫描
         """
-        blocks = page.get_text("blocks")
-        page_height = page.rect.height
+        key = (page.parent.name, page.number)
+        if key in self.split_y_cache:
+            return self.split_y_cache[key]
+
+        split_y = self._compute_split_y(page)
+        self.split_y_cache[key] = split_y
+        return split_y
 
+    def _compute_split_y(self, page):
         # 1. 矢量横线（从下往上第一条）
         # 页眉线：宽度>200；正文/注脚分割线：宽度约 60–75
-        drawings = page.get_drawings()
-        h_lines = []
-        for d in drawings:
-            r = d.get("rect")
-            # 特征匹配
-            if not r or r.height >= 5:
-                continue
-            w = r.width
-            if 60 <= w <= 75:
-                h_lines.append(r.y0)
-        if h_lines:
-            return max(h_lines) - 2  # 稍微往上提一点作为分界线
+        sep_y = self.find_separator_y(page)
+        if sep_y is not None:
+            return sep_y - 2  # 稍微往上提一点作为分界线
 
-        # 2. 扫描全页注脚标记
+        # 2. 扫描全页注脚标记（只在没有横线时才取文本块）
+        blocks = page.get_text("blocks")
         check_count = 0
         for b in blocks:
             y0 = b[1]
@@ -98,14 +194,14 @@ class LeninParser:
                 check_count += 1
                 if check_count >= 5: break # 只检查顶部几个块，避免误判
 
-        return page_height # 没找到分割线，说明全是正文
+        return page.rect.height # 没找到分割线，说明全是正文
 
-    def process_spans_in_line(self, line, page_note_queue):
+    def process_spans_in_line(self, line):
         """
         [核心函数] 处理单行内的所有 span（片段），负责：
         1. 字体语义识别（黑体->粗体，楷体->斜体，仿宋->引用）
         2. 标题层级判定
-        3. 注脚符号替换
+        3. 注脚符号替换（先替换为占位符 NOTE_PLACEHOLDER）
         4. 智能去空（修复标题空格）
         """
         spans = line["spans"]
@@ -216,15 +312,9 @@ class LeninParser:
                     formatted_text += "\n\n"
                 text = f"**{text.strip()}**"
 
-            # 替换注脚符号为 Markdown 格式 [^n]
-            def replace_ref_body(_match):
-                note_id = self.global_note_id
-                self.global_note_id += 1
-                page_note_queue.append(note_id)
-                return f"[^{note_id}]"
-
+            # 注脚符号先换成占位符，编号在 resolve_note_refs 中按章节顺序分配（页面结果才能缓存复用）
             # 正则匹配 ① 到 ⑩ (\u2460 - \u2469)
-            text = re.sub(r'[\u2460-\u2469]', replace_ref_body, text)
+            text = re.sub(r'[\u2460-\u2469]', NOTE_PLACEHOLDER, text)
 
             # [逻辑] 应用行内样式 (加粗/斜体)
             # 只有当这一行不是标题时才应用，避免 ### **Title** 这种冗余
@@ -301,225 +391,381 @@ class LeninParser:
 
         return formatted_text, line_prefix
 
-    def append_to_buffer(self, clean_line, is_new_para):
+    def append_to_buffer(self, state, clean_line, is_new_para):
         """
-        将处理好的单行文本追加到缓冲区，处理跨行拼接逻辑
+        将处理好的单行文本追加到 state 的缓冲区，处理跨行拼接逻辑
         """
         # 1. 引用拼接逻辑
         # 如果是同类型引用续行，去掉 "> " 前缀直接拼，防止每行都断开
         # is_quote_continuation = False # 变量虽未使用但逻辑保留
-        if clean_line.startswith("> ") and not is_new_para and self.current_para.startswith("> "):
+        if clean_line.startswith("> ") and not is_new_para and state.current_para.startswith("> "):
             # is_quote_continuation = True
             clean_line = clean_line[2:]
 
         # 2. 标题续行拼接：上一段是标题且本行也是标题续行，去掉 "#" 前缀再拼
-        if not is_new_para and self.current_para and re.match(r'^#+\s', self.current_para) and re.match(r'^#+\s', clean_line):
+        if not is_new_para and state.current_para and re.match(r'^#+\s', state.current_para) and re.match(r'^#+\s', clean_line):
             clean_line = re.sub(r'^#+\s*', '', clean_line)
 
         if is_new_para:
             # 新段落：将旧段落推入 buffer，开始记录新段落
-            if self.current_para:
-                self.body_buffer.append(self.current_para)
-            self.current_para = clean_line
+            if state.current_para:
+                state.body_buffer.append(state.current_para)
+            state.current_para = clean_line
         else:
             # 续行：拼接到当前段落
-            if self.current_para:
+            if state.current_para:
                 merged = False
 
                 # [核心修复] 粗体融合 (Bold Fusion)
                 # 场景：Line1: "**开始**" + Line2: "**结束**" -> "**开始结束**"
                 # 避免出现 "**开始****结束**" 导致渲染断裂
-                if self.current_para.endswith("**") and clean_line.startswith("**"):
-                    raw_last = self.current_para[:-2][-1].replace("*", "").replace("`", "")
+                if state.current_para.endswith("**") and clean_line.startswith("**"):
+                    raw_last = state.current_para[:-2][-1].replace("*", "").replace("`", "")
                     raw_curr = clean_line[2:][0].replace("*", "").replace("`", "")
                     if self.is_cjk(raw_last) and self.is_cjk(raw_curr):
-                        self.current_para = self.current_para[:-2] + clean_line[2:]
+                        state.current_para = state.current_para[:-2] + clean_line[2:]
                         merged = True
 
                 # [核心修复] 斜体融合 (Italic Fusion)
                 # 场景：Line1: "*（笑声*" + Line2: "*，鼓掌）*" -> "*（笑声，鼓掌）*"
-                elif self.current_para.endswith("*") and clean_line.startswith("*") and not self.current_para.endswith(
+                elif state.current_para.endswith("*") and clean_line.startswith("*") and not state.current_para.endswith(
                         "**") and not clean_line.startswith("**"):
-                    raw_last = self.current_para[:-1][-1].replace("*", "").replace("`", "")
+                    raw_last = state.current_para[:-1][-1].replace("*", "").replace("`", "")
                     raw_curr = clean_line[1:][0].replace("*", "").replace("`", "")
                     if self.is_cjk(raw_last) and self.is_cjk(raw_curr):
-                        self.current_para = self.current_para[:-1] + clean_line[1:]
+                        state.current_para = state.current_para[:-1] + clean_line[1:]
                         merged = True
 
                 if not merged:
                     # 普通文本拼接：汉字之间不加空格，西文之间加空格
-                    last_char = self.current_para[-1].replace("*", "").replace("`", "")
+                    last_char = state.current_para[-1].replace("*", "").replace("`", "")
                     curr_char = clean_line[0].replace("*", "").replace("`", "")
 
                     if self.is_cjk(last_char) and self.is_cjk(curr_char):
-                        self.current_para += clean_line
+                        state.current_para += clean_line
                     else:
-                        self.current_para += " " + clean_line
+                        state.current_para += " " + clean_line
             else:
-                self.current_para = clean_line
+                state.current_para = clean_line
 
-    def parse_chapter_pages(self, doc, page_indices, article_output_dir):
+    def extract_page(self, page):
         """
-        [主入口] 解析指定章节的页面列表(跨页流式处理)
-        :param doc: PyMuPDF Document
-        :param page_indices: 这一章包含的页码列表 (0-based)
-        :param article_output_dir: 本篇文章的输出目录，图片保存在其 assets 子目录
+        单页提取：分割线、图片、正文行、注脚行。只依赖页面本身，与章节状态无关，因此可以缓存。
+        分两步：read_page (MuPDF 读页面) + format_page (纯 Python 排版)，流水线模式下两步在不同线程里跑
+        :return: dict
+            split_y: 正文/注脚分割线
+            images:  [(y, (摘要, ext, bytes)), ...] 按出现顺序；内嵌图片摘要为 None
+            body:    [(clean_line, prefix, is_indented, y), ...] 正文行，注脚符号为 NOTE_PLACEHOLDER
+            foot:    [clean_line, ...] 注脚行
+            y 是行 / 图片的底边，文章从页面中间开始时按它把这一页分给前后两篇
         """
-        # 设置本篇文章的 assets 目录
-        self.assets_dir = article_output_dir / "assets"
-        self.assets_dir.mkdir(parents=True, exist_ok=True)
-        self.img_counter = 0
+        return self.format_page(self.read_page(page))
 
-        # 重置状态 (每章开始)
-        self.global_note_id = 1
-        self.all_footnotes = []
-        self.body_buffer = []
-        self.current_para = ""
+    def read_page(self, page):
+        """
+        单页提取的 MuPDF 部分：分割线、裁剪区内的文字 (dict)、图片引用
+        :return: {"split_y", "images", "data": get_text("dict") 的结果}
+        """
+        # 获取分割线位置，区分正文和注脚
+        split_y = self.get_split_y(page)
+        # 计算裁剪框：去掉页眉
+        actual_top_cut = min(MARGIN_TOP_CUT, split_y)
+        # 去掉底部有干扰信息的区域
+        clip_bottom = min(MARGIN_BOTTOM_CUT, page.rect.height)
+        # 获取内容
+        clip_rect = fitz.Rect(0, actual_top_cut, page.rect.width, clip_bottom)
+        # 文字提取不带图片：dict 模式的图片块会被 MuPDF 解码再重新编码，图片改走 xref 提取
+        data = page.get_text("dict", clip=clip_rect, flags=TEXT_FLAGS)
+        images = self.collect_page_images(page, clip_rect)
+        return {"split_y": split_y, "images": images, "data": data}
+
+    def format_page(self, raw):
+        """
+        单页提取的纯 Python 部分：按分割线分流正文行 / 注脚行，逐行识别字体样式、拼 Markdown
+        :param raw: read_page 的结果
+        :return: 同 extract_page
+        """
+        split_y, images, data = raw["split_y"], raw["images"], raw["data"]
 
-        # 遍历章节里的每一页并解析
-        for p_idx in page_indices:
-            page = doc[p_idx]
-            page_num = page.number + 1  # 人类阅读页码 (1-based)
-            # 获取分割线位置，区分正文和注脚
-            split_y = self.get_split_y(page)
-            # 计算裁剪框：去掉页眉
-            actual_top_cut = min(MARGIN_TOP_CUT, split_y)
-            # 去掉底部有干扰信息的区域
-            clip_bottom = min(MARGIN_BOTTOM_CUT, page.rect.height)
-            # 获取内容
-            clip_rect = fitz.Rect(0, actual_top_cut, page.rect.width, clip_bottom)
-            data = page.get_text("dict", clip=clip_rect)
-
-            body_lines_raw = [] # 正文区域
-            foot_lines_raw = [] # 脚注区域
-            page_note_queue = [] # 当前页面的注脚号队列 (Body 生产 ID -> Footer 消费 ID)
-
-            # 遍历块，分流图片、正文行、注脚行
-            for block in data["blocks"]:
-                # --- 图片处理 ---
+        body_lines_raw = [] # 正文区域
+        foot_lines_raw = [] # 脚注区域
+
+        # 遍历块，分流正文行、注脚行
+        for block in data["blocks"]:
+            # --- 文本处理 ---
+            if "lines" not in block:
+                continue
+
+            # 根据 Y 坐标划分区域，分流
+            if block["bbox"][1] >= split_y:
+                foot_lines_raw.extend(block["lines"])
+            else:
+                body_lines_raw.extend(block["lines"])
+
+        body = []
+        for line in body_lines_raw:
+            line_text, prefix = self.process_spans_in_line(line)
+            # [注意] strip() 在这里调用，去除 Raw 字符串里的物理缩进
+            clean_line = self.clean_text(line_text).strip()
+
+            if not clean_line:
+                continue
+            if re.search(r'[—_]{8,}', clean_line):
+                continue # 跳过分割线
+
+            # 缩进特征：物理缩进 或 空格缩进 (全角/半角)
+            raw_text = "".join([s["text"] for s in line["spans"]])
+            is_indented = (line["bbox"][0] > INDENT_THRESHOLD
+                           or raw_text.startswith("　") or raw_text.startswith("  "))
+            body.append((clean_line, prefix, is_indented, line["bbox"][3]))
+
+        foot = []
+        for line in foot_lines_raw:
+            raw_text = "".join([s["text"] for s in line["spans"]])
+            clean_line = self.clean_text(raw_text).strip()
+            if not clean_line:
+                continue
+            if re.search(r'[—_]{8,}', clean_line):
+                continue
+            foot.append(clean_line)
+
+        return {"split_y": split_y, "images": images, "body": body, "foot": foot}
+
+    def collect_page_images(self, page, clip_rect):
+        """
+        按出现顺序收集页面图片，保留原始编码（jpeg/png/...，按 xref 提取，不经 dict 模式重新编码）
+        只收完整落在裁剪框 (页眉线与底部裁剪线之间) 内的图片，与原来 dict 模式按裁剪框取图片块一致：
+        跨过页眉线或 MARGIN_BOTTOM_CUT 的图片 (扫描页顶部、底部的页眉页脚条) 都跳过
+        结果里放图片字节和内容摘要而不是 xref：xref 只在产生它的文件里有意义，单页结果要能缓存、交给别的线程组装
+        :return: [(图片底边 y, (摘要, ext, bytes)), ...]；内嵌图片 (inline image) 摘要为 None (不去重)
+        """
+        images = []
+        extracted = {}  # 同一页重复出现的 xref 只提取一次
+        for info in page.get_image_info(xrefs=True):
+            bbox = fitz.Rect(info["bbox"])
+            if not clip_rect.contains(bbox):
+                continue
+            xref = info["xref"]
+            if xref > 0:
+                if xref not in extracted:
+                    image = page.parent.extract_image(xref)
+                    digest = hashlib.sha1(image["image"]).hexdigest()
+                    extracted[xref] = (digest, image["ext"], image["image"])
+                images.append((bbox.y1, extracted[xref]))
+                continue
+            # 内嵌图片没有 xref，只能退回 dict 模式按位置取
+            for block in page.get_text("dict", clip=bbox)["blocks"]:
                 if "image" in block:
-                    self.img_counter += 1
-                    img_filename = f"img_{self.img_counter}.png"
-                    img_path = self.assets_dir / img_filename
-                    try:
-                        with open(img_path, "wb") as f:
-                            f.write(block["image"])
-                        self.append_to_buffer(f"![img](assets/{img_filename})", is_new_para=True)
-                    except Exception as e:
-                        print(f"⚠️ 图片保存失败 p{page_num}: {e}")
-                    continue
-
-                # --- 文本处理 ---
-                if "lines" not in block:
-                    continue
-
-                # 根据 Y 坐标划分区域，分流
-                if block["bbox"][1] >= split_y:
-                    foot_lines_raw.extend(block["lines"])
-                else:
-                    body_lines_raw.extend(block["lines"])
+                    images.append((bbox.y1, (None, block["ext"], block["image"])))
+                    break
+        return images
 
-            # === Pass 1: 处理正文区域 ===
-            last_line_prefix = ""
-            for line in body_lines_raw:
-                line_text, prefix = self.process_spans_in_line(line, page_note_queue)
-                # [注意] strip() 在这里调用，去除 Raw 字符串里的物理缩进
-                clean_line = self.clean_text(line_text).strip()
+    def save_image(self, state, image_ref):
+        """
+        把图片加入本篇文章的图片列表 (state.article_images)
+        同一张图片 (内容摘要相同) 在本篇文章中只收一次，重复出现直接复用文件名
+        :param image_ref: 单页结果里的 (摘要, ext, bytes)
+        :return: 文件名
+        """
+        digest, ext, image_bytes = image_ref
+        if digest is not None and digest in state.image_files:
+            return state.image_files[digest]
 
-                if not clean_line:
-                    continue
-                if re.search(r'[—_]{8,}', clean_line):
-                    continue # 跳过分割线
+        state.img_counter += 1
+        img_filename = f"img_{state.img_counter}.{ext}"
+        state.article_images.append((img_filename, image_bytes))
 
-                # 智能分段判断（last_line_prefix 为上一行的 prefix，用于标题续行判定）
-                is_new = False
+        if digest is not None:
+            state.image_files[digest] = img_filename
+        return img_filename
 
-                # [判定 1] 物理缩进 -> 新段落
-                if line["bbox"][0] > INDENT_THRESHOLD:
-                    is_new = True
-                # [判定 2] 空格缩进 (全角/半角) -> 新段落
-                raw_text = "".join([s["text"] for s in line["spans"]])
-                if raw_text.startswith("　") or raw_text.startswith("  "):
+    def cache_key(self, page):
+        """
+        单页结果的缓存键：本页的输入 + 邻页的输入
+        矢量图很多的页要参考邻页的分割线 (_neighbor_separator_x0)；判断是不是这种页要先读矢量图，
+        比查缓存本身还慢，所以每页都带上邻页哈希 (按页备忘，不多花时间)
+        """
+        doc = page.parent
+        neighbors = [self.page_cache.page_hash(doc[n]) for n in (page.number - 1, page.number + 1)
+                     if 0 <= n < doc.page_count]
+        return self.page_cache.key_for(page, self.config_hash, *neighbors)
+
+    def get_page_result(self, state, page):
+        """取单页提取结果：先看本章上一次提取的页 (边界页)，再查页面缓存，都未命中再提取并写回"""
+        page_key = (page.parent.name, page.number)
+        if state.last_page is not None and state.last_page[0] == page_key:
+            return state.last_page[1]
+
+        if self.page_cache is None:
+            result = self.extract_page(page)
+        else:
+            key = self.cache_key(page)
+            result = self.page_cache.get(key)
+            if result is None:
+                result = self.extract_page(page)
+                self.page_cache.put(key, result)
+
+        state.last_page = (page_key, result)
+        return result
+
+    def clip_page_result(self, result, top_y=None, bottom_y=None):
+        """
+        两篇文章共用一页时，只取属于本篇的部分：底边 y 在 (top_y, bottom_y] 之间的正文行和图片
+        注脚跟着引用走：上一篇在这一页引用了 n 个注脚，就跳过页底前 n 条；
+        开头没有 ① 的续行是上一页注脚的后半段，归拥有这一页顶部的文章
+        :param top_y: 本篇书签在这一页的 Y 坐标 (None = 从页首开始)
+        :param bottom_y: 下一篇书签在这一页的 Y 坐标 (None = 到页尾)
+        """
+        if top_y is None and bottom_y is None:
+            return result
+
+        def in_range(y):
+            return (top_y is None or y > top_y) and (bottom_y is None or y <= bottom_y)
+
+        body = [line for line in result["body"] if in_range(line[3])]
+        notes_before = sum(line[0].count(NOTE_PLACEHOLDER) for line in result["body"]
+                           if top_y is not None and line[3] <= top_y)
+        notes_here = sum(line[0].count(NOTE_PLACEHOLDER) for line in body)
+
+        # 页底注脚按 ① 分组，第一组之前的是续行
+        continuation, notes = [], []
+        for clean_line in result["foot"]:
+            if re.match(r'^[\u2460-\u2469]', clean_line):
+                notes.append([clean_line])
+            elif notes:
+                notes[-1].append(clean_line)
+            else:
+                continuation.append(clean_line)
+
+        last = None if bottom_y is None else notes_before + notes_here
+        foot = continuation if top_y is None else []
+        for note in notes[notes_before:last]:
+            foot.extend(note)
+
+        images = [image for image in result["images"] if in_range(image[0])]
+        return {"split_y": result["split_y"], "images": images, "body": body, "foot": foot}
+
+    def resolve_note_refs(self, state, text, page_note_queue):
+        """把占位符替换为 Markdown 注脚 [^n]，并把编号放入本页队列，供页底注脚领取"""
+        def replace_ref_body(_match):
+            note_id = state.global_note_id
+            state.global_note_id += 1
+            page_note_queue.append(note_id)
+            return f"[^{note_id}]"
+
+        return re.sub(NOTE_PLACEHOLDER, replace_ref_body, text)
+
+    def parse_page(self, state, doc, p_idx, top_y=None, bottom_y=None, page_results=None):
+        """
+        解析一页，结果追加进 state (正文段落、注脚、图片、注脚计数)
+        :param state: ChapterState
+        :param doc: PyMuPDF Document
+        :param p_idx: 页码 (0-based)
+        :param top_y / bottom_y: 与别的文章共用这一页时，本篇的范围 (见 clip_page_result)
+        :param page_results: 流水线模式下已提取好的 {页码: 单页结果}，只组装、不读页面
+        """
+        page_num = p_idx + 1  # 人类阅读页码 (1-based)
+        if page_results is not None:
+            result = page_results[p_idx]
+        else:
+            result = self.get_page_result(state, doc[p_idx])
+        result = self.clip_page_result(result, top_y=top_y, bottom_y=bottom_y)
+
+        page_note_queue = [] # 当前页面的注脚号队列 (Body 生产 ID -> Footer 消费 ID)
+
+        # --- 图片处理 ---
+        for _, image_ref in result["images"]:
+            try:
+                img_filename = self.save_image(state, image_ref)
+                self.append_to_buffer(state, f"![img](assets/{img_filename})", is_new_para=True)
+            except Exception as e:
+                print(f"⚠️ 图片保存失败 p{page_num}: {e}")
+
+        # === Pass 1: 处理正文区域 ===
+        last_line_prefix = ""
+        for clean_line, prefix, is_indented, _ in result["body"]:
+            clean_line = self.resolve_note_refs(state, clean_line, page_note_queue)
+
+            # 智能分段判断（last_line_prefix 为上一行的 prefix，用于标题续行判定）
+            # [判定 1] 物理缩进 -> 新段落
+            # [判定 2] 空格缩进 (全角/半角) -> 新段落
+            is_new = is_indented
+
+            # [判定 3] 标题强制换段（但连续多行同标题视为续行，合并为一行）
+            if prefix.startswith("#"):
+                if last_line_prefix.strip().startswith("#"):
+                    # 上一行也是标题 -> 标题续行，不换段
+                    is_new = False
+                else:
                     is_new = True
 
-                # [判定 3] 标题强制换段（但连续多行同标题视为续行，合并为一行）
-                if prefix.startswith("#"):
-                    if last_line_prefix.strip().startswith("#"):
-                        # 上一行也是标题 -> 标题续行，不换段
-                        is_new = False
-                    else:
-                        is_new = True
-
-                # [判定 4] 引用块逻辑
-                if prefix.startswith(">"):
-                    # [核心修复] 正文/引用防粘连
-                    # 如果上一段是正文(不带>)，这一段是引用(带>) -> 强制换段 (如文末出版信息)
-                    if self.current_para and not self.current_para.startswith("> "):
-                        is_new = True
-                    elif not is_new:  # 如果是引用接引用，且无缩进 -> 视为续行
-                        is_new = False
-
-                # [核心修复] 注脚跟随 (去掉 $)
-                # 允许注脚符号后跟文字 (如 "[^1]。内容") 紧接上一行
-                if re.match(r'^\s*\[\^\d+\]', clean_line):
+            # [判定 4] 引用块逻辑
+            if prefix.startswith(">"):
+                # [核心修复] 正文/引用防粘连
+                # 如果上一段是正文(不带>)，这一段是引用(带>) -> 强制换段 (如文末出版信息)
+                if state.current_para and not state.current_para.startswith("> "):
+                    is_new = True
+                elif not is_new:  # 如果是引用接引用，且无缩进 -> 视为续行
                     is_new = False
 
-                self.append_to_buffer(clean_line, is_new)
-                last_line_prefix = prefix
-
-            # === Pass 2: 处理页底注脚区域 ===
-            # 列宁的：每行都缩进，只有 ① 序号突出。只用序号判断新注脚，不用缩进。（斯大林的：需用缩进判断，因正文与注脚布局类似）
-            current_foot_para = ""
-            for line in foot_lines_raw:
-                raw_text = "".join([s["text"] for s in line["spans"]])
-                clean_line = self.clean_text(raw_text).strip()
-                if not clean_line:
-                    continue
-                if re.search(r'[—_]{8,}', clean_line):
-                    continue
-
-                # 检测注脚开头是否有符号：① 或 [^1]
-                match = re.match(r'^[\u2460-\u2469]', clean_line)
-                is_new_foot = False
-
-                if match:
-                    is_new_foot = True
-                    # 将 PDF 的圈圈数字替换为 Markdown 的 [^n]
-                    if page_note_queue:
-                        # 从队列领号
-                        note_id = page_note_queue.pop(0)
-                        # 替换符号
-                        clean_line = clean_line.replace(match.group(), f"[^{note_id}]: ", 1)
-                    else:
-                        # 异常情况：页底有圈圈，但正文没引用？
-                        # 兜底：生成一个随机ID或保留原样
-                        clean_line = clean_line.replace(match.group(), f"[^x]: ", 1)
-
-                # 拼接注脚文本（续行直接拼，不加换行）
-                if is_new_foot:
-                    if current_foot_para:
-                        self.all_footnotes.append(current_foot_para)
-                    current_foot_para = clean_line
+            # [核心修复] 注脚跟随 (去掉 $)
+            # 允许注脚符号后跟文字 (如 "[^1]。内容") 紧接上一行
+            if re.match(r'^\s*\[\^\d+\]', clean_line):
+                is_new = False
+
+            self.append_to_buffer(state, clean_line, is_new)
+            last_line_prefix = prefix
+
+        # === Pass 2: 处理页底注脚区域 ===
+        # 列宁的：每行都缩进，只有 ① 序号突出。只用序号判断新注脚，不用缩进。（斯大林的：需用缩进判断，因正文与注脚布局类似）
+        current_foot_para = ""
+        for clean_line in result["foot"]:
+            # 检测注脚开头是否有符号：① 或 [^1]
+            match = re.match(r'^[\u2460-\u2469]', clean_line)
+            is_new_foot = False
+
+            if match:
+                is_new_foot = True
+                # 将 PDF 的圈圈数字替换为 Markdown 的 [^n]
+                if page_note_queue:
+                    # 从队列领号
+                    note_id = page_note_queue.pop(0)
+                    # 替换符号
+                    clean_line = clean_line.replace(match.group(), f"[^{note_id}]: ", 1)
                 else:
-                    if current_foot_para:
-                        current_foot_para += clean_line
-                    elif self.all_footnotes:
-                        self.all_footnotes[-1] += clean_line
-                    else:
-                        current_foot_para = clean_line
+                    # 异常情况：页底有圈圈，但正文没引用？
+                    # 兜底：生成一个随机ID或保留原样
+                    clean_line = clean_line.replace(match.group(), f"[^x]: ", 1)
+
+            # 拼接注脚文本（续行直接拼，不加换行）
+            if is_new_foot:
+                if current_foot_para:
+                    state.all_footnotes.append(current_foot_para)
+                current_foot_para = clean_line
+            else:
+                if current_foot_para:
+                    current_foot_para += clean_line
+                elif state.all_footnotes:
+                    state.all_footnotes[-1] += clean_line
+                else:
+                    current_foot_para = clean_line
 
-            # 本页最后一个注脚段落
-            if current_foot_para:
-                self.all_footnotes.append(current_foot_para)
+        # 本页最后一个注脚段落
+        if current_foot_para:
+            state.all_footnotes.append(current_foot_para)
 
-        # 刷新最后的正文缓存
-        if self.current_para:
-            self.body_buffer.append(self.current_para)
+    def finish_chapter(self, state):
+        """
+        把 state 里累积的内容组装成 Markdown 正文 (不修改 state)
+        :return: Markdown 正文；图片在 state.article_images 中，正文里引用为 assets/文件名
+        """
+        # 刷新最后的正文缓存 (拼一个新列表，不改 state，解析完的 state 还可以存盘 / 接着用)
+        body_buffer = state.body_buffer + ([state.current_para] if state.current_para else [])
 
         # === [核心修复] 引用块智能合并 (Quote Merger) ===
         # 将连续的两个独立引用块 (中间有空行) 合并为一个块
         merged_buffer = []
-        for block in self.body_buffer:
+        for block in body_buffer:
             if not merged_buffer:
                 merged_buffer.append(block)
                 continue
@@ -535,7 +781,38 @@ class LeninParser:
         # 最终组装全文
         full_md = "\n\n".join(merged_buffer)
 
-        if self.all_footnotes:
-            full_md += "\n\n" + "\n\n".join(self.all_footnotes)
+        if state.all_footnotes:
+            full_md += "\n\n" + "\n\n".join(state.all_footnotes)
+
+        return full_md
 
-        return full_md
\ No newline at end of file
+    def parse_chapter(self, doc, page_indices, start_y=None, end_y=None, page_results=None, state=None,
+                      previous=None):
+        """
+        [主入口] 解析指定章节的页面列表(跨页流式处理)
+        :param doc: PyMuPDF Document
+        :param page_indices: 这一章包含的页码列表 (0-based)
+        :param start_y: 文章从第一页中间开始时，书签的 Y 坐标 (之上的内容属于上一篇)
+        :param end_y: 下一篇从最后一页中间开始时，它的书签 Y 坐标 (之下的内容属于下一篇)
+        :param page_results: 流水线模式下已提取好的 {页码: 单页结果}，只组装、不读页面
+        :param state: 上次没解析完的 ChapterState，从它的 pages_done 页接着解析；None = 从头开始
+        :param previous: 上一篇文章的 ChapterState，它的最后一页就是本篇第一页时直接复用，不再提取
+        :return: (Markdown 正文, ChapterState)；图片在 state.article_images 中，正文里引用为 assets/文件名
+        """
+        if state is None:
+            state = ChapterState()
+            if previous is not None:
+                state.last_page = previous.last_page
+
+        # 遍历章节里的每一页并解析
+        last = len(page_indices) - 1
+        for i in range(state.pages_done, len(page_indices)):
+            self.parse_page(
+                state, doc, page_indices[i],
+                top_y=start_y if i == 0 else None,
+                bottom_y=end_y if i == last else None,
+                page_results=page_results,
+            )
+            state.pages_done = i + 1
+
+        return self.finish_chapter(state), state
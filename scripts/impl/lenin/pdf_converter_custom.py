@@ -1,10 +1,22 @@
 import fitz
 import re
-import yaml
+import sys
+import threading
 from pathlib import Path
 
 # 导入我们的自定义解析器，而非官方的 pymupdf4llm
-from lenin_parser import LeninParser
+from lenin_parser import LeninParser, MARGIN_TOP_CUT
+
+# 公共模块目录 scripts/common
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / "common"))
+from bundle_writer import BundleWriter
+from checkpoint import CheckpointJournal, code_version, run_key
+from corpus_store import CorpusStore
+from jsonl_export import JsonlExporter
+from mapped_pdf import open_pdf
+from memory_guard import MemoryGuard
+from page_cache import PageCache
+from pipeline import Pipeline, Stage
 
 # ==================== 📜 解析规则 ====================
 
@@ -23,6 +35,7 @@ OUTPUT_DIR = PROJECT_ROOT / "data/processed/lenin/列宁全集（版本II-文字
 # 2. 安全模式
 # True = 侦察模式 (只看目录结构)
 # False = 执行模式 (生成最终 Markdown)
+# 只想看书签分类 / 页码统计 (JSON、CSV，多卷并行)，用 scripts/utils/pdf/toc_report.py，更快
 DRY_RUN = False
 
 # 3. 切分层级
@@ -31,20 +44,95 @@ SPLIT_LEVEL = 1
 # 4. 黑名单
 BLACKLIST = ["目录"]
 
+# 5. 页面缓存 (None = 不缓存)
+# 缓存单页提取结果，改书签范围/重跑相邻文章时，内容没变的页直接复用
+PAGE_CACHE_DIR = PROJECT_ROOT / "data/cache/pages"
+PAGE_CACHE_MAX_MB = 512
+
+# 6. 内存上限模式 (两千多页的大部头用)
+# True = 每篇文章后释放页面资源、收缩 MuPDF 缓存，每 REOPEN_EVERY 篇重新打开文档，结束时报告峰值内存
+LOW_MEMORY = False
+REOPEN_EVERY = 200  # 0 = 只收缩缓存，不重新打开
+
+# 7. 输出后端
+# "files"  = Page Bundles 目录树 (文章目录/index.md + assets/)
+# "sqlite" = 写入单个 SQLite 语料库 CORPUS_DB，需要目录树时运行 scripts/common/corpus_store.py 导出
+OUTPUT_BACKEND = "files"
+CORPUS_DB = PROJECT_ROOT / "data/processed/corpus.sqlite"
+ASYNC_WRITE = False  # files 后端：True = 后台线程写盘，解析不用等磁盘
+FSYNC = False        # files 后端：True = 每篇文章落盘后 fsync，断电也不丢 (慢)
+IMAGE_WORKERS = 4    # files 后端：写图片的线程数，解析下一篇时图片在后台落盘 (0 = 顺序写)
+
+# 8. JSONL 流式导出 (None = 不导出)
+# 与上面的输出后端同时写：每篇文章一行 JSON，后缀 .gz / .zst 自动压缩，供下游一遍顺序读完整个语料
+JSONL_EXPORT = None  # 例如 PROJECT_ROOT / "data/processed/xxx.jsonl.gz"
+
+# 9. 断点续跑 (None = 不记录)
+# 每篇文章落盘后记进日志；中断后重跑，日志里已完成 (页码范围也没变) 的文章直接跳过
+# 只认同一输出后端、同一输出位置、同一版解析器写下的记录，且文章还得在输出里 (输出删了就重新转换)
+# 多本书共用一个日志，批量转换时整本已完成的卷也会跳过
+CHECKPOINT_JOURNAL = None  # 例如 PROJECT_ROOT / "data/cache/checkpoints.jsonl"
+RESUME = True  # False = 从头转换本书 (日志里本书的旧记录作废)
+
+# 10. 流水线模式 (False = 逐篇顺序执行：读页、排版、组装、写盘在一个循环里轮流做)
+# True = 读页 (MuPDF) → 排版 (纯 Python) → 组装文章 → 写盘 (主线程) 分段执行，段间用有界队列连接，
+#        写盘等磁盘时后面的页已经在读；结束时打印各段忙碌率和队列深度，看哪一段是瓶颈
+# 每页只读一次 (两篇共用的边界页也是)；LOW_MEMORY 在流水线模式下不生效
+PIPELINE = False
+PIPELINE_WORKERS = {"read": 1, "format": 1, "assemble": 1}  # 各段线程数；read 每个线程各开一份 Document
+PIPELINE_QUEUE = 16  # 每段输入队列的容量 (页 / 篇)
+
+# 11. 内存映射打开 PDF
+# True = 把 PDF 只读映射 (mmap) 进内存再打开，流水线的多个读页线程、批量转换的多个工作进程共用页缓存里的同一份文件
+# False = 按路径打开 (MuPDF 按块读文件，本来也不会把整本读进内存)
+# 本项目的 PDF 每卷只有几 MB，实测 (第 1-3 卷、2 个工作者) 速度无差别，映射的页计入 PSS 反而多约 10 MB，所以默认关；
+# PDF 很大、工作者很多或放在慢盘上时打开，用 scripts/utils/bench_executors.py 对比
+MMAP_INPUT = False
+
 
 # ==================== ⚙️ 智能引擎：转换逻辑 ====================
 
+def checkpoint_run(output_dir):
+    """断点日志的运行标识：输出后端 + 输出位置 + 解析器版本"""
+    location = CORPUS_DB if OUTPUT_BACKEND == "sqlite" else output_dir
+    return run_key(OUTPUT_BACKEND, location, code_version(LeninParser))
+
+
 def clean_filename(text):
     """文件名清洗，去特殊字符"""
     return re.sub(r'[\\/:*?"<>|]', '_', text).strip()
 
 
+def bookmark_y(doc, page_index, dest):
+    """
+    文章从页面中间开始时，返回书签跳转目标的 Y 坐标；从页首开始 (目标点上方没有正文) 或拿不到目标点返回 None
+    有的书签目标点是坏的 (负数、超出页面)，按从页首开始处理
+    """
+    to = dest.get("to") if dest.get("kind") == fitz.LINK_GOTO else None
+    if to is None or not 0 <= page_index < doc.page_count:
+        return None
+    page = doc[page_index]
+    if not (0 <= to.x <= page.rect.width and MARGIN_TOP_CUT < to.y < page.rect.height):
+        return None
+    # 页眉以下、整个词都在目标点以上 -> 上半页属于上一篇
+    # (与解析器按行底边切分的规则一致；标题旁的上标注脚号、压在标题行里的目标点都不算)
+    words = page.get_text("words", clip=fitz.Rect(0, MARGIN_TOP_CUT, page.rect.width, to.y))
+    return to.y if any(w[1] >= MARGIN_TOP_CUT and w[3] <= to.y for w in words) else None
+
+
+def is_file_item(item):
+    """这个书签会成为一篇文章吗 (与 main 里的判定 1 相同)"""
+    return item['level'] == SPLIT_LEVEL or (item['level'] < SPLIT_LEVEL and not item['has_children'])
+
+
 def extract_toc_structure(doc):
     """
     提取书签，并计算页码范围
     核心逻辑：先保留黑名单条目用于计算页码边界，算完后再过滤。
+    文章从页面中间开始时记下书签的 Y 坐标 (start_y)，上一篇的最后一页就是这一页的上半部分 (end_y)，
+    共用的边界页按 Y 坐标分给两篇，而不是整页重复出现在两篇里。
     """
-    toc = doc.get_toc()
+    toc = doc.get_toc(simple=False)
     total_pages = doc.page_count
 
     # --- 第一步：构建全量列表 (标记黑名单，但不删除) ---
@@ -53,7 +141,7 @@ def extract_toc_structure(doc):
 
     # 1. 标记黑名单
     for item in toc:
-        lvl, title, page = item[0], item[1], item[2]
+        lvl, title, page, dest = item[0], item[1], item[2], item[3]
         is_blacklisted = False
 
         # 1. 递归黑名单逻辑 (如果父级是黑名单，子级也是)
@@ -73,6 +161,10 @@ def extract_toc_structure(doc):
             "title": title.strip(),
             "start": page - 1,
             "end": -1,  # 待计算
+            # 只有文件/文件夹级别的书签会成为文章边界，内容标题不用看；
+            # 书签上方的内容要有上一篇可归才切 (第四步核对)，第一个书签整页留给它
+            "start_y": bookmark_y(doc, page - 1, dest) if lvl <= SPLIT_LEVEL and full_list else None,
+            "end_y": None,  # 待计算
             "is_blacklisted": is_blacklisted,  # 关键标记
             "has_children": False  # 默认为 False，稍后计算
         })
@@ -96,8 +188,14 @@ def extract_toc_structure(doc):
                 break
 
         if boundary_index != -1:
-            # 结束页 = 下一个边界节点的开始页 - 1
-            end_page = full_list[boundary_index]['start'] - 1
+            boundary = full_list[boundary_index]
+            if boundary['start_y'] is not None and boundary['start'] >= current['start']:
+                # 下一篇从页面中间开始：那一页的上半部分还属于当前文章
+                end_page = boundary['start']
+                current['end_y'] = boundary['start_y']
+            else:
+                # 结束页 = 下一个边界节点的开始页 - 1
+                end_page = boundary['start'] - 1
         else:
             # 没找到边界，说明是全书最后
             end_page = total_pages - 1
@@ -108,15 +206,158 @@ def extract_toc_structure(doc):
 
         current['end'] = end_page
 
-    # --- 第四步：最后才执行过滤 ---
+    # --- 第四步：核对文章的上边界 ---
+    # 书签上方的内容只有在上一篇文章正好结束在这一页时才有归属；否则 (比如前面只是同一页上的文件夹书签)
+    # 上方的文字 (文件夹标题、写作时间) 哪篇都不会要，整页归这一篇
+    for i, current in enumerate(full_list):
+        if current['start_y'] is None or not is_file_item(current):
+            continue
+        top_y = current['start_y']
+        previous = None
+        for prev in reversed(full_list[:i]):
+            if prev['level'] > SPLIT_LEVEL or prev['is_blacklisted']:
+                continue
+            if is_file_item(prev):
+                previous = prev
+                break
+            if prev['start'] == current['start'] and prev['start_y'] is not None:
+                # 同一页上、夹在上一篇和这一篇之间的文件夹书签：文件夹标题归这一篇
+                top_y = min(top_y, prev['start_y'])
+        if previous is not None and previous['end'] == current['start'] and previous['end_y'] is not None:
+            current['start_y'] = top_y
+        else:
+            current['start_y'] = None
+
+    # --- 第五步：最后才执行过滤 ---
     # 只保留非黑名单的条目
     return [item for item in full_list if not item['is_blacklisted']]
 
 
+class ArticleAssembler:
+    """
+    流水线的组装段：页面按任意顺序到达，某篇文章的页到齐了就组装成 Markdown
+    多线程组装时共用一个解析器：每篇文章的状态在各自的 ChapterState 里，页面结果已备好，解析器不读页面
+    """
+
+    def __init__(self, jobs, parser):
+        self.jobs = jobs
+        self.parser = parser
+        self.lock = threading.Lock()
+        self.pages = {}    # 页码 -> 流水线条目 (单页结果、图片)
+        self.users = {}    # 页码 -> 还要用这一页的文章数，用完就丢掉
+        self.waiting = {}  # 页码 -> 在等这一页的文章编号
+        self.missing = []  # 每篇文章还差几页
+        for i, job in enumerate(jobs):
+            pages = set(job["pages"])
+            self.missing.append(len(pages))
+            for p in pages:
+                self.waiting.setdefault(p, []).append(i)
+                self.users[p] = self.users.get(p, 0) + 1
+
+    def __call__(self, item):
+        with self.lock:
+            self.pages[item["page"]] = item
+            ready = []
+            for i in self.waiting.pop(item["page"], []):
+                self.missing[i] -= 1
+                if self.missing[i] == 0:
+                    ready.append(i)
+        for i in ready:
+            yield self.assemble(self.jobs[i])
+
+    def assemble(self, job):
+        with self.lock:
+            items = [self.pages[p] for p in job["pages"]]
+        out = {"job": job, "markdown": None, "images": [], "error": None}
+
+        errors = [it["error"] for it in items if it.get("error")]
+        if errors:
+            out["error"] = errors[0]
+        else:
+            try:
+                out["markdown"], state = self.parser.parse_chapter(
+                    None, job["pages"], start_y=job["start_y"], end_y=job["end_y"],
+                    page_results={it["page"]: it["result"] for it in items})
+                out["images"] = state.article_images
+            except Exception as e:
+                out["error"] = str(e)
+
+        with self.lock:
+            for p in set(job["pages"]):
+                self.users[p] -= 1
+                if self.users[p] == 0:
+                    del self.pages[p], self.users[p]
+        return out
+
+
+def run_pipeline(jobs, parser, writer, jsonl, checkpoint):
+    """
+    流水线模式：读页 → 排版 → 组装 → 写盘 (主线程)
+    :param jobs: 待转换的文章 [{"rel_dir", "front_matter", "pages", "start_y", "end_y", "indent"}, ...]
+    :return: 失败的文章数
+    """
+    local = threading.local()
+
+    def read(p_idx):
+        """MuPDF 段：查页面缓存，未命中就读页面 (图片字节随单页结果一起取出)，后面的段不再碰 Document"""
+        item = {"page": p_idx, "result": None, "raw": None, "cache_key": None, "error": None}
+        try:
+            doc = getattr(local, "doc", None)
+            if doc is None:
+                doc = local.doc = open_pdf(INPUT_PDF, MMAP_INPUT)
+            page = doc[p_idx]
+            if parser.page_cache is not None:
+                item["cache_key"] = parser.cache_key(page)
+                item["result"] = parser.page_cache.get(item["cache_key"])
+            if item["result"] is None:
+                item["raw"] = parser.read_page(page)
+        except Exception as e:
+            item["error"] = f"p{p_idx + 1}: {e}"
+        yield item
+
+    def format_page(item):
+        """纯 Python 段：逐行排版，写回页面缓存"""
+        if item["result"] is None and item["error"] is None:
+            try:
+                item["result"] = parser.format_page(item.pop("raw"))
+                if item["cache_key"] is not None:
+                    parser.page_cache.put(item["cache_key"], item["result"])
+            except Exception as e:
+                item["error"] = f"p{item['page'] + 1}: {e}"
+        yield item
+
+    pipeline = Pipeline([
+        Stage("read", read, workers=PIPELINE_WORKERS["read"], queue_size=PIPELINE_QUEUE),
+        Stage("format", format_page, workers=PIPELINE_WORKERS["format"], queue_size=PIPELINE_QUEUE),
+        Stage("assemble", ArticleAssembler(jobs, parser), workers=PIPELINE_WORKERS["assemble"], queue_size=PIPELINE_QUEUE),
+    ])
+
+    # 每页只进流水线一次，按文章顺序
+    page_order = list(dict.fromkeys(p for job in jobs for p in job["pages"]))
+    failed = 0
+    for out in pipeline.run(page_order):
+        job = out["job"]
+        title = job["front_matter"]["title"]
+        if out["error"] is not None:
+            print(f"{job['indent']}❌ 失败: {title}: {out['error']}")
+            failed += 1
+            continue
+        pages = (job["pages"][0] + 1, job["pages"][-1] + 1)
+        if checkpoint is not None:
+            checkpoint.begin(job["rel_dir"], pages)
+        writer.write_article(job["rel_dir"], job["front_matter"], out["markdown"], out["images"])
+        if jsonl is not None:
+            jsonl.write_article(job["rel_dir"], job["front_matter"], out["markdown"], out["images"], pages=pages)
+        print(f"{job['indent']}📦 完成: {title}")
+
+    print(pipeline.report())
+    return failed
+
+
 def main():
     print(f"📖 读取: {INPUT_PDF.name}")
     try:
-        doc = fitz.open(INPUT_PDF)
+        doc = open_pdf(INPUT_PDF, MMAP_INPUT)
     except Exception as e:
         print(f"❌ 无法打开: {e}")
         return
@@ -129,8 +370,40 @@ def main():
     title_stack = {}
 
     # 初始化自定义解析器
-    # 传入输出目录
-    parser = LeninParser(OUTPUT_DIR)
+    # 传入输出目录和页面缓存
+    page_cache = None
+    if PAGE_CACHE_DIR is not None and not DRY_RUN:
+        page_cache = PageCache(PAGE_CACHE_DIR, max_bytes=PAGE_CACHE_MAX_MB * 1024 * 1024)
+    parser = LeninParser(OUTPUT_DIR, page_cache=page_cache)
+
+    memory_guard = MemoryGuard(INPUT_PDF, reopen_every=REOPEN_EVERY, mapped=MMAP_INPUT) if LOW_MEMORY else None
+
+    # 输出后端
+    writer = None
+    if not DRY_RUN:
+        if OUTPUT_BACKEND == "sqlite":
+            writer = CorpusStore(CORPUS_DB, book=INPUT_PDF.stem)
+            print(f"🗄️ 输出到语料库: {CORPUS_DB}")
+        else:
+            writer = BundleWriter(OUTPUT_DIR, fsync=FSYNC, background=ASYNC_WRITE,
+                                  image_workers=IMAGE_WORKERS, recover=True)
+
+    checkpoint = None
+    if CHECKPOINT_JOURNAL is not None and not DRY_RUN:
+        checkpoint = CheckpointJournal(CHECKPOINT_JOURNAL, book=INPUT_PDF.stem, run=checkpoint_run(OUTPUT_DIR),
+                                       exists=writer.has_article, resume=RESUME)
+        writer.on_written = checkpoint.record
+        if checkpoint.done:
+            print(f"⏩ 断点续跑：日志里已完成 {len(checkpoint.done)} 篇")
+
+    jsonl = None
+    if JSONL_EXPORT is not None and not DRY_RUN:
+        # 续跑时接着上次的文件写 (中断前已导出、但没落盘的文章会再出现一次，下游按 book + path 取最后一条)
+        jsonl = JsonlExporter(JSONL_EXPORT, append=checkpoint is not None and bool(checkpoint.done))
+        print(f"🧾 同时导出 JSONL: {JSONL_EXPORT}")
+    failed = 0
+    jobs = []  # 流水线模式：先收集要转换的文章，遍历完书签再一起跑
+    previous = None  # 上一篇文章的 ChapterState (边界页复用)
 
     # 遍历书签
     for item in toc:
@@ -184,8 +457,7 @@ def main():
             parent = path_stack.get(lvl - 1, OUTPUT_DIR)
             current_path = parent / safe_name
 
-            if not current_path.exists():
-                current_path.mkdir(parents=True, exist_ok=True)
+            writer.make_folder(current_path.relative_to(OUTPUT_DIR))
 
             path_stack[lvl] = current_path
             print(f"{indent}📂 创建目录: {title}")
@@ -193,11 +465,6 @@ def main():
         elif is_file:
             parent = path_stack.get(lvl - 1, OUTPUT_DIR)
             article_dir = parent / clean_filename(title)
-            file_path = article_dir / "index.md"
-
-            # 确保文章目录和父目录存在 (防止跳级情况)
-            if not article_dir.exists():
-                article_dir.mkdir(parents=True, exist_ok=True)
 
             # YAML
             cats = [title_stack[k] for k in sorted(title_stack.keys()) if k < lvl]
@@ -209,24 +476,47 @@ def main():
             }
 
             # 采用 Page Bundles 模式
+            rel_dir = article_dir.relative_to(OUTPUT_DIR)
+            if checkpoint is not None and checkpoint.is_done(rel_dir, (start + 1, end + 1)):
+                print(f"{indent}⏩ 已完成，跳过: {title}")
+                continue
+
             print(f"{indent}🚀 转换“文章包” 📦 : {title} ({start + 1}-{end + 1})...")
 
+            if PIPELINE:
+                jobs.append({"rel_dir": rel_dir, "front_matter": front_matter, "pages": list(range(start, end + 1)),
+                             "start_y": item['start_y'], "end_y": item['end_y'], "indent": indent})
+                continue
+
             try:
                 # === 关键：传入页码列表，使用 LeninParser 一次性处理整节，而非逐页解析 ===
                 pages_to_process = list(range(start, end + 1))
                 if not pages_to_process: continue
 
-                # 调用 parse_chapter_pages
-                md_content = parser.parse_chapter_pages(doc, pages_to_process, article_output_dir=article_dir)
-
-                final_content = "---\n" + yaml.dump(front_matter, allow_unicode=True) + "---\n\n" + md_content
+                # 调用 parse_chapter (每章一个新的解析状态；带上上一篇的状态，共用的边界页不再提取)
+                md_content, state = parser.parse_chapter(doc, pages_to_process,
+                                                         start_y=item['start_y'], end_y=item['end_y'],
+                                                         previous=previous)
+                previous = state
 
-                # 写入文件
-                with open(file_path, "w", encoding="utf-8") as f:
-                    f.write(final_content)
+                # 写入文章包 (index.md + assets/)，或写入语料库
+                if checkpoint is not None:
+                    checkpoint.begin(rel_dir, (start + 1, end + 1))
+                writer.write_article(rel_dir, front_matter, md_content, state.article_images)
+                if jsonl is not None:
+                    jsonl.write_article(rel_dir, front_matter, md_content,
+                                        state.article_images, pages=(start + 1, end + 1))
 
             except Exception as e:
                 print(f"{indent}❌ 失败: {e}")
+                failed += 1
+
+            if memory_guard is not None:
+                doc = memory_guard.after_article(doc)
+
+    if jobs:
+        print(f"\n🏭 流水线转换 {len(jobs)} 篇...")
+        failed += run_pipeline(jobs, parser, writer, jsonl, checkpoint)
 
     if DRY_RUN:
         print("\n📢 --- 侦察结束 ---")
@@ -236,6 +526,18 @@ def main():
         print("3. 标有 🔹 的是你想要的内容标题吗？")
         print("如果是，请将 DRY_RUN 改为 False 正式执行。")
     else:
+        writer.close()
+        if jsonl is not None:
+            jsonl.close()
+        if checkpoint is not None:
+            # 有失败的文章就不标记整本完成，下次续跑只重做失败的
+            if failed == 0:
+                checkpoint.finish()
+            checkpoint.close()
+        if memory_guard is not None:
+            print(f"🧠 {memory_guard.report()}")
+        if page_cache is not None:
+            print(f"💾 {page_cache.stats()}")
         print("\n✅ 全部转换完成！")
 
 
@@ -1,11 +1,19 @@
 import fitz
 import re
-import yaml
+import sys
 from pathlib import Path
 
 # 导入我们的自定义解析器，而非官方的 pymupdf4llm
 from stalin_parser import StalinParser
 
+# 公共模块目录 scripts/common
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / "common"))
+from bundle_writer import BundleWriter
+from checkpoint import CheckpointJournal, code_version, run_key
+from corpus_store import CorpusStore
+from jsonl_export import JsonlExporter
+from memory_guard import MemoryGuard
+
 # ==================== 📜 解析规则 ====================
 
 # 规则 A (到达指定层级)： 如果当前层级 == SPLIT_LEVEL (比如 5) -> 📄 变成文件。
@@ -23,6 +31,7 @@ OUTPUT_DIR = PROJECT_ROOT / "data/processed/stalin/斯大林选集_1-4卷_诸夏
 # 2. 安全模式
 # True = 侦察模式 (只看目录结构)
 # False = 执行模式 (生成最终 Markdown)
+# 只想看书签分类 / 页码统计 (JSON、CSV，多卷并行)，用 scripts/utils/pdf/toc_report.py，更快
 DRY_RUN = False
 
 # 3. 切分层级
@@ -31,9 +40,40 @@ SPLIT_LEVEL = 5
 # 4. 黑名单
 BLACKLIST = ["总目录", "口号", "扉页", "封底", "斯大林历史档案选目录", "选自全集档案附卷"]
 
+# 5. 内存上限模式 (两千多页的大部头用)
+# True = 每篇文章后释放页面资源、收缩 MuPDF 缓存，每 REOPEN_EVERY 篇重新打开文档，结束时报告峰值内存
+LOW_MEMORY = False
+REOPEN_EVERY = 200  # 0 = 只收缩缓存，不重新打开
+
+# 6. 输出后端
+# "files"  = Page Bundles 目录树 (文章目录/index.md + assets/)
+# "sqlite" = 写入单个 SQLite 语料库 CORPUS_DB，需要目录树时运行 scripts/common/corpus_store.py 导出
+OUTPUT_BACKEND = "files"
+CORPUS_DB = PROJECT_ROOT / "data/processed/corpus.sqlite"
+ASYNC_WRITE = False  # files 后端：True = 后台线程写盘，解析不用等磁盘
+FSYNC = False        # files 后端：True = 每篇文章落盘后 fsync，断电也不丢 (慢)
+IMAGE_WORKERS = 4    # files 后端：写图片的线程数，解析下一篇时图片在后台落盘 (0 = 顺序写)
+
+# 7. JSONL 流式导出 (None = 不导出)
+# 与上面的输出后端同时写：每篇文章一行 JSON，后缀 .gz / .zst 自动压缩，供下游一遍顺序读完整个语料
+JSONL_EXPORT = None  # 例如 PROJECT_ROOT / "data/processed/xxx.jsonl.gz"
+
+# 8. 断点续跑 (None = 不记录)
+# 每篇文章落盘后记进日志；中断后重跑，日志里已完成 (页码范围也没变) 的文章直接跳过
+# 只认同一输出后端、同一输出位置、同一版解析器写下的记录，且文章还得在输出里 (输出删了就重新转换)
+# 多本书共用一个日志，批量转换时整本已完成的卷也会跳过
+CHECKPOINT_JOURNAL = None  # 例如 PROJECT_ROOT / "data/cache/checkpoints.jsonl"
+RESUME = True  # False = 从头转换本书 (日志里本书的旧记录作废)
+
 
 # ==================== ⚙️ 智能引擎：转换逻辑 ====================
 
+def checkpoint_run(output_dir):
+    """断点日志的运行标识：输出后端 + 输出位置 + 解析器版本"""
+    location = CORPUS_DB if OUTPUT_BACKEND == "sqlite" else output_dir
+    return run_key(OUTPUT_BACKEND, location, code_version(StalinParser))
+
+
 def clean_filename(text):
     """文件名清洗，去特殊字符"""
     return re.sub(r'[\\/:*?"<>|]', '_', text).strip()
@@ -132,6 +172,33 @@ def main():
     # 传入输出目录
     parser = StalinParser(OUTPUT_DIR)
 
+    memory_guard = MemoryGuard(INPUT_PDF, reopen_every=REOPEN_EVERY) if LOW_MEMORY else None
+
+    # 输出后端
+    writer = None
+    if not DRY_RUN:
+        if OUTPUT_BACKEND == "sqlite":
+            writer = CorpusStore(CORPUS_DB, book=INPUT_PDF.stem)
+            print(f"🗄️ 输出到语料库: {CORPUS_DB}")
+        else:
+            writer = BundleWriter(OUTPUT_DIR, fsync=FSYNC, background=ASYNC_WRITE,
+                                  image_workers=IMAGE_WORKERS, recover=True)
+
+    checkpoint = None
+    if CHECKPOINT_JOURNAL is not None and not DRY_RUN:
+        checkpoint = CheckpointJournal(CHECKPOINT_JOURNAL, book=INPUT_PDF.stem, run=checkpoint_run(OUTPUT_DIR),
+                                       exists=writer.has_article, resume=RESUME)
+        writer.on_written = checkpoint.record
+        if checkpoint.done:
+            print(f"⏩ 断点续跑：日志里已完成 {len(checkpoint.done)} 篇")
+
+    jsonl = None
+    if JSONL_EXPORT is not None and not DRY_RUN:
+        # 续跑时接着上次的文件写 (中断前已导出、但没落盘的文章会再出现一次，下游按 book + path 取最后一条)
+        jsonl = JsonlExporter(JSONL_EXPORT, append=checkpoint is not None and bool(checkpoint.done))
+        print(f"🧾 同时导出 JSONL: {JSONL_EXPORT}")
+    failed = 0
+
     # 遍历书签
     for item in toc:
         lvl = item['level']
@@ -184,8 +251,7 @@ def main():
             parent = path_stack.get(lvl - 1, OUTPUT_DIR)
             current_path = parent / safe_name
 
-            if not current_path.exists():
-                current_path.mkdir(parents=True, exist_ok=True)
+            writer.make_folder(current_path.relative_to(OUTPUT_DIR))
 
             path_stack[lvl] = current_path
             print(f"{indent}📂 创建目录: {title}")
@@ -193,11 +259,6 @@ def main():
         elif is_file:
             parent = path_stack.get(lvl - 1, OUTPUT_DIR)
             article_dir = parent / clean_filename(title)
-            file_path = article_dir / "index.md"
-
-            # 确保文章目录和父目录存在 (防止跳级情况)
-            if not article_dir.exists():
-                article_dir.mkdir(parents=True, exist_ok=True)
 
             # YAML
             cats = [title_stack[k] for k in sorted(title_stack.keys()) if k < lvl]
@@ -209,6 +270,11 @@ def main():
             }
 
             # 采用 Page Bundles 模式
+            rel_dir = article_dir.relative_to(OUTPUT_DIR)
+            if checkpoint is not None and checkpoint.is_done(rel_dir, (start + 1, end + 1)):
+                print(f"{indent}⏩ 已完成，跳过: {title}")
+                continue
+
             print(f"{indent}🚀 转换“文章包” 📦 : {title} ({start + 1}-{end + 1})...")
 
             try:
@@ -216,17 +282,23 @@ def main():
                 pages_to_process = list(range(start, end + 1))
                 if not pages_to_process: continue
 
-                # 调用 parse_chapter_pages
-                md_content = parser.parse_chapter_pages(doc, pages_to_process, article_output_dir=article_dir)
-
-                final_content = "---\n" + yaml.dump(front_matter, allow_unicode=True) + "---\n\n" + md_content
+                # 调用 parse_chapter (每章一个新的解析状态)
+                md_content, state = parser.parse_chapter(doc, pages_to_process)
 
-                # 写入文件
-                with open(file_path, "w", encoding="utf-8") as f:
-                    f.write(final_content)
+                # 写入文章包 (index.md + assets/)，或写入语料库
+                if checkpoint is not None:
+                    checkpoint.begin(rel_dir, (start + 1, end + 1))
+                writer.write_article(rel_dir, front_matter, md_content, state.article_images)
+                if jsonl is not None:
+                    jsonl.write_article(rel_dir, front_matter, md_content,
+                                        state.article_images, pages=(start + 1, end + 1))
 
             except Exception as e:
                 print(f"{indent}❌ 失败: {e}")
+                failed += 1
+
+            if memory_guard is not None:
+                doc = memory_guard.after_article(doc)
 
     if DRY_RUN:
         print("\n📢 --- 侦察结束 ---")
@@ -236,6 +308,16 @@ def main():
         print("3. 标有 🔹 的是你想要的内容标题吗？")
         print("如果是，请将 DRY_RUN 改为 False 正式执行。")
     else:
+        writer.close()
+        if jsonl is not None:
+            jsonl.close()
+        if checkpoint is not None:
+            # 有失败的文章就不标记整本完成，下次续跑只重做失败的
+            if failed == 0:
+                checkpoint.finish()
+            checkpoint.close()
+        if memory_guard is not None:
+            print(f"🧠 {memory_guard.report()}")
         print("\n✅ 全部转换完成！")
 
 
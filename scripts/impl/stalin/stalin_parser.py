@@ -1,4 +1,5 @@
 import fitz
+import hashlib
 import re
 
 # ================= 🎛️ 核心配置 =================
@@ -21,10 +22,31 @@ DETECT_THRESHOLD = 40   # 全页注脚检测阈值：从此高度才开始检测
 INDENT_THRESHOLD = 75   # 缩进阈值：X坐标大于此值视为新段落，小于此值视为续行
 CENTER_THRESHOLD = 120  # 居中阈值：X坐标大于此值且为黑体，视为三级标题 (###)
 
+# 文字提取标志：dict 默认标志去掉图片 (图片走 xref 提取)
+TEXT_FLAGS = fitz.TEXTFLAGS_DICT & ~fitz.TEXT_PRESERVE_IMAGES
+
 
 # ================= ⚙️ 解析引擎 =================
 # Page（页） -> Block（块） -> Line（行） -> Span（相同样式片段） -> Char（字符）
 
+class ChapterState:
+    """
+    一章的解析状态 (解析器本身不保存任何章节状态)
+    - 多个线程可以共用一个解析器同时解析不同的章，各带各的 ChapterState
+    - 只有普通的 Python 对象，可以 pickle 存盘，之后交回 parse_chapter 从 pages_done 页接着解析
+    """
+
+    def __init__(self):
+        self.global_note_id = 1    # 全局注脚计数器 [^1], [^2]...
+        self.all_footnotes = []    # 存储当页提取出的注脚内容
+        self.body_buffer = []      # 存储正文段落
+        self.current_para = ""     # 当前正在拼接的段落缓存
+        self.img_counter = 0
+        self.image_files = {}      # 图片内容摘要 -> 本篇文章中的图片文件名 (去重)
+        self.article_images = []   # 本篇文章的图片 [(文件名, 字节), ...]，由输出后端写入 assets/
+        self.pages_done = 0        # 已解析完的页数 (page_indices 里的前几页)
+
+
 class StalinParser:
     def __init__(self, output_base_dir):
         """
@@ -32,14 +54,6 @@ class StalinParser:
         :param output_base_dir: 基础目录 (pathlib.Path 对象)
         """
         self.output_base_dir = output_base_dir
-        self.img_counter = 0
-        self.assets_dir = None  # 由 parse_chapter_pages 按文章设置
-
-        # === 状态变量 ===
-        self.global_note_id = 1    # 全局注脚计数器 [^1], [^2]...
-        self.all_footnotes = []    # 存储当页提取出的注脚内容
-        self.body_buffer = []      # 存储正文段落
-        self.current_para = ""     # 当前正在拼接的段落缓存
 
     def is_cjk(self, char):
         """检测字符是否为中日韩文字（用于判断是否需要加空格）"""
@@ -90,12 +104,12 @@ class StalinParser:
 
         return page_height # 没找到分割线，说明全是正文
 
-    def process_spans_in_line(self, line, page_note_queue):
+    def process_spans_in_line(self, state, line, page_note_queue):
         """
         [核心函数] 处理单行内的所有 span（片段），负责：
         1. 字体语义识别（黑体->粗体，楷体->斜体，仿宋->引用）
         2. 标题层级判定
-        3. 注脚符号替换
+        3. 注脚符号替换 (注脚号取自 state)
         4. 智能去空（修复标题空格）
         """
         spans = line["spans"]
@@ -206,8 +220,8 @@ class StalinParser:
 
             # 替换注脚符号为 Markdown 格式 [^n]
             def replace_ref_body(_match):
-                note_id = self.global_note_id
-                self.global_note_id += 1
+                note_id = state.global_note_id
+                state.global_note_id += 1
                 page_note_queue.append(note_id)
                 return f"[^{note_id}]"
 
@@ -289,215 +303,243 @@ class StalinParser:
 
         return formatted_text, line_prefix
 
-    def append_to_buffer(self, clean_line, is_new_para):
+    def append_to_buffer(self, state, clean_line, is_new_para):
         """
-        将处理好的单行文本追加到缓冲区，处理跨行拼接逻辑
+        将处理好的单行文本追加到 state 的缓冲区，处理跨行拼接逻辑
         """
         # 1. 引用拼接逻辑
         # 如果是同类型引用续行，去掉 "> " 前缀直接拼，防止每行都断开
         # is_quote_continuation = False # 变量虽未使用但逻辑保留
-        if clean_line.startswith("> ") and not is_new_para and self.current_para.startswith("> "):
+        if clean_line.startswith("> ") and not is_new_para and state.current_para.startswith("> "):
             # is_quote_continuation = True
             clean_line = clean_line[2:]
 
         if is_new_para:
             # 新段落：将旧段落推入 buffer，开始记录新段落
-            if self.current_para:
-                self.body_buffer.append(self.current_para)
-            self.current_para = clean_line
+            if state.current_para:
+                state.body_buffer.append(state.current_para)
+            state.current_para = clean_line
         else:
             # 续行：拼接到当前段落
-            if self.current_para:
+            if state.current_para:
                 merged = False
 
                 # [核心修复] 粗体融合 (Bold Fusion)
                 # 场景：Line1: "**开始**" + Line2: "**结束**" -> "**开始结束**"
                 # 避免出现 "**开始****结束**" 导致渲染断裂
-                if self.current_para.endswith("**") and clean_line.startswith("**"):
-                    raw_last = self.current_para[:-2][-1].replace("*", "").replace("`", "")
+                if state.current_para.endswith("**") and clean_line.startswith("**"):
+                    raw_last = state.current_para[:-2][-1].replace("*", "").replace("`", "")
                     raw_curr = clean_line[2:][0].replace("*", "").replace("`", "")
                     if self.is_cjk(raw_last) and self.is_cjk(raw_curr):
-                        self.current_para = self.current_para[:-2] + clean_line[2:]
+                        state.current_para = state.current_para[:-2] + clean_line[2:]
                         merged = True
 
                 # [核心修复] 斜体融合 (Italic Fusion)
                 # 场景：Line1: "*（笑声*" + Line2: "*，鼓掌）*" -> "*（笑声，鼓掌）*"
-                elif self.current_para.endswith("*") and clean_line.startswith("*") and not self.current_para.endswith(
+                elif state.current_para.endswith("*") and clean_line.startswith("*") and not state.current_para.endswith(
                         "**") and not clean_line.startswith("**"):
-                    raw_last = self.current_para[:-1][-1].replace("*", "").replace("`", "")
+                    raw_last = state.current_para[:-1][-1].replace("*", "").replace("`", "")
                     raw_curr = clean_line[1:][0].replace("*", "").replace("`", "")
                     if self.is_cjk(raw_last) and self.is_cjk(raw_curr):
-                        self.current_para = self.current_para[:-1] + clean_line[1:]
+                        state.current_para = state.current_para[:-1] + clean_line[1:]
                         merged = True
 
                 if not merged:
                     # 普通文本拼接：汉字之间不加空格，西文之间加空格
-                    last_char = self.current_para[-1].replace("*", "").replace("`", "")
+                    last_char = state.current_para[-1].replace("*", "").replace("`", "")
                     curr_char = clean_line[0].replace("*", "").replace("`", "")
 
                     if self.is_cjk(last_char) and self.is_cjk(curr_char):
-                        self.current_para += clean_line
+                        state.current_para += clean_line
                     else:
-                        self.current_para += " " + clean_line
+                        state.current_para += " " + clean_line
             else:
-                self.current_para = clean_line
+                state.current_para = clean_line
 
-    def parse_chapter_pages(self, doc, page_indices, article_output_dir):
+    def parse_page(self, state, doc, p_idx):
         """
-        [主入口] 解析指定章节的页面列表(跨页流式处理)
+        解析一页，结果追加进 state (正文段落、注脚、图片、注脚计数)
+        :param state: ChapterState
         :param doc: PyMuPDF Document
-        :param page_indices: 这一章包含的页码列表 (0-based)
-        :param article_output_dir: 本篇文章的输出目录，图片保存在其 assets 子目录
+        :param p_idx: 页码 (0-based)
         """
-        # 设置本篇文章的 assets 目录
-        self.assets_dir = article_output_dir / "assets"
-        self.assets_dir.mkdir(parents=True, exist_ok=True)
-        self.img_counter = 0
-
-        # 重置状态 (每章开始)
-        self.global_note_id = 1
-        self.all_footnotes = []
-        self.body_buffer = []
-        self.current_para = ""
+        page = doc[p_idx]
+        page_num = page.number + 1  # 人类阅读页码 (1-based)
+        # 获取分割线位置，区分正文和注脚
+        split_y = self.get_split_y(page)
+        # 计算裁剪框：去掉页眉
+        actual_top_cut = min(MARGIN_TOP_CUT, split_y)
+        # 获取内容
+        clip_rect = fitz.Rect(0, actual_top_cut, page.rect.width, page.rect.height)
+        data = page.get_text("dict", clip=clip_rect, flags=TEXT_FLAGS)
+
+        body_lines_raw = [] # 正文区域
+        foot_lines_raw = [] # 脚注区域
+        page_note_queue = [] # 当前页面的注脚号队列 (Body 生产 ID -> Footer 消费 ID)
+
+        # --- 图片处理 (和原来一样排在本页正文之前) ---
+        for image_ref in self.collect_page_images(page, clip_rect):
+            img_filename = self.save_image(state, image_ref)
+            self.append_to_buffer(state, f"![img](assets/{img_filename})", is_new_para=True)
+
+        # 遍历块，分流正文行、注脚行
+        for block in data["blocks"]:
+            if "lines" not in block:
+                continue
 
-        # 遍历章节里的每一页并解析
-        for p_idx in page_indices:
-            page = doc[p_idx]
-            page_num = page.number + 1  # 人类阅读页码 (1-based)
-            # 获取分割线位置，区分正文和注脚
-            split_y = self.get_split_y(page)
-            # 计算裁剪框：去掉页眉
-            actual_top_cut = min(MARGIN_TOP_CUT, split_y)
-            # 获取内容
-            clip_rect = fitz.Rect(0, actual_top_cut, page.rect.width, page.rect.height)
-            data = page.get_text("dict", clip=clip_rect)
-
-            body_lines_raw = [] # 正文区域
-            foot_lines_raw = [] # 脚注区域
-            page_note_queue = [] # 当前页面的注脚号队列 (Body 生产 ID -> Footer 消费 ID)
-
-            # 遍历块，分流图片、正文行、注脚行
-            for block in data["blocks"]:
-                # --- 图片处理 ---
-                if "image" in block:
-                    self.img_counter += 1
-                    img_filename = f"img_{self.img_counter}.png"
-                    img_path = self.assets_dir / img_filename
-                    try:
-                        with open(img_path, "wb") as f:
-                            f.write(block["image"])
-                        self.append_to_buffer(f"![img](assets/{img_filename})", is_new_para=True)
-                    except Exception as e:
-                        print(f"⚠️ 图片保存失败 p{page_num}: {e}")
-                    continue
-
-                # --- 文本处理 ---
-                if "lines" not in block:
-                    continue
-
-                # 根据 Y 坐标划分区域，分流
-                if block["bbox"][1] >= split_y:
-                    foot_lines_raw.extend(block["lines"])
-                else:
-                    body_lines_raw.extend(block["lines"])
+            # 根据 Y 坐标划分区域，分流
+            if block["bbox"][1] >= split_y:
+                foot_lines_raw.extend(block["lines"])
+            else:
+                body_lines_raw.extend(block["lines"])
 
-            # === Pass 1: 处理正文区域 ===
-            for line in body_lines_raw:
-                line_text, prefix = self.process_spans_in_line(line, page_note_queue)
-                # [注意] strip() 在这里调用，去除 Raw 字符串里的物理缩进
-                clean_line = self.clean_text(line_text).strip()
+        # === Pass 1: 处理正文区域 ===
+        for line in body_lines_raw:
+            line_text, prefix = self.process_spans_in_line(state, line, page_note_queue)
+            # [注意] strip() 在这里调用，去除 Raw 字符串里的物理缩进
+            clean_line = self.clean_text(line_text).strip()
 
-                if not clean_line:
-                    continue
-                if re.search(r'[—_]{8,}', clean_line):
-                    continue # 跳过分割线
+            if not clean_line:
+                continue
+            if re.search(r'[—_]{8,}', clean_line):
+                continue # 跳过分割线
+
+            # 智能分段判断
+            is_new = False
+
+            # [判定 1] 物理缩进 -> 新段落
+            if line["bbox"][0] > INDENT_THRESHOLD:
+                is_new = True
+            # [判定 2] 空格缩进 (全角/半角) -> 新段落
+            raw_text = "".join([s["text"] for s in line["spans"]])
+            if raw_text.startswith("　") or raw_text.startswith("  "):
+                is_new = True
+
+            # [判定 3] 标题强制换段
+            if prefix.startswith("#"):
+                is_new = True
+
+            # [判定 4] 引用块逻辑
+            if prefix.startswith(">"):
+                # [核心修复] 正文/引用防粘连
+                # 如果上一段是正文(不带>)，这一段是引用(带>) -> 强制换段 (如文末出版信息)
+                if state.current_para and not state.current_para.startswith("> "):
+                    is_new = True
+                elif not is_new:  # 如果是引用接引用，且无缩进 -> 视为续行
+                    is_new = False
 
-                # 智能分段判断
+            # [核心修复] 注脚跟随 (去掉 $)
+            # 允许注脚符号后跟文字 (如 "[^1]。内容") 紧接上一行
+            if re.match(r'^\s*\[\^\d+\]', clean_line):
                 is_new = False
 
-                # [判定 1] 物理缩进 -> 新段落
-                if line["bbox"][0] > INDENT_THRESHOLD:
-                    is_new = True
-                # [判定 2] 空格缩进 (全角/半角) -> 新段落
-                raw_text = "".join([s["text"] for s in line["spans"]])
-                if raw_text.startswith("　") or raw_text.startswith("  "):
-                    is_new = True
-
-                # [判定 3] 标题强制换段
-                if prefix.startswith("#"):
-                    is_new = True
+            self.append_to_buffer(state, clean_line, is_new)
 
-                # [判定 4] 引用块逻辑
-                if prefix.startswith(">"):
-                    # [核心修复] 正文/引用防粘连
-                    # 如果上一段是正文(不带>)，这一段是引用(带>) -> 强制换段 (如文末出版信息)
-                    if self.current_para and not self.current_para.startswith("> "):
-                        is_new = True
-                    elif not is_new:  # 如果是引用接引用，且无缩进 -> 视为续行
-                        is_new = False
-
-                # [核心修复] 注脚跟随 (去掉 $)
-                # 允许注脚符号后跟文字 (如 "[^1]。内容") 紧接上一行
-                if re.match(r'^\s*\[\^\d+\]', clean_line):
-                    is_new = False
+        # === Pass 2: 处理页底注脚区域 ===
+        # 注脚也需要分段逻辑，但它是独立的 buffer
+        current_foot_para = ""
+        for line in foot_lines_raw:
+            raw_text = "".join([s["text"] for s in line["spans"]])
+            clean_line = self.clean_text(raw_text).strip()
+            if not clean_line:
+                continue
+            if re.search(r'[—_]{8,}', clean_line):
+                continue
 
-                self.append_to_buffer(clean_line, is_new)
-
-            # === Pass 2: 处理页底注脚区域 ===
-            # 注脚也需要分段逻辑，但它是独立的 buffer
-            current_foot_para = ""
-            for line in foot_lines_raw:
-                raw_text = "".join([s["text"] for s in line["spans"]])
-                clean_line = self.clean_text(raw_text).strip()
-                if not clean_line:
-                    continue
-                if re.search(r'[—_]{8,}', clean_line):
-                    continue
-
-                # 检测注脚开头是否有符号：① 或 [^1]
-                match = re.match(r'^[\u2460-\u2469]', clean_line)
-                is_new_foot = False
-
-                if match:
-                    is_new_foot = True
-                    # 将 PDF 的圈圈数字替换为 Markdown 的 [^n]
-                    if page_note_queue:
-                        # 从队列领号
-                        note_id = page_note_queue.pop(0)
-                        # 替换符号
-                        clean_line = clean_line.replace(match.group(), f"[^{note_id}]: ", 1)
-                    else:
-                        # 异常情况：页底有圈圈，但正文没引用？
-                        # 兜底：生成一个随机ID或保留原样
-                        clean_line = clean_line.replace(match.group(), f"[^x]: ", 1)
-                elif line["bbox"][0] > INDENT_THRESHOLD or raw_text.startswith("　"):
-                    is_new_foot = True
-
-                # 拼接注脚文本
-                if is_new_foot:
-                    if current_foot_para:
-                        self.all_footnotes.append(current_foot_para)
-                    current_foot_para = clean_line
+            # 检测注脚开头是否有符号：① 或 [^1]
+            match = re.match(r'^[\u2460-\u2469]', clean_line)
+            is_new_foot = False
+
+            if match:
+                is_new_foot = True
+                # 将 PDF 的圈圈数字替换为 Markdown 的 [^n]
+                if page_note_queue:
+                    # 从队列领号
+                    note_id = page_note_queue.pop(0)
+                    # 替换符号
+                    clean_line = clean_line.replace(match.group(), f"[^{note_id}]: ", 1)
                 else:
-                    if current_foot_para:
-                        current_foot_para += clean_line
-                    elif self.all_footnotes:
-                        self.all_footnotes[-1] += clean_line
-                    else:
-                        current_foot_para = clean_line
+                    # 异常情况：页底有圈圈，但正文没引用？
+                    # 兜底：生成一个随机ID或保留原样
+                    clean_line = clean_line.replace(match.group(), f"[^x]: ", 1)
+            elif line["bbox"][0] > INDENT_THRESHOLD or raw_text.startswith("　"):
+                is_new_foot = True
+
+            # 拼接注脚文本
+            if is_new_foot:
+                if current_foot_para:
+                    state.all_footnotes.append(current_foot_para)
+                current_foot_para = clean_line
+            else:
+                if current_foot_para:
+                    current_foot_para += clean_line
+                elif state.all_footnotes:
+                    state.all_footnotes[-1] += clean_line
+                else:
+                    current_foot_para = clean_line
 
-            # 本页最后一个注脚段落
-            if current_foot_para:
-                self.all_footnotes.append(current_foot_para)
+        # 本页最后一个注脚段落
+        if current_foot_para:
+            state.all_footnotes.append(current_foot_para)
 
-        # 刷新最后的正文缓存
-        if self.current_para:
-            self.body_buffer.append(self.current_para)
+    def collect_page_images(self, page, clip_rect):
+        """
+        按出现顺序收集页面图片，保留原始编码（jpeg/png/...，按 xref 提取，不经 dict 模式重新编码）
+        只收完整落在裁剪框 (页眉以下) 内的图片，跨过裁剪线的页眉条跳过
+        :return: [(摘要, ext, bytes), ...]；内嵌图片 (inline image) 摘要为 None (不去重)
+        """
+        images = []
+        extracted = {}  # 同一页重复出现的 xref 只提取一次
+        for info in page.get_image_info(xrefs=True):
+            bbox = fitz.Rect(info["bbox"])
+            if not clip_rect.contains(bbox):
+                continue
+            xref = info["xref"]
+            if xref > 0:
+                if xref not in extracted:
+                    image = page.parent.extract_image(xref)
+                    digest = hashlib.sha1(image["image"]).hexdigest()
+                    extracted[xref] = (digest, image["ext"], image["image"])
+                images.append(extracted[xref])
+                continue
+            # 内嵌图片没有 xref，只能退回 dict 模式按位置取
+            for block in page.get_text("dict", clip=bbox)["blocks"]:
+                if "image" in block:
+                    images.append((None, block["ext"], block["image"]))
+                    break
+        return images
+
+    def save_image(self, state, image_ref):
+        """
+        把图片加入本篇文章的图片列表 (state.article_images)
+        同一张图片 (内容摘要相同) 在本篇文章中只收一次，重复出现直接复用文件名
+        :param image_ref: collect_page_images 返回的 (摘要, ext, bytes)
+        :return: 文件名
+        """
+        digest, ext, image_bytes = image_ref
+        if digest is not None and digest in state.image_files:
+            return state.image_files[digest]
+
+        state.img_counter += 1
+        img_filename = f"img_{state.img_counter}.{ext}"
+        state.article_images.append((img_filename, image_bytes))
+
+        if digest is not None:
+            state.image_files[digest] = img_filename
+        return img_filename
+
+    def finish_chapter(self, state):
+        """
+        把 state 里累积的内容组装成 Markdown 正文 (不修改 state)
+        :return: Markdown 正文；图片在 state.article_images 中，正文里引用为 assets/文件名
+        """
+        # 刷新最后的正文缓存 (拼一个新列表，不改 state，解析完的 state 还可以存盘 / 接着用)
+        body_buffer = state.body_buffer + ([state.current_para] if state.current_para else [])
 
         # === [核心修复] 引用块智能合并 (Quote Merger) ===
         # 将连续的两个独立引用块 (中间有空行) 合并为一个块
         merged_buffer = []
-        for block in self.body_buffer:
+        for block in body_buffer:
             if not merged_buffer:
                 merged_buffer.append(block)
                 continue
@@ -513,7 +555,25 @@ class StalinParser:
         # 最终组装全文
         full_md = "\n\n".join(merged_buffer)
 
-        if self.all_footnotes:
-            full_md += "\n\n" + "\n\n".join(self.all_footnotes)
+        if state.all_footnotes:
+            full_md += "\n\n" + "\n\n".join(state.all_footnotes)
+
+        return full_md
+
+    def parse_chapter(self, doc, page_indices, state=None):
+        """
+        [主入口] 解析指定章节的页面列表(跨页流式处理)
+        :param doc: PyMuPDF Document
+        :param page_indices: 这一章包含的页码列表 (0-based)
+        :param state: 上次没解析完的 ChapterState，从它的 pages_done 页接着解析；None = 从头开始
+        :return: (Markdown 正文, ChapterState)；图片在 state.article_images 中，正文里引用为 assets/文件名
+        """
+        if state is None:
+            state = ChapterState()
+
+        # 遍历章节里的每一页并解析
+        for i in range(state.pages_done, len(page_indices)):
+            self.parse_page(state, doc, page_indices[i])
+            state.pages_done = i + 1
 
-        return full_md
\ No newline at end of file
+        return self.finish_chapter(state), state
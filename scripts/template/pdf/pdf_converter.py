@@ -1,9 +1,13 @@
+import bisect
 import fitz  # PyMuPDF
-import pymupdf4llm
 import re
-import yaml
+import sys
 from pathlib import Path
 
+# 公共模块目录 scripts/common
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / "common"))
+from front_matter import dump_front_matter
+
 # ==================== 📜 解析规则 ====================
 
 # 规则 A (到达指定层级)： 如果当前层级 == SPLIT_LEVEL (比如 5) -> 📄 变成文件。
@@ -37,6 +41,13 @@ MARGINS = (0, 82, 0, 0)
 # 5. 黑名单 (遇到这些书签先记录下来，特别是用页码定位，最后再删掉)
 BLACKLIST = ["示例黑名单", "斯大林历史档案选", "选自全集档案附卷"]
 
+# 6. 批量转换 (每批页数)
+# 0 = 每篇文章单独调用一次 to_markdown (标题字号统计每篇重算，两篇共用的页解析两次)
+# >0 = 每次给 to_markdown 一批页 (page_chunks=True)，逐页缓存，再按书签页码切给各篇文章，例如 200；
+#      标题字号全书统计一次，同一卷里标题层级一致
+# ⚠️ 开启后输出会变：标题层级 (#/##/...) 按全书字号统计重新判定，与 0 转出来的文章不一样，已有输出需要整本重转
+BATCH_PAGES = 0
+
 
 # ==================== ⚙️ 智能引擎 (黑名单修复版) ====================
 
@@ -122,7 +133,59 @@ def extract_toc_structure(doc):
     return final_toc
 
 
+class PageChunkCache:
+    """
+    按批调用 pymupdf4llm.to_markdown(page_chunks=True)，缓存每页的 Markdown，文章按页码范围拼起来
+    文章基本按页码顺序处理，所以只保留当前文章起始页之后的缓存
+    """
+
+    def __init__(self, doc, batch_pages, wanted_pages):
+        """
+        :param batch_pages: 每次 to_markdown 转换的页数
+        :param wanted_pages: 所有文章用到的页号 (0-based)；黑名单等不要的页不转换
+        """
+        import pymupdf4llm
+        self.to_markdown = pymupdf4llm.to_markdown
+        self.doc = doc
+        self.batch_pages = batch_pages
+        self.wanted = sorted(wanted_pages)
+        self.chunks = {}  # 页号 (0-based) -> Markdown
+
+        # 标题字号全书只统计一次；新版 pymupdf4llm 启用 layout 时没有 IdentifyHeaders，由它自己判断标题
+        identify_headers = getattr(pymupdf4llm, "IdentifyHeaders", None)
+        self.hdr_info = identify_headers(doc) if identify_headers is not None else None
+
+    def _load(self, first_page):
+        """从 first_page 开始转换一批还没缓存的页"""
+        i = bisect.bisect_left(self.wanted, first_page)
+        batch = [first_page] + [p for p in self.wanted[i:i + self.batch_pages] if p != first_page and p not in self.chunks]
+        batch = batch[:self.batch_pages]
+        chunks = self.to_markdown(
+            self.doc,
+            pages=batch,
+            margins=MARGINS,
+            hdr_info=self.hdr_info,
+            page_chunks=True,
+            show_progress=False
+        )
+        for pno, chunk in zip(batch, chunks):
+            self.chunks[pno] = chunk["text"]
+
+    def markdown(self, pages):
+        """取一篇文章 (页码列表) 的 Markdown，与用同一份 hdr_info 对这些页单独调用 to_markdown 的结果相同"""
+        for pno in [p for p in self.chunks if p < pages[0]]:
+            del self.chunks[pno]
+        for pno in pages:
+            if pno not in self.chunks:
+                self._load(pno)
+        return "".join(self.chunks[pno] for pno in pages)
+
+
 def main():
+    if not DRY_RUN:
+        # pymupdf4llm 会连带导入 pymupdf.layout 等一大串依赖 (约 0.5 秒)，侦察模式只看书签，用不到
+        import pymupdf4llm
+
     print(f"📖 读取: {INPUT_PDF.name}")
     try:
         doc = fitz.open(INPUT_PDF)
@@ -137,6 +200,16 @@ def main():
     path_stack = {0: OUTPUT_DIR}
     title_stack = {}
 
+    chunk_cache = None
+    if not DRY_RUN and BATCH_PAGES > 0:
+        # 与下面的判定 1 相同：只有变成文件的书签需要转换页面
+        wanted = {
+            p for it in toc
+            if it['level'] == SPLIT_LEVEL or (it['level'] < SPLIT_LEVEL and not it['has_children'])
+            for p in range(it['start'], it['end'] + 1)
+        }
+        chunk_cache = PageChunkCache(doc, BATCH_PAGES, wanted)
+
     # 遍历书签
     for item in toc:
         lvl = item['level']
@@ -221,16 +294,19 @@ def main():
             try:
                 pages = list(range(start, end + 1))
                 if pages:
-                    md_text = pymupdf4llm.to_markdown(
-                        doc,
-                        pages=pages,
-                        margins=MARGINS,
-                        show_progress=False
-                    )
+                    if chunk_cache is not None:
+                        md_text = chunk_cache.markdown(pages)
+                    else:
+                        md_text = pymupdf4llm.to_markdown(
+                            doc,
+                            pages=pages,
+                            margins=MARGINS,
+                            show_progress=False
+                        )
                     # 简单清洗一下图片标记（可选）
                     # md_text = md_text.replace("![]()", "")
 
-                    final_content = "---\n" + yaml.dump(front_matter, allow_unicode=True) + "---\n\n" + md_text
+                    final_content = "---\n" + dump_front_matter(front_matter) + "---\n\n" + md_text
 
                     with open(file_path, "w", encoding="utf-8") as f:
                         f.write(final_content)
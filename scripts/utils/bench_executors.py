@@ -0,0 +1,182 @@
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+# ================= 🎛️ 配置区域 =================
+
+# 1. 自动定位项目根目录
+PROJECT_ROOT = Path(__file__).resolve().parent.parent.parent
+
+# 2. 被测的批量转换脚本所在目录 (用它的 EXECUTOR 后端)
+CONVERTER_DIR = PROJECT_ROOT / "scripts/impl/lenin"
+
+# 3. 用哪几卷测 (同一份输入跑所有后端)
+VOLUMES = [1]
+
+# 4. 要比较的后端，以及每个后端的工作者数 (None = CPU 核数)
+BACKENDS = ["process", "thread", "interpreter"]
+WORKERS = None
+
+# 5. 每个后端分别用 / 不用内存映射打开 PDF (pdf_converter_custom.py 的 MMAP_INPUT)
+MMAP = [True, False]
+
+# 6. 每个后端跑几次取最快的一次
+REPEAT = 1
+
+# 7. 内存采样间隔 (秒)
+SAMPLE_INTERVAL = 0.05
+
+
+# ================= ⚙️ 执行逻辑 =================
+
+# 每个后端在新的解释器里跑一遍 batch_convert：输出写到临时目录，不读写页面缓存、断点日志、耗时模型，
+# 统计墙钟时间和整个进程树 (主进程 + 工作进程) 的峰值内存：
+# RSS 之和会把共享页 (内存映射的 PDF、fork 出来未改写的页) 重复计数，PSS 把共享页按进程数均摊，之和才是实际占用
+
+
+def read_pss_mb(pid):
+    """进程的 PSS (MB)，内核不支持 smaps_rollup 时返回 None"""
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            for line in f:
+                if line.startswith("Pss:"):
+                    return int(line.split()[1]) / 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    return None
+
+
+def tree_memory_mb(root_pid):
+    """
+    root_pid 及其所有子孙进程的内存之和，只支持 Linux (/proc)
+    :return: (RSS MB, PSS MB)，取不到的为 None
+    """
+    children = {}
+    rss = {}
+    page_mb = os.sysconf("SC_PAGE_SIZE") / 1024 / 1024
+    try:
+        entries = os.listdir("/proc")
+    except OSError:
+        return None, None
+    for entry in entries:
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                # 第 2 个字段 (comm) 可能含空格，从最后一个 ")" 之后开始数
+                ppid = int(f.read().rsplit(")", 1)[1].split()[1])
+            with open(f"/proc/{entry}/statm") as f:
+                rss[int(entry)] = int(f.read().split()[1]) * page_mb
+        except (OSError, ValueError, IndexError):
+            continue
+        children.setdefault(ppid, []).append(int(entry))
+
+    total_rss, total_pss, stack = 0.0, 0.0, [root_pid]
+    while stack:
+        pid = stack.pop()
+        total_rss += rss.get(pid, 0.0)
+        if total_pss is not None and pid in rss:
+            pss = read_pss_mb(pid)
+            total_pss = total_pss + pss if pss is not None else None
+        stack.extend(children.get(pid, []))
+    return total_rss, total_pss
+
+
+def run_backend(backend, workers, mapped, output_dir):
+    """
+    跑一次，返回 (墙钟秒数, (峰值 RSS MB, 峰值 PSS MB)，失败信息或 None)
+    """
+    code = (
+        f"import sys; sys.path.insert(0, {str(CONVERTER_DIR)!r})\n"
+        "from pathlib import Path\n"
+        "import batch_convert as b\n"
+        f"b.OUTPUT_ROOT = Path({str(output_dir)!r}); b.VOLUMES = {VOLUMES!r}; b.COST_MODEL = None\n"
+        "b.converter.CHECKPOINT_JOURNAL = None; b.converter.PAGE_CACHE_DIR = None; b.converter.JSONL_EXPORT = None\n"
+        f"b.converter.MMAP_INPUT = {mapped!r}\n"
+        f"sys.argv = ['batch_convert.py', {backend!r}, '{workers}']\n"
+        "b.main()\n"
+    )
+    t0 = time.perf_counter()
+    proc = subprocess.Popen([sys.executable, "-c", code], stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                            text=True, encoding="utf-8", errors="replace")
+
+    peak = [None, None]  # RSS, PSS
+
+    def sample():
+        while proc.poll() is None:
+            for i, value in enumerate(tree_memory_mb(proc.pid)):
+                if value is not None and (peak[i] is None or value > peak[i]):
+                    peak[i] = value
+            time.sleep(SAMPLE_INTERVAL)
+
+    sampler = threading.Thread(target=sample, daemon=True)
+    sampler.start()
+    output, _ = proc.communicate()
+    wall = time.perf_counter() - t0
+    sampler.join()
+
+    lines = output.strip().splitlines()
+    peak = tuple(peak)
+    if proc.returncode != 0:
+        return wall, peak, lines[-1] if lines else f"退出码 {proc.returncode}"
+    errors = [line for line in lines if line.startswith("❌")]
+    if errors:
+        return wall, peak, errors[0].lstrip("❌ ")
+    return wall, peak, None
+
+
+def count_pages():
+    """被测卷里要解析的总页数 (只读书签)"""
+    sys.path.insert(0, str(CONVERTER_DIR))
+    import batch_convert
+    batch_convert.VOLUMES = VOLUMES
+    return sum(len(a["pages"]) for pdf in batch_convert.list_volumes() for a in batch_convert.plan_volume(pdf)[1])
+
+
+def main():
+    workers = WORKERS or os.cpu_count() or 1
+    gil_check = getattr(sys, "_is_gil_enabled", None)
+    gil = "有 GIL" if gil_check is None or gil_check() else "无 GIL (自由线程)"
+    print(f"🐍 {sys.executable} ({sys.version.split()[0]}，{gil})")
+
+    pages = count_pages()
+    print(f"📚 卷 {VOLUMES}：{pages} 页，每个后端 {workers} 个工作者，测 {REPEAT} 次取最快\n")
+
+    results = []
+    for backend in BACKENDS:
+        for mapped in MMAP:
+            label = f"{backend}{'+mmap' if mapped else ''}"
+            best = None
+            for _ in range(REPEAT):
+                with tempfile.TemporaryDirectory(prefix="bench_executors_") as tmp:
+                    wall, peak, error = run_backend(backend, workers, mapped, Path(tmp))
+                if error is not None:
+                    print(f"⚠️ {label:<17} 不可用: {error}")
+                    break
+                if best is None or wall < best[0]:
+                    best = (wall, peak)
+            else:
+                wall, (rss, pss) = best
+                rss_text = f"{rss:6.0f} MB" if rss is not None else "     ? MB"
+                pss_text = f"{pss:6.0f} MB" if pss is not None else "     ? MB"
+                print(f"✅ {label:<17} {wall:7.1f} s  {pages / wall:7.1f} 页/s  峰值 RSS {rss_text}  PSS {pss_text}")
+                results.append((label, wall, pss if pss is not None else rss))
+            if error is not None:
+                break  # 后端不可用，不用再试另一种打开方式
+
+    if results:
+        fastest = min(results, key=lambda r: r[1])
+        print(f"\n🏁 最快: {fastest[0]} ({fastest[1]:.1f} s)")
+        measured = [r for r in results if r[2] is not None]
+        if measured:
+            leanest = min(measured, key=lambda r: r[2])
+            print(f"🪶 最省内存: {leanest[0]} ({leanest[2]:.0f} MB，PSS 取不到时按 RSS)")
+        print("把 batch_convert.py 的 EXECUTOR、pdf_converter_custom.py 的 MMAP_INPUT 设成适合这台机器的配置")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+import re
+import subprocess
+import sys
+from pathlib import Path
+
+# ================= 🎛️ 配置区域 =================
+
+# 1. 自动定位项目根目录
+PROJECT_ROOT = Path(__file__).resolve().parent.parent.parent
+
+# 2. 要测的脚本：(所在目录, 模块名)
+# 侦察模式 / 看书签 / 打印帮助 只需要导入模块本身，这里测的就是这部分启动开销
+TARGETS = [
+    ("scripts/impl/lenin", "pdf_converter_custom"),
+    ("scripts/impl/lenin", "epub_converter"),
+    ("scripts/impl/lenin", "batch_convert"),
+    ("scripts/impl/stalin", "pdf_converter"),
+    ("scripts/impl/stalin", "pdf_converter_custom"),
+    ("scripts/template/pdf", "pdf_converter"),
+    ("scripts/template/pdf", "pdf_converter_custom"),
+    ("scripts/template/epub", "epub_converter"),
+    ("scripts/common", "corpus_store"),
+    ("scripts/common", "search_index"),
+    ("scripts/common", "dedup_articles"),
+    ("scripts/utils/pdf", "split_pdf"),
+]
+
+# 3. 每个模块的导入时间上限 (毫秒)，超过就标红
+BUDGET_MS = 500
+
+# 4. 每个模块测几次取最小值 (排除磁盘冷启动的抖动)
+REPEAT = 3
+
+# 5. 超时的模块列出最慢的几个依赖
+TOP_DEPS = 5
+
+
+# ================= ⚙️ 执行逻辑 =================
+
+IMPORTTIME_RE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)')
+
+
+def measure(script_dir, module):
+    """
+    在新的解释器里用 -X importtime 导入一次
+    :return: (模块累计导入耗时 ms, [(依赖累计耗时 ms, 依赖名), ...] 只含直接依赖)
+    """
+    code = f"import sys; sys.path.insert(0, {str(PROJECT_ROOT / script_dir)!r}); import {module}"
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        capture_output=True, text=True, encoding="utf-8", errors="replace",
+    )
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1])
+
+    total = None
+    deps = []
+    for line in result.stderr.splitlines():
+        m = IMPORTTIME_RE.match(line)
+        if not m:
+            continue
+        cumulative_ms = int(m.group(2)) / 1000
+        depth = len(m.group(3)) // 2
+        name = m.group(4)
+        if depth == 0 and name == module:
+            total = cumulative_ms
+        elif depth == 0 or depth == 1:
+            # 顶层导入的第三方包 (fitz、yaml...) 以及本模块直接导入的子模块
+            deps.append((cumulative_ms, name))
+    return total, sorted(deps, reverse=True)
+
+
+def main():
+    print(f"🐍 {sys.executable} ({sys.version.split()[0]})")
+    print(f"⏱️ 导入时间上限: {BUDGET_MS} ms，每项测 {REPEAT} 次取最小值\n")
+
+    slow = 0
+    for script_dir, module in TARGETS:
+        label = f"{script_dir}/{module}.py"
+        try:
+            runs = [measure(script_dir, module) for _ in range(REPEAT)]
+        except RuntimeError as e:
+            print(f"❌ {label}: 导入失败 ({e})")
+            slow += 1
+            continue
+
+        total, deps = min(runs, key=lambda r: r[0])
+        ok = total <= BUDGET_MS
+        slow += not ok
+        print(f"{'✅' if ok else '❌'} {total:7.1f} ms  {label}")
+        if not ok:
+            for ms, name in deps[:TOP_DEPS]:
+                print(f"      {ms:7.1f} ms  {name}")
+
+    print(f"\n{'🎉 全部在预算内' if slow == 0 else f'❌ {slow} 个模块超出预算或导入失败'}")
+    return slow
+
+
+if __name__ == "__main__":
+    sys.exit(1 if main() else 0)
@@ -0,0 +1,464 @@
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import sys
+import threading
+import time
+import uuid
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, unquote, urlparse
+
+# ================= 🎛️ 配置区域 =================
+
+# 1. 自动定位项目根目录
+PROJECT_ROOT = Path(__file__).resolve().parent.parent.parent
+
+# 2. 监听地址 (给本机的入库脚本用，不要对外开放：没有鉴权)
+HOST = "127.0.0.1"
+PORT = 8765
+
+# 3. 转换配置 (profile)：名字 -> (脚本目录, 转换器模块, 输入文件类型)
+# 沿用该转换器仪表盘里的全部设置，服务只替换输入、输出路径，并固定输出为 files 后端 + JSONL
+PROFILES = {
+    "lenin": ("scripts/impl/lenin", "pdf_converter_custom", ".pdf"),
+    "stalin": ("scripts/impl/stalin", "pdf_converter_custom", ".pdf"),
+    "lenin-epub": ("scripts/impl/lenin", "epub_converter", ".epub"),
+    "epub": ("scripts/template/epub", "epub_converter", ".epub"),
+}
+DEFAULT_PROFILE = {".pdf": "lenin", ".epub": "epub"}  # 提交时没指定 profile 就按后缀选
+
+# 4. 同时转换几本 (其余排队)
+WORKERS = 2
+
+# 5. 结果缓存目录
+# 按 (文件内容, 文件名, profile, 转换器和 scripts/common 的源码) 的哈希存放，同一个文件再提交直接返回；
+# 改了转换器代码会自动换一个键，不会拿到旧结果
+CACHE_DIR = PROJECT_ROOT / "data/cache/service"
+
+# 6. 上传大小上限 (MB)
+MAX_UPLOAD_MB = 500
+
+# 7. 内存里保留最近多少个已结束的任务 (完成 / 失败 / 取消)，更早的从任务列表移除，GET /jobs/<id> 返回 404
+# 结果仍在缓存目录里，同一个文件再提交直接命中缓存
+KEEP_FINISHED_JOBS = 200
+
+# 8. 结果缓存上限：太久没用 (CACHE_MAX_DAYS 天) 的结果删掉，总大小超过 CACHE_MAX_MB 时从最久没用的删起
+# 每个任务结束后检查一次；失败 / 取消留下的半成品也一并删掉
+CACHE_MAX_MB = 10000
+CACHE_MAX_DAYS = 30
+
+
+# ================= ⚙️ 执行逻辑 =================
+
+# 接口 (JSON)：
+#   GET    /profiles                          可用的 profile
+#   POST   /jobs?filename=xx.pdf&profile=lenin 请求体是文件本身 -> {"id", "status", "cached", ...}
+#   GET    /jobs                              全部任务
+#   GET    /jobs/<id>                         任务状态：queued / running / done / failed / cancelled
+#   GET    /jobs/<id>/articles                边转边推送 (NDJSON)：每篇一行 {"article": {...}} (字段同 JSONL 导出)，
+#                                             最后一行 {"job": 任务状态}
+#   GET    /jobs/<id>/files/<文章路径>/assets/<图片>  文章的图片等文件
+#   DELETE /jobs/<id>                         取消 (排队中的直接撤销，运行中的结束转换进程)
+#
+# 例：curl -T 列宁全集第1卷.pdf "http://127.0.0.1:8765/jobs?filename=列宁全集第1卷.pdf"  (-T 即 PUT，也接受)
+#     curl -N http://127.0.0.1:8765/jobs/<id>/articles
+#
+# 每本书在独立的子进程里转换：转换器的配置 (输入、输出路径等) 是模块全局变量，同一进程里不能并发跑两本；
+# 子进程也让取消变得简单 (结束进程即可)。子进程把文章写进 JSONL (每篇刷一次盘)，服务读这个文件推送给客户端。
+
+INPUT_VARS = {".pdf": "INPUT_PDF", ".epub": "INPUT_EPUB"}
+
+RUNNER = """
+import sys
+sys.path.insert(0, {script_dir!r})
+from pathlib import Path
+import {module} as m
+import jsonl_export
+
+
+class StreamingExporter(jsonl_export.JsonlExporter):
+    def __init__(self, path, flush_every=1, append=False):  # 每篇都刷盘，服务边转边推送
+        super().__init__(path, flush_every, append)
+
+
+m.JsonlExporter = StreamingExporter
+m.{input_var} = Path({input!r})
+m.OUTPUT_DIR = Path({output!r})
+m.OUTPUT_BACKEND = "files"
+m.JSONL_EXPORT = Path({jsonl!r})
+m.DRY_RUN = False
+if hasattr(m, "CHECKPOINT_JOURNAL"):
+    m.CHECKPOINT_JOURNAL = None
+if hasattr(m, "PAGE_CACHE_DIR"):  # 共享的页面缓存会被并发的任务同时读写，服务的结果由自己的缓存目录负责
+    m.PAGE_CACHE_DIR = None
+m.main()
+"""
+
+
+def dir_size(path):
+    """目录下所有文件的总大小"""
+    return sum(p.stat().st_size for p in Path(path).rglob("*") if p.is_file())
+
+
+def source_hash(script_dir):
+    """转换器目录和 scripts/common 下所有 .py 的内容哈希"""
+    h = hashlib.sha256()
+    for directory in (PROJECT_ROOT / script_dir, PROJECT_ROOT / "scripts/common"):
+        for path in sorted(directory.glob("*.py")):
+            h.update(path.name.encode())
+            h.update(path.read_bytes())
+    return h.hexdigest()
+
+
+class Job:
+    def __init__(self, job_id, key, profile, filename):
+        self.id = job_id
+        self.key = key
+        self.profile = profile
+        self.filename = filename
+        self.status = "queued"
+        self.cached = False
+        self.error = None
+        self.warnings = []  # 转换器报告的单篇失败 (❌ 开头的输出)
+        self.articles = None
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+        self.proc = None
+        self.future = None
+        self.cancelled = threading.Event()
+        self.done = threading.Event()  # 完成 / 失败 / 取消时置位，推送接口据此收尾
+
+    @property
+    def dir(self):
+        return CACHE_DIR / self.key
+
+    def info(self):
+        return {
+            "id": self.id, "status": self.status, "cached": self.cached, "profile": self.profile,
+            "filename": self.filename, "articles": self.articles, "error": self.error, "warnings": self.warnings,
+            "seconds": round((self.finished or time.time()) - self.started, 2) if self.started else None,
+        }
+
+
+class ConvertService:
+    def __init__(self, workers=WORKERS):
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="convert")
+        self.jobs = {}     # id -> Job
+        self.finished = deque()  # 已结束任务的 id，按结束先后；超过 KEEP_FINISHED_JOBS 的从 jobs 里移除
+        self.active = {}   # 缓存键 -> 排队或运行中的 Job (同一个文件同时提交两次只转换一次)
+        self.lock = threading.Lock()
+
+    def submit(self, data, filename, profile=None):
+        """提交一个文件，返回 Job；命中缓存的任务直接是 done 状态"""
+        filename = Path(filename).name
+        suffix = Path(filename).suffix.lower()
+        profile = profile or DEFAULT_PROFILE.get(suffix)
+        if profile not in PROFILES:
+            raise ValueError(f"未知的 profile: {profile} (可选 {', '.join(PROFILES)})")
+        script_dir, _, input_type = PROFILES[profile]
+        if suffix != input_type:
+            raise ValueError(f"profile {profile} 只接受 {input_type} 文件")
+
+        h = hashlib.sha256(data)
+        for part in (filename, profile, source_hash(script_dir)):  # 书名取自文件名，也算进键里
+            h.update(b"\0" + part.encode())
+        key = h.hexdigest()[:32]
+
+        with self.lock:
+            job = self.active.get(key)
+            if job is not None:
+                return job
+            job = Job(uuid.uuid4().hex[:12], key, profile, filename)
+            self.jobs[job.id] = job
+
+            meta_path = job.dir / "done.json"
+            if meta_path.exists():
+                meta = json.loads(meta_path.read_text(encoding="utf-8"))
+                job.status, job.cached = "done", True
+                job.articles, job.warnings = meta["articles"], meta["warnings"]
+                os.utime(meta_path)  # 刷新使用时间，清理缓存时靠后
+                job.done.set()
+                self._retire(job)
+                return job
+
+            # 先占住这个键 (同一个文件再提交会拿到这个任务，清理缓存也不会动它)，上传的文件在锁外落盘
+            self.active[key] = job
+
+        try:
+            # 上次失败 / 取消留下的半成品先清掉
+            shutil.rmtree(job.dir, ignore_errors=True)
+            (job.dir / "input").mkdir(parents=True)
+            (job.dir / "input" / filename).write_bytes(data)
+        except OSError as e:
+            job.status, job.error = "failed", f"保存上传文件失败: {e}"
+            self._finish(job)
+            return job
+        job.future = self.pool.submit(self._run, job)
+        return job
+
+    def _run(self, job):
+        if job.cancelled.is_set():
+            job.status = "cancelled"  # 排队期间被取消、但没来得及从线程池撤销
+            self._finish(job)
+            return
+        script_dir, module, input_type = PROFILES[job.profile]
+        jsonl_path = job.dir / "articles.jsonl"
+        code = RUNNER.format(
+            script_dir=str(PROJECT_ROOT / script_dir), module=module, input_var=INPUT_VARS[input_type],
+            input=str(job.dir / "input" / job.filename), output=str(job.dir / "bundles"), jsonl=str(jsonl_path),
+        )
+        job.status, job.started = "running", time.time()
+        try:
+            with open(job.dir / "log.txt", "w", encoding="utf-8") as log:
+                job.proc = subprocess.Popen([sys.executable, "-c", code], stdout=log, stderr=subprocess.STDOUT,
+                                            cwd=PROJECT_ROOT / script_dir)
+                returncode = job.proc.wait()
+            lines = (job.dir / "log.txt").read_text(encoding="utf-8", errors="replace").strip().splitlines()
+            job.warnings = [line.strip().lstrip("❌ ") for line in lines if line.strip().startswith("❌")]
+
+            if job.cancelled.is_set():
+                job.status = "cancelled"
+            elif returncode != 0:
+                job.status, job.error = "failed", lines[-1] if lines else f"退出码 {returncode}"
+            elif not jsonl_path.exists():
+                # 转换器没能打开文件时打印 ❌ 后正常返回
+                job.status, job.error = "failed", job.warnings[0] if job.warnings else "没有产出任何文章"
+            else:
+                with open(jsonl_path, "rb") as f:
+                    job.articles = sum(1 for line in f if line.strip())
+                job.status = "done"
+                meta = {"articles": job.articles, "warnings": job.warnings, "seconds": time.time() - job.started,
+                        "bytes": dir_size(job.dir)}
+                (job.dir / "done.json").write_text(json.dumps(meta, ensure_ascii=False), encoding="utf-8")
+        except Exception as e:
+            job.status, job.error = "failed", str(e)
+        finally:
+            self._finish(job)
+
+    def _finish(self, job):
+        job.finished = time.time()
+        with self.lock:
+            if self.active.get(job.key) is job:
+                del self.active[job.key]
+            self._retire(job)
+        job.done.set()
+        self._trim_cache()
+
+    def _retire(self, job):
+        """记下已结束的任务，只保留最近 KEEP_FINISHED_JOBS 个 (调用方持有 self.lock)"""
+        self.finished.append(job.id)
+        while len(self.finished) > KEEP_FINISHED_JOBS:
+            self.jobs.pop(self.finished.popleft(), None)
+
+    def _trim_cache(self):
+        """按 CACHE_MAX_DAYS / CACHE_MAX_MB 删掉磁盘上最久没用的结果，以及失败 / 取消留下的半成品"""
+        if not CACHE_DIR.exists():
+            return
+        entries = []
+        for path in CACHE_DIR.iterdir():
+            if not path.is_dir():
+                continue
+            if path.name.startswith(".trash-"):  # 上次没删完的
+                shutil.rmtree(path, ignore_errors=True)
+                continue
+            meta_path = path / "done.json"
+            try:
+                meta = json.loads(meta_path.read_text(encoding="utf-8"))
+                entries.append((meta_path.stat().st_mtime, meta.get("bytes") or dir_size(path), path))
+            except (OSError, ValueError):
+                self._drop_cache_entry(path)  # 没有 done.json：失败 / 取消的半成品 (排队、运行中的不会删)
+
+        entries.sort()  # 最久没用的在前
+        total = sum(size for _, size, _ in entries)
+        cutoff = time.time() - CACHE_MAX_DAYS * 86400
+        for mtime, size, path in entries:
+            if mtime >= cutoff and total <= CACHE_MAX_MB * 1024 * 1024:
+                break
+            if self._drop_cache_entry(path):
+                total -= size
+
+    def _drop_cache_entry(self, path):
+        """删掉一条缓存结果：在锁里改名挪开 (之后的提交不会再命中它)，再在锁外删除；排队、运行中的不动"""
+        trash = path.with_name(f".trash-{path.name}-{uuid.uuid4().hex[:8]}")
+        with self.lock:
+            if path.name in self.active:
+                return False
+            try:
+                os.replace(path, trash)
+            except OSError:
+                return False
+        shutil.rmtree(trash, ignore_errors=True)
+        return True
+
+    def cancel(self, job):
+        job.cancelled.set()
+        if job.future is not None and job.future.cancel():
+            job.status = "cancelled"  # 还在排队，直接撤销
+            self._finish(job)
+        elif job.proc is not None and job.proc.poll() is None:
+            job.proc.terminate()  # _run 等到进程退出后记为 cancelled
+
+    def stream(self, job, poll=0.2):
+        """逐行产出已完成的文章 (JSONL 的原始行)，任务结束且读完为止"""
+        path = job.dir / "articles.jsonl"
+        pos, pending = 0, b""
+        while True:
+            finished = job.done.is_set()  # 先看状态再读文件：结束之后还会再读一遍，不会漏掉最后几篇
+            if path.exists():
+                with open(path, "rb") as f:
+                    f.seek(pos)
+                    chunk = f.read()
+                pos += len(chunk)
+                *lines, pending = (pending + chunk).split(b"\n")
+                for line in lines:
+                    if line.strip():
+                        yield line
+            if finished:
+                return
+            job.done.wait(poll)
+
+    def shutdown(self):
+        for job in list(self.active.values()):
+            self.cancel(job)
+        self.pool.shutdown(wait=True)
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # 推送接口要用 chunked 编码
+    service = None
+
+    def log_message(self, format, *args):
+        print(f"🌐 {self.address_string()} {format % args}")
+
+    def _json(self, code, obj):
+        body = json.dumps(obj, ensure_ascii=False).encode("utf-8")
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _job(self, parts):
+        job = self.service.jobs.get(parts[1]) if len(parts) > 1 else None
+        if job is None:
+            self._json(404, {"error": "没有这个任务"})
+        return job
+
+    def do_GET(self):
+        parts = [unquote(p) for p in urlparse(self.path).path.strip("/").split("/")]
+        if parts == ["profiles"]:
+            self._json(200, {name: {"script": f"{d}/{m}.py", "input": t} for name, (d, m, t) in PROFILES.items()})
+        elif parts == ["jobs"]:
+            with self.service.lock:  # 工作线程会同时增删任务
+                jobs = list(self.service.jobs.values())
+            self._json(200, [job.info() for job in jobs])
+        elif parts[0] == "jobs" and len(parts) == 2:
+            job = self._job(parts)
+            if job is not None:
+                self._json(200, job.info())
+        elif parts[0] == "jobs" and len(parts) == 3 and parts[2] == "articles":
+            job = self._job(parts)
+            if job is not None:
+                self._stream(job)
+        elif parts[0] == "jobs" and len(parts) > 3 and parts[2] == "files":
+            job = self._job(parts)
+            if job is not None:
+                self._file(job, "/".join(parts[3:]))
+        else:
+            self._json(404, {"error": "未知接口"})
+
+    def _stream(self, job):
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson; charset=utf-8")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        def chunk(data):
+            self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+            self.wfile.flush()
+
+        try:
+            for line in self.service.stream(job):
+                chunk(b'{"article": ' + line + b'}\n')
+            chunk(json.dumps({"job": job.info()}, ensure_ascii=False).encode("utf-8") + b"\n")
+            self.wfile.write(b"0\r\n\r\n")
+        except (BrokenPipeError, ConnectionResetError):
+            self.close_connection = True  # 客户端断开，不影响转换本身
+
+    def _file(self, job, rel_path):
+        root = (job.dir / "bundles").resolve()
+        path = (root / rel_path).resolve()
+        if not path.is_relative_to(root) or not path.is_file():
+            self._json(404, {"error": "没有这个文件"})
+            return
+        data = path.read_bytes()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/markdown; charset=utf-8" if path.suffix == ".md" else "application/octet-stream")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        if url.path.strip("/") != "jobs":
+            self._json(404, {"error": "未知接口"})
+            return
+        query = parse_qs(url.query)
+        size = int(self.headers.get("Content-Length") or 0)
+        if size <= 0:
+            self._json(400, {"error": "请求体为空 (请求体就是要转换的文件)"})
+            return
+        if size > MAX_UPLOAD_MB * 1024 * 1024:
+            self.close_connection = True  # 不读请求体，断开连接
+            self._json(413, {"error": f"文件超过 {MAX_UPLOAD_MB} MB"})
+            return
+        data = self.rfile.read(size)
+        filename = query.get("filename", [""])[0]
+        if not filename:
+            self._json(400, {"error": "缺少 filename 参数 (决定文件类型和书名)"})
+            return
+        try:
+            job = self.service.submit(data, filename, query.get("profile", [None])[0])
+        except ValueError as e:
+            self._json(400, {"error": str(e)})
+            return
+        self._json(200 if job.cached else 202, job.info())
+
+    do_PUT = do_POST
+
+    def do_DELETE(self):
+        parts = [unquote(p) for p in urlparse(self.path).path.strip("/").split("/")]
+        if parts[0] != "jobs" or len(parts) != 2:
+            self._json(404, {"error": "未知接口"})
+            return
+        job = self._job(parts)
+        if job is not None:
+            self.service.cancel(job)
+            job.done.wait(10)
+            self._json(200, job.info())
+
+
+def main():
+    CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    Handler.service = ConvertService()
+    server = ThreadingHTTPServer((HOST, PORT), Handler)
+    server.daemon_threads = True
+    print(f"🚀 转换服务: http://{HOST}:{PORT}  ({WORKERS} 个并发转换，缓存 {CACHE_DIR})")
+    print(f"📋 profile: {', '.join(PROFILES)}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n🛑 停止服务，取消进行中的转换...")
+    finally:
+        server.server_close()
+        Handler.service.shutdown()
+
+
+if __name__ == "__main__":
+    main()
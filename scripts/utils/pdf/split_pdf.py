@@ -1,4 +1,6 @@
 import fitz  # PyMuPDF
+import json
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from pathlib import Path
 
 # ================= 🎛️ 配置区域 =================
@@ -12,7 +14,13 @@ INPUT_PDF = PROJECT_ROOT / "data/raw/stalin/斯大林选集_1-4卷_诸夏怀斯
 # 3. 输出目录 (会自动创建)
 OUTPUT_DIR = PROJECT_ROOT / "data/interim/stalin/splits"
 
-# 4. 【核心】切分点列表 (请输入 PDF 阅读器上看到的页码，1-based)
+# 4. 切分方式
+# "manual"   = 用下面手填的 CUT_POINTS
+# "bookmark" = 按书签切：每个 BOOKMARK_LEVEL 级书签（默认一级，通常是“卷”）一个分片
+# "pages"    = 按页数切：每片约 TARGET_PAGES 页，切点对齐到最近的书签起始页，避免把一篇文章切成两半
+SPLIT_MODE = "manual"
+
+# 5. 【manual 模式】切分点列表 (请输入 PDF 阅读器上看到的页码，1-based)
 # 例子：[15, 550, 1200]
 # 意思是在第15页切一刀，在第550页切一刀，在1200页切一刀。
 # 结果会生成 4 个文件：
@@ -22,9 +30,122 @@ OUTPUT_DIR = PROJECT_ROOT / "data/interim/stalin/splits"
 # Part 4: 1200 ~ 结尾
 CUT_POINTS = [35, 771, 1528, 2221]
 
+# 6. 【bookmark 模式】按哪一级书签切
+BOOKMARK_LEVEL = 1
+
+# 7. 【pages 模式】每个分片的目标页数
+TARGET_PAGES = 500
+
+# 8. 并行写分片的进程数 (1 = 顺序执行)
+WORKERS = 4
+
 
 # ================= ⚙️ 执行逻辑 =================
 
+def cuts_from_bookmarks(toc, level):
+    """取指定层级书签的起始页作为切点 (0-based)"""
+    return [page - 1 for lvl, _, page in (item[:3] for item in toc) if lvl == level and page > 0]
+
+
+def cuts_from_page_count(toc, total_pages, target_pages):
+    """
+    每隔约 target_pages 页切一刀；有书签时，切点吸附到离目标最近的书签起始页
+    """
+    anchors = sorted({item[2] - 1 for item in toc if item[2] > 0})
+    cuts = []
+    last = 0
+    target = target_pages
+    while target < total_pages:
+        cut = target
+        if anchors:
+            # 在 (上一个切点, 结尾) 之间找离目标最近的书签起始页
+            candidates = [a for a in anchors if last < a < total_pages]
+            if candidates:
+                cut = min(candidates, key=lambda a: abs(a - target))
+        if cut <= last:
+            break
+        cuts.append(cut)
+        last = cut
+        target = cut + target_pages
+    return cuts
+
+
+def rebase_dest(dest, start_page):
+    """
+    书签跳转目标改成分片内的页码，保留目标点 (to)：转换器靠它判断文章是不是从页面中间开始、按位置切开共用页
+    跳到别处 (命名目标、外部链接等) 的书签在分片里无效，只留页码
+    """
+    if dest.get("kind") != fitz.LINK_GOTO:
+        return None
+    dest = {k: v for k, v in dest.items() if k != "xref"}  # xref 是源文件里书签对象的编号
+    dest["page"] = dest["page"] - start_page
+    return dest
+
+
+def toc_subtree(toc, start_page, end_page):
+    """
+    截取分片 [start_page, end_page) (0-based) 内的书签，页码改为分片内的页码
+    分片中间开始的子树会补上祖先书签 (指向分片第 1 页)，保证层级从 1 开始连续、分类路径完整
+    :param toc: get_toc(simple=False) 的结果，跳转目标一起带进分片
+    """
+    sub = []
+    ancestors = {}  # level -> 分片开始前最近一次出现的书签标题
+    shift = None    # 层级平移量：原层级 - shift = 分片内层级
+
+    for item in toc:
+        lvl, title, page = item[0], item[1], item[2]
+        if page - 1 < start_page:
+            if shift is None:
+                # 记录祖先链，遇到更浅的书签时清掉更深的
+                ancestors[lvl] = title
+                for k in list(ancestors.keys()):
+                    if k > lvl:
+                        del ancestors[k]
+            continue  # 分片开始前的书签 (或页码倒序的异常书签)
+        if page - 1 >= end_page:
+            break
+
+        if shift is None:
+            # 第一条落在分片内的书签：先补上它的祖先
+            chain = [ancestors[k] for k in sorted(ancestors.keys()) if k < lvl]
+            for depth, anc_title in enumerate(chain, start=1):
+                sub.append([depth, anc_title, 1])
+            shift = lvl - len(chain) - 1
+
+        new_lvl = max(1, lvl - shift)
+        if sub:
+            new_lvl = min(new_lvl, sub[-1][0] + 1)  # 不能比上一条深超过 1 级
+        else:
+            new_lvl = 1
+        entry = [new_lvl, title, page - start_page]
+        dest = rebase_dest(item[3], start_page) if len(item) > 3 else None
+        if dest is not None:
+            entry.append(dest)
+        sub.append(entry)
+
+    return sub
+
+
+def write_shard(src_path, part_no, start_page, end_page, save_path, sub_toc):
+    """
+    写一个分片 (在子进程里执行，每个进程自己打开源文件)
+    区间左闭右开 [start_page, end_page)
+    """
+    src_doc = fitz.open(src_path)
+    new_doc = fitz.open()
+
+    # 插入页面 (这是最快的方法，且保留大部分链接)
+    new_doc.insert_pdf(src_doc, from_page=start_page, to_page=end_page - 1)
+    # insert_pdf 不带书签，单独写入本分片的书签子树
+    if sub_toc:
+        new_doc.set_toc(sub_toc)
+
+    new_doc.save(save_path, garbage=3, deflate=True)
+    new_doc.close()
+    src_doc.close()
+    return part_no, save_path.name, end_page - start_page, len(sub_toc)
+
+
 def split_pdf():
     # 1. 检查输入
     if not INPUT_PDF.exists():
@@ -37,44 +158,74 @@ def split_pdf():
     print(f"📖 打开文件: {INPUT_PDF.name}")
     src_doc = fitz.open(INPUT_PDF)
     total_pages = src_doc.page_count
-    print(f"📄 总页数: {total_pages}")
-
-    # 2. 处理切分点
-    # 排序并去重
-    cuts = sorted(list(set(CUT_POINTS)))
-
-    # 转换为 0-based 索引用于编程
-    # 也就是：如果用户说 15页开始，内部索引就是 14
-    cut_indices = [p - 1 for p in cuts if 0 < p < total_pages]
+    toc = src_doc.get_toc(simple=False)
+    src_doc.close()
+    print(f"📄 总页数: {total_pages}，书签: {len(toc)} 个")
+
+    # 2. 计算切分点 (0-based)
+    if SPLIT_MODE == "bookmark":
+        cut_indices = cuts_from_bookmarks(toc, BOOKMARK_LEVEL)
+    elif SPLIT_MODE == "pages":
+        cut_indices = cuts_from_page_count(toc, total_pages, TARGET_PAGES)
+    else:
+        # 转换为 0-based 索引用于编程
+        # 也就是：如果用户说 15页开始，内部索引就是 14
+        cut_indices = [p - 1 for p in CUT_POINTS]
+
+    # 排序、去重、去掉越界和第 0 页
+    cut_indices = sorted({c for c in cut_indices if 0 < c < total_pages})
 
     # 构建区间列表：[0, 14, 50, end]
     boundaries = [0] + cut_indices + [total_pages]
+    print(f"✂️  切分方式: {SPLIT_MODE}，准备切分为 {len(boundaries) - 1} 个部分...")
 
-    print(f"✂️  准备切分为 {len(boundaries) - 1} 个部分...")
-
-    # 3. 循环切分
+    # 3. 准备分片任务
+    shards = []
     for i in range(len(boundaries) - 1):
         start_page = boundaries[i]
         end_page = boundaries[i + 1]  # 左闭右开区间
-
-        # 创建新 PDF
-        new_doc = fitz.open()
-
-        # 插入页面 (这是最快的方法，且保留大部分链接/书签)
-        new_doc.insert_pdf(src_doc, from_page=start_page, to_page=end_page - 1)
-
-        # 生成文件名
         # 也就是 human readable 的页码 (start+1)
         part_name = f"{INPUT_PDF.stem}_part{i + 1}_p{start_page + 1}-p{end_page}.pdf"
-        save_path = OUTPUT_DIR / part_name
-
-        new_doc.save(save_path)
-        print(f"✅ 保存 Part {i + 1}: {part_name} (共 {end_page - start_page} 页)")
-
-        new_doc.close()
-
-    print("\n🎉 全部切分完成！文件在 data/interim/stalin_splits/")
+        shards.append({
+            "part": i + 1,
+            "file": part_name,
+            "start": start_page,
+            "end": end_page,
+            "toc": toc_subtree(toc, start_page, end_page),
+        })
+
+    # 4. 并行写分片
+    if WORKERS > 1 and len(shards) > 1:
+        with ProcessPoolExecutor(max_workers=WORKERS) as pool:
+            futures = [
+                pool.submit(write_shard, INPUT_PDF, s["part"], s["start"], s["end"], OUTPUT_DIR / s["file"], s["toc"])
+                for s in shards
+            ]
+            for future in as_completed(futures):
+                part_no, name, pages, marks = future.result()
+                print(f"✅ 保存 Part {part_no}: {name} (共 {pages} 页，书签 {marks} 个)")
+    else:
+        for s in shards:
+            part_no, name, pages, marks = write_shard(
+                INPUT_PDF, s["part"], s["start"], s["end"], OUTPUT_DIR / s["file"], s["toc"])
+            print(f"✅ 保存 Part {part_no}: {name} (共 {pages} 页，书签 {marks} 个)")
+
+    # 5. 分片清单：记录每个分片在原书里从哪页开始 (page_offset，0-based)，方便对照原书
+    # 转换器不读它：每个分片当作一本独立的书转换 (书名是分片文件名)，front matter 的 order 是分片内的页码
+    manifest = {
+        "source": INPUT_PDF.name,
+        "total_pages": total_pages,
+        "shards": [
+            {"part": s["part"], "file": s["file"], "page_offset": s["start"], "pages": s["end"] - s["start"]}
+            for s in shards
+        ],
+    }
+    manifest_path = OUTPUT_DIR / f"{INPUT_PDF.stem}_shards.json"
+    manifest_path.write_text(json.dumps(manifest, ensure_ascii=False, indent=2), encoding="utf-8")
+
+    print(f"\n🎉 全部切分完成！文件在 {OUTPUT_DIR}")
+    print(f"🧾 分片清单: {manifest_path.name}")
 
 
 if __name__ == "__main__":
-    split_pdf()
\ No newline at end of file
+    split_pdf()
@@ -0,0 +1,182 @@
+import csv
+import importlib
+import json
+import re
+import statistics
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import fitz  # PyMuPDF
+
+# ================= 🎛️ 配置区域 =================
+
+# 1. 自动定位项目根目录
+PROJECT_ROOT = Path(__file__).resolve().parent.parent.parent.parent
+
+# 2. 输入：单个 PDF，或一个目录 (目录下所有 PDF，如 52 卷列宁全集)
+INPUT_PATH = PROJECT_ROOT / "data/raw/lenin/列宁全集（版本II-文字版）（完整书签版）"
+
+# 3. 按哪个转换器的规则分类 (用它的 SPLIT_LEVEL、BLACKLIST、书签页码计算)
+CONVERTER_DIR = PROJECT_ROOT / "scripts/impl/lenin"
+CONVERTER_MODULE = "pdf_converter_custom"
+
+# 4. 输出 (None = 不输出该格式)
+# JSON：每卷的统计 + 每个书签的明细；CSV：每个书签一行，方便用表格软件筛选
+OUTPUT_JSON = PROJECT_ROOT / "data/interim/toc_report.json"
+OUTPUT_CSV = PROJECT_ROOT / "data/interim/toc_report.csv"
+
+# 5. 并行进程数 (1 = 顺序执行)
+WORKERS = 4
+
+
+# ================= ⚙️ 执行逻辑 =================
+
+# 只读书签和页数，不解析任何页面，所以几十卷也只要几秒
+
+_converter = None
+
+
+def load_converter():
+    """在每个进程里导入一次转换器模块"""
+    global _converter
+    if _converter is None:
+        sys.path.insert(0, str(CONVERTER_DIR))
+        _converter = importlib.import_module(CONVERTER_MODULE)
+    return _converter
+
+
+def classify(item, split_level):
+    """与转换器的规则 A-D 相同：📄 file / 📂 folder / 🔹 content"""
+    lvl = item["level"]
+    if lvl == split_level or (lvl < split_level and not item["has_children"]):
+        return "file"
+    if lvl < split_level:
+        return "folder"
+    return "content"
+
+
+def natural_key(path):
+    """按文件名里的数字排序：第2卷 排在 第10卷 前面"""
+    return [int(part) if part.isdigit() else part for part in re.split(r'(\d+)', path.name)]
+
+
+def page_stats(page_counts):
+    if not page_counts:
+        return None
+    return {
+        "min": min(page_counts),
+        "median": statistics.median(page_counts),
+        "mean": round(statistics.fmean(page_counts), 1),
+        "max": max(page_counts),
+        "total": sum(page_counts),
+    }
+
+
+def inspect_pdf(pdf_path):
+    """读一卷的书签，按转换器规则分类，算页码范围和统计"""
+    converter = load_converter()
+    split_level = converter.SPLIT_LEVEL
+
+    doc = fitz.open(pdf_path)
+    try:
+        page_count = doc.page_count
+        toc = converter.extract_toc_structure(doc)
+    finally:
+        doc.close()
+
+    items = []
+    title_stack = {}
+    path_stack = {0: Path()}
+    for item in toc:
+        lvl, title = item["level"], item["title"]
+        title_stack[lvl] = title
+        for k in list(title_stack.keys()):
+            if k > lvl:
+                del title_stack[k]
+
+        kind = classify(item, split_level)
+        path = None
+        if kind != "content":
+            path = path_stack.get(lvl - 1, Path()) / converter.clean_filename(title)
+            if kind == "folder":
+                path_stack[lvl] = path
+
+        items.append({
+            "level": lvl,
+            "kind": kind,
+            "title": title,
+            "category": "/".join(title_stack[k] for k in sorted(title_stack.keys()) if k < lvl),
+            "path": path.as_posix() if path is not None else None,
+            "start": item["start"] + 1,  # 1-based，与 front matter 的 order 一致
+            "end": item["end"] + 1,
+            "pages": item["end"] - item["start"] + 1,
+        })
+
+    counts = {kind: sum(1 for it in items if it["kind"] == kind) for kind in ("file", "folder", "content")}
+    return {
+        "pdf": Path(pdf_path).name,
+        "book": Path(pdf_path).stem,
+        "page_count": page_count,
+        "bookmarks": len(items),
+        **counts,
+        "article_pages": page_stats([it["pages"] for it in items if it["kind"] == "file"]),
+        "items": items,
+    }
+
+
+def main():
+    if not INPUT_PATH.exists():
+        print(f"❌ 找不到: {INPUT_PATH}")
+        return
+
+    pdfs = sorted(INPUT_PATH.glob("*.pdf"), key=natural_key) if INPUT_PATH.is_dir() else [INPUT_PATH]
+    converter = load_converter()
+    print(f"📚 {len(pdfs)} 个 PDF，按 {CONVERTER_MODULE} 规则 (SPLIT_LEVEL={converter.SPLIT_LEVEL}) 分类\n")
+
+    t = time.perf_counter()
+    if WORKERS > 1 and len(pdfs) > 1:
+        with ProcessPoolExecutor(max_workers=WORKERS) as pool:
+            volumes = list(pool.map(inspect_pdf, pdfs))
+    else:
+        volumes = [inspect_pdf(p) for p in pdfs]
+    elapsed = time.perf_counter() - t
+
+    for vol in volumes:
+        stats = vol["article_pages"] or {}
+        print(
+            f"📖 {vol['book']}: {vol['page_count']} 页，📄 {vol['file']} 篇 / 📂 {vol['folder']} / 🔹 {vol['content']}"
+            f"，每篇 {stats.get('min', 0)}-{stats.get('max', 0)} 页 (中位数 {stats.get('median', 0)})"
+        )
+
+    report = {
+        "converter": f"{CONVERTER_DIR.relative_to(PROJECT_ROOT).as_posix()}/{CONVERTER_MODULE}.py",
+        "split_level": converter.SPLIT_LEVEL,
+        "blacklist": converter.BLACKLIST,
+        "volumes": volumes,
+    }
+
+    if OUTPUT_JSON is not None:
+        OUTPUT_JSON.parent.mkdir(parents=True, exist_ok=True)
+        OUTPUT_JSON.write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+        print(f"\n🧾 JSON: {OUTPUT_JSON}")
+
+    if OUTPUT_CSV is not None:
+        OUTPUT_CSV.parent.mkdir(parents=True, exist_ok=True)
+        fields = ["book", "level", "kind", "title", "category", "path", "start", "end", "pages"]
+        # utf-8-sig：Excel 打开中文不乱码
+        with open(OUTPUT_CSV, "w", encoding="utf-8-sig", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=fields)
+            writer.writeheader()
+            for vol in volumes:
+                for item in vol["items"]:
+                    writer.writerow({"book": vol["book"], **item})
+        print(f"🧾 CSV: {OUTPUT_CSV}")
+
+    total_files = sum(vol["file"] for vol in volumes)
+    print(f"\n🎉 {len(volumes)} 卷、{total_files} 篇文章，耗时 {elapsed:.2f}s")
+
+
+if __name__ == "__main__":
+    main()